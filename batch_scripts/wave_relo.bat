@@ -7,12 +7,11 @@ echo To: G:\02_FL Data\Patches\Packs\Vocals
 echo.
 
 
-:: Move all .wav files, including those in subfolders
-for /r "C:\Users\Kenrm\Documents\Splice" %%f in (*.wav) do (
-    echo Moving: "%%f"
-    move "%%f" "G:\02_FL Data\Patches\Packs\Vocals"
-)
+:: Move all .wav files, including those in subfolders. Name clashes become "name (1).wav",
+:: and the manifest lets an interrupted transfer pick up where it stopped when run again.
+python "%~dp0..\file_scripts\move_samples.py" "C:\Users\Kenrm\Documents\Splice" "G:\02_FL Data\Patches\Packs\Vocals" ^
+    --ext .wav --workers 4 --verify --manifest "%~dp0wave_relo_manifest.jsonl"
 
 echo.
 echo File transfer complete
-pause
\ No newline at end of file
+pause
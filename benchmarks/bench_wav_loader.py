@@ -0,0 +1,97 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import soundfile as sf
+import librosa
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wave_scripts'))
+from wav_loader import load_wav
+
+# (sample rate, soundfile subtype) combinations found in our sample packs
+FORMATS = [
+    (44100, 'PCM_16'),
+    (44100, 'PCM_24'),
+    (48000, 'PCM_24'),
+    (48000, 'FLOAT'),
+]
+
+def synthesize_wav(path, sr, subtype, seconds, channels=2, seed=0):
+    """
+    Writes a noisy two-tone test file.
+
+    Parameters:
+    path (str): Output path.
+    sr (int): Sampling rate.
+    subtype (str): soundfile subtype, e.g. 'PCM_16'.
+    seconds (float): Duration.
+    channels (int): Number of channels. Default is 2.
+    seed (int): Seed for the noise. Default is 0.
+
+    Returns:
+    None
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sr * seconds)) / sr
+    tone = 0.4 * np.sin(2 * np.pi * 220 * t) + 0.2 * np.sin(2 * np.pi * 331 * t)
+    y = tone[:, None] + 0.05 * rng.standard_normal((len(t), channels))
+    sf.write(path, y.astype(np.float32), sr, subtype=subtype)
+
+def time_call(func, repeats):
+    """
+    Returns the best wall time of several calls (after one warm-up call).
+
+    Parameters:
+    func (callable): Function to time.
+    repeats (int): Number of timed calls.
+
+    Returns:
+    float: Best time in seconds.
+    """
+    func()
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def benchmark_loader(seconds=60, repeats=5):
+    """
+    Compares librosa.load's defaults with load_wav at each resampling quality.
+
+    Parameters:
+    seconds (float): Length of each synthesized file. Default is 60.
+    repeats (int): Timed calls per case. Default is 5.
+
+    Returns:
+    list: One dict per (format, loader) case with time, MB/s and real-time factor.
+    """
+    loaders = {
+        'librosa.load': lambda path: librosa.load(path),
+        'load_wav hq': lambda path: load_wav(path, quality='hq'),
+        'load_wav fast': lambda path: load_wav(path, quality='fast'),
+        'load_wav none': lambda path: load_wav(path, quality='none'),
+    }
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for sr, subtype in FORMATS:
+            path = os.path.join(tmp, f"bench_{sr}_{subtype}.wav")
+            synthesize_wav(path, sr, subtype, seconds)
+            megabytes = os.path.getsize(path) / 1e6
+            for name, loader in loaders.items():
+                best = time_call(lambda: loader(path), repeats)
+                rows.append({
+                    'format': f"{sr} Hz {subtype}",
+                    'loader': name,
+                    'seconds': best,
+                    'mb_per_s': megabytes / best,
+                    'x_realtime': seconds / best,
+                })
+    return rows
+
+if __name__ == "__main__":
+    for row in benchmark_loader():
+        print(f"{row['format']:<18} {row['loader']:<14} {row['seconds'] * 1000:8.1f} ms "
+              f"{row['mb_per_s']:8.1f} MB/s {row['x_realtime']:8.0f}x real time")
@@ -0,0 +1,284 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import platform
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import soundfile as sf
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+for folder in ('wave_scripts', 'vis_scripts', 'midi_scripts'):
+    sys.path.insert(0, os.path.join(ROOT, folder))
+
+from instrumentation import peak_rss_mb
+
+# Defaults for the synthesized inputs
+SAMPLE_RATE = 44100
+AUDIO_SECONDS = 30
+LEADING_SILENCE = 2.0
+MELODY_BARS = (4, 16, 64)
+FRAME_RATE = 60
+
+# Regressions above this fraction of the baseline's p50 are flagged by --compare
+DEFAULT_THRESHOLD = 0.10
+
+def synthesize_loop(path, sr=SAMPLE_RATE, seconds=AUDIO_SECONDS, bpm=120, leading_silence=0.0, seed=0):
+    """
+    Writes a stereo 16-bit test loop: a decaying kick on every beat over a sustained
+    A minor chord, so tempo and chroma have something to find.
+
+    Parameters:
+    path (str): Output path.
+    sr (int): Sampling rate. Default is SAMPLE_RATE.
+    seconds (float): Length of the loop (without the silence). Default is AUDIO_SECONDS.
+    bpm (float): Tempo of the kicks. Default is 120.
+    leading_silence (float): Seconds of digital silence before the loop. Default is 0.
+    seed (int): Seed for the noise. Default is 0.
+
+    Returns:
+    None
+    """
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sr * seconds)) / sr
+    chord = sum(0.15 * np.sin(2 * np.pi * f * t) for f in (220.0, 261.63, 329.63))
+    beat_phase = np.mod(t, 60.0 / bpm)
+    kick = 0.6 * np.sin(2 * np.pi * 55 * beat_phase) * np.exp(-beat_phase * 30)
+    y = chord + kick + 0.01 * rng.standard_normal(len(t))
+    y = np.concatenate([np.zeros(int(sr * leading_silence)), y])
+    sf.write(path, np.stack([y, y], axis=1).astype(np.float32), sr, subtype='PCM_16')
+
+# === CASES ===
+# Each case builder prepares its inputs in tmp and returns (func, units_per_call, unit):
+# func is called once per timed sample, units_per_call is the work it does in unit.
+
+def analysis_case(tmp, feature, seconds=AUDIO_SECONDS):
+    from run_librosa import analyze_audio
+
+    path = os.path.join(tmp, 'loop.wav')
+    synthesize_loop(path, seconds=seconds)
+    features = None if feature == 'all' else [feature]
+    return lambda: analyze_audio(path, features), seconds, 'audio s'
+
+def silence_case(tmp, seconds=AUDIO_SECONDS):
+    from remove_leading_audio import remove_leading_silence
+
+    logging.getLogger().setLevel(logging.WARNING)
+    input_file = os.path.join(tmp, 'silence.wav')
+    output_file = os.path.join(tmp, 'trimmed.wav')
+    synthesize_loop(input_file, seconds=seconds, leading_silence=LEADING_SILENCE)
+    return lambda: remove_leading_silence(input_file, output_file), seconds + LEADING_SILENCE, 'audio s'
+
+def melody_case(tmp, bars):
+    from m21_melody_generator import generate_melody_v2
+
+    random.seed(0)
+    output_file = os.path.join(tmp, 'melody.mid')
+    return lambda: generate_melody_v2(bars=bars, scale_name="A minor", energy=0.7, output_file=output_file), bars, 'bars'
+
+def frame_case(tmp, seconds=AUDIO_SECONDS):
+    # No window or sound card: render into SDL's dummy video driver
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    import pygame
+    import basic_music_animation as vis
+
+    path = os.path.join(tmp, 'loop.wav')
+    synthesize_loop(path, seconds=seconds)
+    audio_data = vis.load_audio(path)
+    particle_surface = pygame.Surface((vis.WIDTH, vis.HEIGHT), pygame.SRCALPHA)
+    particles = vis.ParticleSystem(seed=0)
+    frame = [0]
+
+    def render():
+        # Walk through the song at the display rate, wrapping around at the end
+        current_time = (frame[0] / FRAME_RATE) % audio_data['duration']
+        vis.render_frame(vis.screen, particle_surface, audio_data, particles, current_time)
+        frame[0] += 1
+
+    return render, 1, 'frames'
+
+def build_cases(seconds=AUDIO_SECONDS, bars=MELODY_BARS):
+    """
+    Lists every benchmark case.
+
+    Parameters:
+    seconds (float): Length of the synthesized audio. Default is AUDIO_SECONDS.
+    bars (iterable): Bar counts for the melody generator. Default is MELODY_BARS.
+
+    Returns:
+    list: (name, builder, kwargs, repeats) tuples.
+    """
+    from feature_graph import DEFAULT_FEATURES
+
+    cases = []
+    for feature in (*DEFAULT_FEATURES, 'all'):
+        cases.append((f"analyze_audio/{feature}", analysis_case, {'feature': feature, 'seconds': seconds}, 5))
+    cases.append(("remove_leading_silence", silence_case, {'seconds': seconds}, 5))
+    for count in bars:
+        cases.append((f"generate_melody_v2/{count}_bars", melody_case, {'bars': count}, 10))
+    cases.append(("visualizer/render_frame", frame_case, {'seconds': seconds}, FRAME_RATE * 20))
+    return cases
+
+# === RUNNER ===
+
+def _run_case(builder, kwargs, repeats, warmup):
+    # Runs in a fresh process, so peak RSS belongs to this case alone
+    with tempfile.TemporaryDirectory() as tmp:
+        func, units, unit = builder(tmp, **kwargs)
+        for _ in range(warmup):
+            func()
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            func()
+            samples.append(time.perf_counter() - start)
+    return samples, units, unit, peak_rss_mb()
+
+def summarize(name, samples, units, unit, peak_rss):
+    """
+    Reduces the timed samples of one case to the numbers stored in a baseline.
+
+    Parameters:
+    name (str): Case name.
+    samples (list): Wall time of each call in seconds.
+    units (float): Work done per call, in unit.
+    unit (str): What the work is measured in, e.g. 'audio s' or 'frames'.
+    peak_rss (float): Peak RSS of the case's process in MB, or None.
+
+    Returns:
+    dict: Latency percentiles in ms, throughput in units per second and peak RSS.
+    """
+    samples = np.asarray(samples)
+    p50, p90, p99 = np.percentile(samples, [50, 90, 99]) * 1000
+    return {
+        'case': name,
+        'repeats': len(samples),
+        'p50_ms': float(p50),
+        'p90_ms': float(p90),
+        'p99_ms': float(p99),
+        'mean_ms': float(samples.mean() * 1000),
+        'throughput': float(units * len(samples) / samples.sum()),
+        'unit': unit,
+        'peak_rss_mb': peak_rss,
+    }
+
+def environment_metadata():
+    """
+    Collects the interpreter, platform and library versions a baseline was taken with.
+    """
+    import librosa
+    import music21
+    import pygame
+    from importlib.metadata import version
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'librosa': librosa.__version__,
+        'music21': music21.__version__,
+        'pygame': pygame.version.ver,
+        'pydub': version('pydub'),
+    }
+
+def run_benchmarks(output_file=None, only=None, repeats=None, warmup=1, seconds=AUDIO_SECONDS):
+    """
+    Runs the benchmark cases, each in its own process, and optionally saves a JSON baseline.
+
+    Parameters:
+    output_file (str, optional): Path of the JSON baseline to write.
+    only (str, optional): Only run cases whose name contains this substring.
+    repeats (int, optional): Timed calls per case, overriding each case's default.
+    warmup (int): Untimed calls before timing. Default is 1.
+    seconds (float): Length of the synthesized audio. Default is AUDIO_SECONDS.
+
+    Returns:
+    dict: 'metadata' and 'results' (one summary per case).
+    """
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for name, builder, kwargs, default_repeats in build_cases(seconds):
+        if only and only not in name:
+            continue
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            samples, units, unit, peak_rss = executor.submit(
+                _run_case, builder, kwargs, repeats or default_repeats, warmup
+            ).result()
+        row = summarize(name, samples, units, unit, peak_rss)
+        print_row(row)
+        results.append(row)
+
+    baseline = {'metadata': environment_metadata(), 'results': results}
+    if output_file:
+        with open(output_file, 'w') as f:
+            json.dump(baseline, f, indent=2)
+        print(f"Baseline written to {output_file}")
+    return baseline
+
+def print_row(row):
+    rss = f"{row['peak_rss_mb']:8.1f} MB" if row['peak_rss_mb'] is not None else "       n/a"
+    print(f"{row['case']:<36} p50 {row['p50_ms']:9.2f} ms  p90 {row['p90_ms']:9.2f} ms  "
+          f"p99 {row['p99_ms']:9.2f} ms  {row['throughput']:10.1f} {row['unit']}/s  {rss}")
+
+def compare_baselines(base_file, new_file, threshold=DEFAULT_THRESHOLD):
+    """
+    Diffs two baselines case by case and prints the change in p50 latency and peak RSS.
+
+    Parameters:
+    base_file (str): Path of the reference baseline.
+    new_file (str): Path of the baseline to check.
+    threshold (float): Relative p50 slowdown reported as a regression. Default is DEFAULT_THRESHOLD.
+
+    Returns:
+    list: Names of the cases that regressed.
+    """
+    with open(base_file) as f:
+        base = json.load(f)
+    with open(new_file) as f:
+        new = json.load(f)
+
+    for key in sorted(set(base['metadata']) | set(new['metadata'])):
+        old_value, new_value = base['metadata'].get(key), new['metadata'].get(key)
+        if old_value != new_value and key != 'timestamp':
+            print(f"{key}: {old_value} -> {new_value}")
+
+    base_rows = {row['case']: row for row in base['results']}
+    regressions = []
+    for row in new['results']:
+        old = base_rows.get(row['case'])
+        if old is None:
+            print(f"{row['case']:<36} (new case)")
+            continue
+        change = row['p50_ms'] / old['p50_ms'] - 1
+        rss = ""
+        if row['peak_rss_mb'] is not None and old['peak_rss_mb'] is not None:
+            rss = f"  peak RSS {old['peak_rss_mb']:.1f} -> {row['peak_rss_mb']:.1f} MB"
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(row['case'])
+        print(f"{row['case']:<36} p50 {old['p50_ms']:9.2f} -> {row['p50_ms']:9.2f} ms ({change:+.1%}){rss}{flag}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks analysis, silence trimming, MIDI generation and visualizer frames.")
+    parser.add_argument('--output', help="Write the results as a JSON baseline")
+    parser.add_argument('--only', help="Only run cases whose name contains this text")
+    parser.add_argument('--repeats', type=int, help="Timed calls per case")
+    parser.add_argument('--seconds', type=float, default=AUDIO_SECONDS, help="Length of the synthesized audio")
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'), help="Diff two saved baselines")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="Relative p50 slowdown counted as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare_baselines(*args.compare, threshold=args.threshold) else 0)
+    run_benchmarks(args.output, args.only, args.repeats, seconds=args.seconds)
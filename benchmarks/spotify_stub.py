@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wave_scripts'))
+from spotify_enrichment import BATCH_ENDPOINTS, SpotifyAPI, ResponseCache, SpotifyEnricher
+
+def _fake_track_id(query):
+    # 22 characters like a real track ID, the same for the same query
+    return hashlib.blake2b(query.lower().encode(), digest_size=11).hexdigest()
+
+def _fake_audio_features(track_id):
+    # Stable made-up values, so the stub answers the same way on every run
+    seed = int.from_bytes(hashlib.blake2b(track_id.encode(), digest_size=8).digest(), 'little')
+    rng = random.Random(seed)
+    return {'id': track_id, 'valence': round(rng.random(), 3), 'energy': round(rng.random(), 3),
+            'danceability': round(rng.random(), 3), 'tempo': round(rng.uniform(70, 180), 3),
+            'key': rng.randrange(12), 'mode': rng.randrange(2)}
+
+class StubSpotifyServer:
+    """
+    Local stand-in for the token, search and batch endpoints of the Spotify API, for
+    running the enrichment without network access. Runs in a background thread.
+
+    IDs starting with 'unknown' get null like unknown IDs on Spotify and searches for an
+    'unknown' artist find nothing; every rate_limit_every-th
+    request is answered with a 429 and a Retry-After of retry_after seconds.
+
+    Parameters:
+    rate_limit_every (int, optional): Rate-limit every n-th API request. Default is never.
+    retry_after (float): Retry-After sent with a 429. Default is 0.
+    latency (float): Seconds each API response is delayed. Default is 0.
+
+    Attributes:
+    api_url, token_url (str): URLs to pass to SpotifyAPI.
+    requests (list): (path, number of IDs, status) of every API request served.
+    """
+    def __init__(self, rate_limit_every=None, retry_after=0, latency=0.0):
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.latency = latency
+        self.requests = []
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload, headers=()):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if urlparse(self.path).path != '/api/token':
+                    return self._send(404, {'error': 'not found'})
+                self._send(200, {'access_token': 'stub-token', 'token_type': 'Bearer', 'expires_in': 3600})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                endpoint = url.path.rsplit('/', 1)[-1]
+                ids = [item_id for item_id in parse_qs(url.query).get('ids', [''])[0].split(',') if item_id]
+                if self.headers.get('Authorization') != 'Bearer stub-token':
+                    return self._send(401, {'error': {'status': 401, 'message': 'Invalid access token'}})
+                if endpoint == 'search':
+                    key, limit = 'tracks', 1
+                elif endpoint in BATCH_ENDPOINTS:
+                    key, limit = BATCH_ENDPOINTS[endpoint]
+                else:
+                    return self._send(404, {'error': {'status': 404, 'message': 'Not found'}})
+                with stub._lock:
+                    count = len(stub.requests) + 1
+                    limited = stub.rate_limit_every and count % stub.rate_limit_every == 0
+                    status = 429 if limited else 400 if len(ids) > limit else 200
+                    stub.requests.append((url.path, len(ids), status))
+                time.sleep(stub.latency)
+                if status == 429:
+                    return self._send(429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}},
+                                      [('Retry-After', str(stub.retry_after))])
+                if status == 400:
+                    return self._send(400, {'error': {'status': 400, 'message': 'Too many ids requested'}})
+                if endpoint == 'search':
+                    query = parse_qs(url.query).get('q', [''])[0]
+                    items = [] if 'artist:unknown' in query.lower() else [{'id': _fake_track_id(query)}]
+                    return self._send(200, {'tracks': {'items': items}})
+                items = [None if item_id.startswith('unknown') else
+                         _fake_audio_features(item_id) if endpoint == 'audio-features' else
+                         {'id': item_id, 'name': f'Track {item_id}'} for item_id in ids]
+                self._send(200, {key: items})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        host, port = self.server.server_address
+        self.api_url = f'http://{host}:{port}/v1'
+        self.token_url = f'http://{host}:{port}/api/token'
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+# Example usage: enrich 1000 made-up IDs against the local stub, twice
+if __name__ == "__main__":
+    track_ids = [f'track{i:05d}' for i in range(1000)] + ['unknown1']
+    with StubSpotifyServer(rate_limit_every=7, latency=0.05) as stub, ResponseCache(':memory:') as cache:
+        api = SpotifyAPI('client-id', 'client-secret', api_url=stub.api_url, token_url=stub.token_url)
+        enricher = SpotifyEnricher(api, cache, workers=4)
+        for run in range(2):
+            start = time.perf_counter()
+            features = enricher.audio_features(track_ids)
+            print(f"Run {run + 1}: {len(features)} tracks in {time.perf_counter() - start:.2f} s, "
+                  f"{api.requests_sent} requests so far, {api.rate_limited} rate-limited")
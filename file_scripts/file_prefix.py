@@ -1,10 +1,272 @@
-import random
-import pandas as pd
+import os
+import re
+import json
 import string
+import tempfile
+import numpy as np
+
+CHARSETS = {
+    "alpha": string.ascii_uppercase,  # A-Z (uppercase only)
+    "numeric": string.digits,  # 0-9
+    "alphanumeric": string.ascii_uppercase + string.digits,  # A-Z (uppercase only) + 0-9
+}
+
+# Code spaces up to this size are sampled from an explicit list of the free codes, kept
+# up to date as codes are taken and released; larger ones by drawing random codes and
+# rejecting those already taken
+DENSE_SPACE = 1 << 22
+
+def _charset(alphanumeric):
+    if alphanumeric not in CHARSETS:
+        raise ValueError("Invalid value for 'alphanumeric'. Choose from 'alpha', 'numeric', or 'alphanumeric'.")
+    return CHARSETS[alphanumeric]
+
+def scan_prefixes(roots, length=3, alphanumeric="alpha", separator='-'):
+    """
+    Finds the prefixes already used by file and folder names, e.g. 'BLZ' in 'BLZ-EDM Loops'.
+
+    Parameters:
+    roots (iterable): Folders to scan recursively.
+    length (int): Length of a prefix. Default is 3.
+    alphanumeric (str): Characters a prefix is made of: "alpha", "numeric" or "alphanumeric".
+    separator (str): Text between the prefix and the rest of the name. Default is '-'.
+
+    Returns:
+    dict: Prefix -> number of names using it.
+    """
+    pattern = re.compile(f"^([{re.escape(_charset(alphanumeric))}]{{{length}}}){re.escape(separator)}")
+    found = {}
+    for root in roots:
+        stack = [root]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError as e:
+                print(f"Skipping {e.filename}: {e.strerror}")
+                continue
+            with entries:
+                for entry in entries:
+                    match = pattern.match(entry.name)
+                    if match:
+                        found[match.group(1)] = found.get(match.group(1), 0) + 1
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+    return found
+
+class PrefixAllocator:
+    """
+    Hands out unique fixed-length codes (e.g. 'BLZ') and remembers every code ever assigned
+    in a JSON registry, so new packs never reuse a prefix already on disk.
+
+    Codes are numbers in base len(charset) below len(charset) ** length; drawing is done
+    with NumPy sampling without replacement over the free part of that space. In spaces up
+    to DENSE_SPACE the free codes are kept in the first part of an array (with the slot of
+    every code alongside), so taking or releasing a code is a swap and a draw costs O(n).
+
+    Parameters:
+    registry_path (str, optional): JSON registry to load and save. Default is in-memory only.
+    length (int): Length of each code. Default is 3.
+    alphanumeric (str): "alpha", "numeric" or "alphanumeric". Default is "alpha".
+    seed (int, optional): Seed for the random generator.
+    """
+    def __init__(self, registry_path=None, length=3, alphanumeric="alpha", seed=None):
+        self.registry_path = registry_path
+        self.length = length
+        self.alphanumeric = alphanumeric
+        self.charset = _charset(alphanumeric)
+        self.base = len(self.charset)
+        self.space = self.base ** length
+        self.rng = np.random.default_rng(seed)
+        self.assigned = {}  # code -> label
+        self._taken = set()  # code indices
+        self._lookup = {char: value for value, char in enumerate(self.charset)}
+        self._digits = np.array(list(self.charset))
+        self._powers = self.base ** np.arange(length - 1, -1, -1, dtype=np.int64)
+        if self.space <= DENSE_SPACE:
+            # Free codes are _free[:_free_count]; _slot[code] is the code's position in _free
+            self._free = np.arange(self.space, dtype=np.int32)
+            self._slot = np.arange(self.space, dtype=np.int32)
+            self._free_count = self.space
+        if registry_path and os.path.exists(registry_path):
+            self.load(registry_path)
+
+    def __len__(self):
+        return len(self.assigned)
+
+    def __contains__(self, code):
+        return code in self.assigned
+
+    @property
+    def available(self):
+        return self.space - len(self._taken)
+
+    def _index(self, code):
+        if len(code) != self.length or any(char not in self._lookup for char in code):
+            raise ValueError(f"'{code}' is not a {self.length}-character {self.alphanumeric} code")
+        index = 0
+        for char in code:
+            index = index * self.base + self._lookup[char]
+        return index
+
+    def _move(self, index, slot):
+        # Swaps a code with the one at slot in the free list
+        other = self._free[slot]
+        current = self._slot[index]
+        self._free[slot], self._free[current] = index, other
+        self._slot[index], self._slot[other] = slot, current
+
+    def _take(self, index):
+        self._taken.add(index)
+        if self.space <= DENSE_SPACE:
+            self._free_count -= 1
+            self._move(index, self._free_count)
+
+    def _give_back(self, index):
+        self._taken.discard(index)
+        if self.space <= DENSE_SPACE:
+            self._move(index, self._free_count)
+            self._free_count += 1
+
+    def _codes(self, indices):
+        # Vectorized base conversion: one column of digits per position
+        digits = (np.asarray(indices, dtype=np.int64)[:, None] // self._powers) % self.base
+        return [''.join(row) for row in self._digits[digits]]
+
+    def reserve(self, codes, label=None):
+        """
+        Marks codes as taken, e.g. prefixes found on disk. Codes already in the registry keep
+        their label.
+
+        Parameters:
+        codes (iterable): Codes to reserve.
+        label (str, optional): What the codes are used for.
+
+        Returns:
+        int: Number of codes newly reserved.
+        """
+        added = 0
+        for code in codes:
+            if code not in self.assigned:
+                self._take(self._index(code))
+                self.assigned[code] = label
+                added += 1
+        return added
+
+    def seed_from_folders(self, roots, separator='-'):
+        """
+        Reserves every prefix already used under the given folders (see scan_prefixes).
+
+        Parameters:
+        roots (iterable): Library folders to scan.
+        separator (str): Text between the prefix and the rest of the name. Default is '-'.
+
+        Returns:
+        int: Number of prefixes newly reserved.
+        """
+        found = scan_prefixes(roots, self.length, self.alphanumeric, separator)
+        return self.reserve(sorted(found), label='on disk')
+
+    def _draw(self, n):
+        if self.space <= DENSE_SPACE:
+            slots = self.rng.choice(self._free_count, size=n, replace=False)
+            return self._free[slots].astype(np.int64)
+
+        # Sparse registry in a huge space: almost every draw is free, so a couple of
+        # oversampled rounds give n new codes
+        drawn = np.empty(0, dtype=np.int64)
+        while len(drawn) < n:
+            fraction_free = self.available / self.space
+            batch = self.rng.integers(0, self.space, size=int((n - len(drawn)) / fraction_free * 1.1) + 16)
+            batch = np.unique(batch)
+            batch = batch[[index not in self._taken for index in batch.tolist()]]
+            drawn = np.union1d(drawn, batch)
+        return self.rng.permutation(drawn)[:n]
+
+    def allocate(self, n, label=None, save=True):
+        """
+        Draws n codes that are neither in the registry nor among each other, and records them.
+
+        Parameters:
+        n (int): Number of codes.
+        label (str, optional): What the codes are for, stored in the registry.
+        save (bool): Write the registry afterwards (if it has a path). Default is True.
+
+        Returns:
+        list: The new codes, in the order drawn.
+        """
+        if n > self.available:
+            raise ValueError(f"Only {self.available} of {self.space} codes are still free, can't allocate {n}")
+        if n <= 0:
+            return []
+        indices = self._draw(n)
+        codes = self._codes(indices)
+        for index in indices.tolist():
+            self._take(index)
+        for code in codes:
+            self.assigned[code] = label
+        if save and self.registry_path:
+            self.save()
+        return codes
+
+    def release(self, codes, save=True):
+        """
+        Removes codes from the registry so they can be allocated again.
+
+        Parameters:
+        codes (iterable): Codes to release.
+        save (bool): Write the registry afterwards (if it has a path). Default is True.
+
+        Returns:
+        None
+        """
+        for code in codes:
+            if self.assigned.pop(code, False) is not False:
+                self._give_back(self._index(code))
+        if save and self.registry_path:
+            self.save()
+
+    def save(self, path=None):
+        """
+        Writes the registry as JSON, replacing the old file only once the new one is complete.
+
+        Parameters:
+        path (str, optional): Output path. Default is the registry_path.
+
+        Returns:
+        None
+        """
+        path = path or self.registry_path
+        folder = os.path.dirname(os.path.abspath(path))
+        fd, temp_path = tempfile.mkstemp(dir=folder, prefix='.prefixes-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'length': self.length, 'alphanumeric': self.alphanumeric,
+                           'assigned': dict(sorted(self.assigned.items()))}, f, indent=4)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def load(self, path):
+        """
+        Reserves every code of a saved registry.
+
+        Parameters:
+        path (str): Registry written by save().
+
+        Returns:
+        None
+        """
+        with open(path) as f:
+            registry = json.load(f)
+        if registry['length'] != self.length or registry['alphanumeric'] != self.alphanumeric:
+            raise ValueError(f"{path} holds {registry['length']}-character {registry['alphanumeric']} codes")
+        for code, label in registry['assigned'].items():
+            self.reserve([code], label)
 
 def generate_random_strings(length, n, seed=None, alphanumeric="alpha"):
     """
-    Generates a series of random strings based on the specified parameters.
+    Generates unique random strings based on the specified parameters.
 
     Parameters:
     - length (int): Length of each string.
@@ -13,35 +275,17 @@ def generate_random_strings(length, n, seed=None, alphanumeric="alpha"):
     - alphanumeric (str): Type of strings to generate. Options are "alpha", "numeric", "alphanumeric".
 
     Returns:
-    - pd.DataFrame: A DataFrame with n rows of alphabetically ordered random strings.
+    - list: n distinct strings in alphabetical order.
     """
-    # Set the random seed if provided
-    if seed is not None:
-        random.seed(seed)
-
-    # Determine the character set based on the alphanumeric parameter
-    if alphanumeric == "alpha":
-        char_set = string.ascii_uppercase  # A-Z (uppercase only)
-    elif alphanumeric == "numeric":
-        char_set = string.digits  # 0-9
-    elif alphanumeric == "alphanumeric":
-        char_set = string.ascii_uppercase + string.digits  # A-Z (uppercase only) + 0-9
-    else:
-        raise ValueError("Invalid value for 'alphanumeric'. Choose from 'alpha', 'numeric', or 'alphanumeric'.")
-
-    # Generate the random strings
-    random_strings = [''.join(random.choices(char_set, k=length)) for _ in range(n)]
-
-    # Sort the strings alphabetically
-    random_strings.sort()
-
-    # Create a DataFrame
-    df = pd.DataFrame(random_strings, columns=["Random Strings"])
-
-    return df
+    return sorted(PrefixAllocator(length=length, alphanumeric=alphanumeric, seed=seed).allocate(n))
 
 # Example usage
 if __name__ == "__main__":
-    df = generate_random_strings(length=3, n=300, seed=42, alphanumeric="alpha")
-    df.to_csv("random_strings.csv", index=False)
-    print(df)
\ No newline at end of file
+    allocator = PrefixAllocator("prefixes.json", length=3, alphanumeric="alpha")
+    allocator.seed_from_folders([
+        r"C:\Users\Kenrm\OneDrive\Documents\Image-Line\FL Studio\Projects\Stem Packages",
+        r"C:\Users\Kenrm\OneDrive\Documents\Image-Line\FL Studio\Projects\01_Melodic Stems",
+    ])
+    codes = allocator.allocate(300, label="new packs")
+    print(f"{len(codes)} new prefixes, {allocator.available} still free")
+    print(sorted(codes))
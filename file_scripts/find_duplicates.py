@@ -0,0 +1,320 @@
+import os
+import json
+import hashlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+# Bytes hashed from the start and from the end of each candidate before a full hash
+PARTIAL_BYTES = 64 * 1024
+
+# Read size of the full hash
+HASH_BLOCK = 1024 * 1024
+
+def _hasher():
+    return hashlib.blake2b(digest_size=20)
+
+def scan_files(roots, extensions=None, min_size=1):
+    """
+    Lists regular files under one or more folders with a single scandir pass (no extra stat calls
+    on platforms where scandir returns them with the directory listing).
+
+    Roots may overlap (a folder and one of its sub-folders, or the same folder reached
+    through a link); every file is listed once, under the earliest root that contains it.
+
+    Parameters:
+    roots (iterable): Folders to scan recursively.
+    extensions (iterable, optional): Lower-case extensions to include, e.g. ('.wav', '.fst').
+        Default is every file.
+    min_size (int): Smallest file size to include. Default is 1 (skip empty files).
+
+    Returns:
+    list: (path, size, (device, inode), root_index) tuples.
+    """
+    extensions = tuple(extensions) if extensions else None
+    files = []
+    seen = set()
+    for root_index, root in enumerate(roots):
+        root = os.path.normpath(root)
+        # Canonical path of each file: the resolved root plus the path below it
+        real_root = os.path.realpath(root)
+        stack = [root]
+        while stack:
+            try:
+                entries = os.scandir(stack.pop())
+            except OSError as e:
+                print(f"Skipping {e.filename}: {e.strerror}")
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        if extensions and not entry.name.lower().endswith(extensions):
+                            continue
+                        key = os.path.normcase(os.path.join(real_root, os.path.relpath(entry.path, root)))
+                        if key in seen:
+                            continue
+                        seen.add(key)
+                        stat = entry.stat(follow_symlinks=False)
+                        if stat.st_size >= min_size:
+                            files.append((entry.path, stat.st_size, (stat.st_dev, stat.st_ino), root_index))
+    return files
+
+def partial_hash(file_path, size, partial_bytes=PARTIAL_BYTES):
+    """
+    Hashes the first and last partial_bytes of a file.
+
+    Parameters:
+    file_path (str): Path to the file.
+    size (int): File size in bytes.
+    partial_bytes (int): Bytes read from each end. Default is PARTIAL_BYTES.
+
+    Returns:
+    tuple: (digest, complete) where complete is True if the whole file was hashed.
+    """
+    hasher = _hasher()
+    with open(file_path, 'rb') as f:
+        hasher.update(f.read(partial_bytes))
+        if size > partial_bytes:
+            f.seek(max(partial_bytes, size - partial_bytes))
+            hasher.update(f.read(partial_bytes))
+    return hasher.hexdigest(), size <= 2 * partial_bytes
+
+def full_hash(file_path):
+    """
+    Hashes a whole file in HASH_BLOCK reads.
+
+    Parameters:
+    file_path (str): Path to the file.
+
+    Returns:
+    str: Hex digest.
+    """
+    hasher = _hasher()
+    with open(file_path, 'rb', buffering=0) as f:
+        buffer = bytearray(HASH_BLOCK)
+        view = memoryview(buffer)
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            hasher.update(view[:count])
+    return hasher.hexdigest()
+
+def _hash_all(executor, func, items, batch_size=4096):
+    # Runs func(*item) over items in the pool, a batch at a time so millions of files
+    # don't mean millions of pending futures; files that can't be read are dropped
+    results = {}
+    for start in range(0, len(items), batch_size):
+        batch = items[start:start + batch_size]
+        futures = [executor.submit(func, *item) for item in batch]
+        for item, future in zip(batch, futures):
+            try:
+                results[item] = future.result()
+            except OSError as e:
+                print(f"Skipping {item[0]}: {e.strerror}")
+    return results
+
+def find_duplicates(roots, extensions=None, min_size=1, partial_bytes=PARTIAL_BYTES, workers=8):
+    """
+    Finds files with identical contents across one or more folder trees, whatever their names.
+
+    Files are grouped by size first; only sizes shared by several files get their first and
+    last partial_bytes hashed, and only files whose partial hashes still collide are hashed
+    in full. Hard links to the same file are hashed once.
+
+    Parameters:
+    roots (iterable): Folders to scan recursively.
+    extensions (iterable, optional): Lower-case extensions to include. Default is every file.
+    min_size (int): Smallest file size to consider. Default is 1.
+    partial_bytes (int): Bytes hashed from each end in the partial pass. Default is PARTIAL_BYTES.
+    workers (int): Number of threads reading files. Default is 8.
+
+    Returns:
+    list: One dict per group of identical files, largest total waste first, with 'size',
+    'hash' and 'files' (a list of {'path', 'inode', 'root'} dicts sorted by root and path).
+    """
+    by_size = defaultdict(list)
+    for path, size, inode, root_index in scan_files(roots, extensions, min_size):
+        by_size[size].append((path, inode, root_index))
+
+    # Sizes shared by at least two distinct files; one representative path per inode
+    candidates = {}
+    for size, files in by_size.items():
+        inodes = {}
+        for path, inode, _ in files:
+            inodes.setdefault(inode, path)
+        if len(inodes) > 1:
+            candidates[size] = inodes
+
+    groups = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        partial = _hash_all(executor, lambda path, size: partial_hash(path, size, partial_bytes),
+                            [(path, size) for size, inodes in candidates.items() for path in inodes.values()])
+
+        by_partial = defaultdict(list)
+        for (path, size), (digest, complete) in partial.items():
+            by_partial[(size, digest, complete)].append(path)
+        to_hash = [(path,) for (size, digest, complete), paths in by_partial.items()
+                   if len(paths) > 1 and not complete for path in paths]
+        full = _hash_all(executor, full_hash, to_hash)
+
+    by_hash = defaultdict(list)
+    for (size, digest, complete), paths in by_partial.items():
+        if len(paths) < 2:
+            continue
+        for path in paths:
+            if complete:
+                by_hash[(size, digest)].append(path)
+            elif (path,) in full:
+                by_hash[(size, full[(path,)])].append(path)
+
+    for (size, digest), paths in by_hash.items():
+        if len(paths) < 2:
+            continue
+        # Expand each hashed inode back to every path that links to it
+        paths = set(paths)
+        inodes = {inode for inode, path in candidates[size].items() if path in paths}
+        members = [
+            {'path': path, 'inode': list(inode), 'root': root_index}
+            for path, inode, root_index in by_size[size]
+            if inode in inodes
+        ]
+        members.sort(key=lambda member: (member['root'], member['path']))
+        groups.append({'size': size, 'hash': digest, 'files': members})
+
+    groups.sort(key=wasted_bytes, reverse=True)
+    return groups
+
+def wasted_bytes(group):
+    """
+    Returns the bytes that removing all but one copy of a group would free (hard links
+    to the same file don't count twice).
+    """
+    return group['size'] * (len({tuple(member['inode']) for member in group['files']}) - 1)
+
+def _keeper(group, keep):
+    files = group['files']
+    if keep == 'first_root':
+        return files[0]
+    if keep == 'shortest_path':
+        return min(files, key=lambda member: (len(member['path']), member['path']))
+    if keep == 'oldest':
+        return min(files, key=lambda member: (os.stat(member['path']).st_mtime, member['path']))
+    raise ValueError("Invalid value for 'keep'. Choose from 'first_root', 'shortest_path', or 'oldest'.")
+
+def plan_actions(groups, action='delete', keep='first_root'):
+    """
+    Plans how to get rid of the extra copies of each duplicate group.
+
+    Parameters:
+    groups (list): Result of find_duplicates.
+    action (str): 'delete' the extra copies or replace them with a 'hardlink' to the kept file.
+        Default is 'delete'.
+    keep (str): Which copy to keep: 'first_root' (the copy under the earliest folder passed to
+        find_duplicates, then the first path), 'shortest_path' or 'oldest'. Default is 'first_root'.
+
+    Returns:
+    list: {'action', 'path', 'keep', 'size'} dicts, one per file to change.
+    """
+    if action not in ('delete', 'hardlink'):
+        raise ValueError("Invalid value for 'action'. Choose from 'delete' or 'hardlink'.")
+    plan = []
+    for group in groups:
+        keeper = _keeper(group, keep)
+        for member in group['files']:
+            if member['path'] == keeper['path']:
+                continue
+            if action == 'hardlink' and member['inode'] == keeper['inode']:
+                continue  # Already a link to the kept file
+            plan.append({'action': action, 'path': member['path'], 'keep': keeper['path'], 'size': group['size']})
+    return plan
+
+def apply_plan(plan, dry_run=False):
+    """
+    Carries out a plan from plan_actions. Hard links are created under a temporary name and
+    renamed over the duplicate, so a failure never loses the file. A path that is kept by
+    any step is never touched, and no path is acted on twice.
+
+    Parameters:
+    plan (list): Result of plan_actions.
+    dry_run (bool): Only print what would be done. Default is False.
+
+    Returns:
+    int: Number of actions carried out (or that would be).
+    """
+    def canonical(path):
+        return os.path.normcase(os.path.realpath(path))
+
+    kept = {canonical(step['keep']) for step in plan}
+    handled = set()
+    done = 0
+    for step in plan:
+        target = canonical(step['path'])
+        if target in kept or target in handled:
+            print(f"Skipping {step['path']}: it is kept or was already handled")
+            continue
+        handled.add(target)
+        if dry_run:
+            print(f"Would {step['action']}: {step['path']} (same as {step['keep']})")
+            done += 1
+            continue
+        try:
+            if step['action'] == 'delete':
+                os.remove(step['path'])
+            else:
+                temp_path = f"{step['path']}.dedup-tmp"
+                os.link(step['keep'], temp_path)
+                try:
+                    os.replace(temp_path, step['path'])
+                except OSError:
+                    os.remove(temp_path)
+                    raise
+            print(f"{'Removed' if step['action'] == 'delete' else 'Linked'} duplicate file: {step['path']}")
+            done += 1
+        except OSError as e:
+            print(f"Error processing {step['path']}: {e}")
+    return done
+
+def write_report(groups, report_file):
+    """
+    Writes the duplicate groups as JSON.
+
+    Parameters:
+    groups (list): Result of find_duplicates.
+    report_file (str): Output path.
+
+    Returns:
+    None
+    """
+    with open(report_file, 'w') as f:
+        json.dump({'wasted_bytes': sum(wasted_bytes(group) for group in groups), 'groups': groups}, f, indent=4)
+
+def print_report(groups, limit=20):
+    """
+    Prints a summary of the duplicate groups, largest waste first.
+
+    Parameters:
+    groups (list): Result of find_duplicates.
+    limit (int): Number of groups to list. Default is 20.
+
+    Returns:
+    None
+    """
+    total = sum(wasted_bytes(group) for group in groups)
+    copies = sum(len(group['files']) - 1 for group in groups)
+    print(f"{len(groups)} groups of identical files, {copies} extra copies, {total / 1e6:.1f} MB reclaimable")
+    for group in groups[:limit]:
+        print(f"{wasted_bytes(group) / 1e6:8.2f} MB  {group['hash'][:12]}")
+        for member in group['files']:
+            print(f"    {member['path']}")
+
+# Example usage
+if __name__ == "__main__":
+    roots = [
+        r"C:\Users\Kenrm\repositories\music-prod\New Presets",
+        r"C:\Users\Kenrm\repositories\music-prod\To Dedup",
+    ]
+    groups = find_duplicates(roots, extensions=('.wav', '.fst'))
+    print_report(groups)
+    apply_plan(plan_actions(groups, action='hardlink'), dry_run=True)
@@ -0,0 +1,268 @@
+import os
+import sys
+import errno
+import json
+import shutil
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wave_scripts'))
+from file_copy import copy_byte_range
+
+# Buffer of the plain read/write copy used when the kernel can't copy between the two files
+COPY_BUFFER = 4 * 1024 * 1024
+
+# Suffix of a copy in progress; it only gets its real name once complete
+PARTIAL_SUFFIX = '.part'
+
+# os.link errors meaning the file system can't link the two paths, rather than a failure
+NO_LINK_ERRORS = (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP)
+
+def _free_name(folder, name, taken):
+    # 'kick.wav', then 'kick (1).wav', 'kick (2).wav', ...
+    stem, extension = os.path.splitext(name)
+    candidate, counter = name, 0
+    while os.path.normcase(os.path.join(folder, candidate)) in taken or os.path.exists(os.path.join(folder, candidate)):
+        counter += 1
+        candidate = f"{stem} ({counter}){extension}"
+    taken.add(os.path.normcase(os.path.join(folder, candidate)))
+    return os.path.join(folder, candidate)
+
+def plan_moves(source, destination, extensions=('.wav',), keep_folders=False):
+    """
+    Lists the files to move and where each one goes.
+
+    Parameters:
+    source (str): Folder to move files out of, scanned recursively.
+    destination (str): Folder to move them into.
+    extensions (iterable, optional): Lower-case extensions to move. Default is ('.wav',);
+        None moves every file.
+    keep_folders (bool): Recreate the source sub-folders under the destination. Default is
+        False, which puts every file directly in the destination like the old batch script,
+        renaming clashes to 'name (1).wav', 'name (2).wav', ...
+
+    Returns:
+    list: (source_path, target_path, size) tuples.
+    """
+    extensions = tuple(extensions) if extensions else None
+    moves = []
+    taken = set()
+    stack = [source]
+    while stack:
+        folder = stack.pop()
+        try:
+            entries = sorted(os.scandir(folder), key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"Skipping {e.filename}: {e.strerror}")
+            continue
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                stack.append(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                if extensions and not entry.name.lower().endswith(extensions):
+                    continue
+                if keep_folders:
+                    target_folder = os.path.normpath(os.path.join(destination, os.path.relpath(folder, source)))
+                else:
+                    target_folder = destination
+                target = _free_name(target_folder, entry.name, taken)
+                moves.append((entry.path, target, entry.stat(follow_symlinks=False).st_size))
+    return moves
+
+def copy_file(source, target, verify=False):
+    """
+    Copies a file inside the kernel where possible (copy_file_range, then sendfile) and
+    through a large buffer otherwise, flushing it to disk before returning.
+
+    Parameters:
+    source (str): File to copy.
+    target (str): Path of the copy; an existing file is overwritten.
+    verify (bool): Read both files back and compare their hashes. Default is False.
+
+    Returns:
+    None
+    """
+    size = os.path.getsize(source)
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        copy_byte_range(src, dst, 0, size, COPY_BUFFER)
+        dst.flush()
+        os.fsync(dst.fileno())
+    shutil.copystat(source, target)
+
+    if verify and file_hash(source) != file_hash(target):
+        raise OSError(f"Copy of {source} doesn't match the original")
+
+def file_hash(file_path):
+    """
+    Returns the blake2b hex digest of a file.
+    """
+    hasher = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb', buffering=0) as f:
+        buffer = bytearray(COPY_BUFFER)
+        view = memoryview(buffer)
+        while True:
+            count = f.readinto(buffer)
+            if not count:
+                break
+            hasher.update(view[:count])
+    return hasher.hexdigest()
+
+def _link_into_place(source, target):
+    # Gives source the name target with a hard link, which raises FileExistsError rather
+    # than replacing a file that appeared there; False where the paths can't be linked
+    try:
+        os.link(source, target)
+    except OSError as e:
+        if e.errno in NO_LINK_ERRORS:
+            return False
+        raise
+    os.remove(source)
+    return True
+
+def move_file(source, target, verify=False):
+    """
+    Moves a file without ever overwriting the target. On the same file system this is a
+    hard link to the new name followed by removing the old one; otherwise the file is copied
+    under a temporary name, linked into place once complete, and only then removed from the
+    source. A target left by an interrupted earlier move only counts as done when its
+    contents match the source.
+
+    Parameters:
+    source (str): File to move.
+    target (str): New path.
+    verify (bool): Compare hashes after a cross-device copy. Default is False.
+
+    Returns:
+    str: 'renamed' or 'copied'.
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    if os.path.exists(target):
+        source_stat, target_stat = os.stat(source), os.stat(target)
+        if (source_stat.st_size, source_stat.st_mtime_ns) != (target_stat.st_size, target_stat.st_mtime_ns) \
+                or file_hash(source) != file_hash(target):
+            raise FileExistsError(f"{target} already exists")
+        # A copy that was put into place before an interruption; only the source is left
+        os.remove(source)
+        return 'copied'
+
+    if os.stat(source).st_dev == os.stat(os.path.dirname(target)).st_dev \
+            and _link_into_place(source, target):
+        return 'renamed'
+
+    partial_path = target + PARTIAL_SUFFIX
+    try:
+        copy_file(source, partial_path, verify)
+        if not _link_into_place(partial_path, target):
+            # No hard links on this file system: the best left is a checked replace
+            if os.path.exists(target):
+                raise FileExistsError(f"{target} already exists")
+            os.replace(partial_path, target)
+    except BaseException:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+    os.remove(source)
+    return 'copied'
+
+def read_manifest(manifest_path):
+    """
+    Reads a manifest back into the planned target and last outcome of each source.
+
+    Parameters:
+    manifest_path (str): Manifest written by move_files.
+
+    Returns:
+    tuple: (planned, done) dicts of source path -> target path; done only holds the
+    sources that were moved.
+    """
+    planned, done = {}, {}
+    if manifest_path and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Line cut short by an interruption
+                # The latest line about a source wins: a file moved earlier can reappear
+                if entry['status'] == 'planned':
+                    planned[entry['source']] = entry['target']
+                    done.pop(entry['source'], None)
+                elif entry['status'] in ('renamed', 'copied'):
+                    done[entry['source']] = entry['target']
+                    planned.pop(entry['source'], None)
+    return planned, done
+
+def move_files(moves, workers=4, manifest_path=None, verify=False, dry_run=False):
+    """
+    Moves files in parallel, appending the outcome of each to a JSONL manifest as it
+    completes. The plan is written to the manifest first and reused on the next run, so an
+    interrupted run can simply be started again.
+
+    Parameters:
+    moves (list): (source, target, size) tuples, e.g. from plan_moves.
+    workers (int): Number of files moved at once. Default is 4.
+    manifest_path (str, optional): JSONL manifest to resume from and append to.
+    verify (bool): Compare hashes after cross-device copies. Default is False.
+    dry_run (bool): Only print the moves. Default is False.
+
+    Returns:
+    dict: Counts of 'renamed', 'copied', 'skipped' and 'failed' files, and 'bytes' moved.
+    """
+    planned, done = read_manifest(manifest_path)
+    # A source that was planned before keeps its target, so a copy interrupted after it
+    # got its name is recognized instead of being moved a second time
+    pending = [(source, planned.get(source, target), size) for source, target, size in moves
+               if not (source in done and not os.path.exists(source))]
+    totals = {'renamed': 0, 'copied': 0, 'skipped': len(moves) - len(pending), 'failed': 0, 'bytes': 0}
+    if dry_run:
+        for source, target, size in pending:
+            print(f"Would move: {source} -> {target}")
+        return totals
+
+    manifest = open(manifest_path, 'a') if manifest_path else None
+    try:
+        if manifest:
+            for source, target, size in pending:
+                if planned.get(source) != target:
+                    manifest.write(json.dumps({'source': source, 'target': target, 'size': size, 'status': 'planned'}) + '\n')
+            manifest.flush()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(move_file, source, target, verify): (source, target, size)
+                       for source, target, size in pending}
+            for future in as_completed(futures):
+                source, target, size = futures[future]
+                entry = {'source': source, 'target': target, 'size': size}
+                try:
+                    entry['status'] = future.result()
+                    totals[entry['status']] += 1
+                    totals['bytes'] += size
+                    print(f"Moved: {source} -> {target}")
+                except OSError as e:
+                    entry['status'], entry['error'] = 'failed', str(e)
+                    totals['failed'] += 1
+                    print(f"Error moving {source}: {e}")
+                if manifest:
+                    manifest.write(json.dumps(entry) + '\n')
+                    manifest.flush()
+    finally:
+        if manifest:
+            manifest.close()
+    return totals
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Moves sample files from one folder tree into another.")
+    parser.add_argument('source', help="Folder to move files out of (scanned recursively)")
+    parser.add_argument('destination', help="Folder to move them into")
+    parser.add_argument('--ext', nargs='*', default=['.wav'], help="Extensions to move, e.g. .wav .aif (none for every file)")
+    parser.add_argument('--keep-folders', action='store_true', help="Recreate the source sub-folders in the destination")
+    parser.add_argument('--workers', type=int, default=4, help="Files moved at once")
+    parser.add_argument('--manifest', help="JSONL manifest to resume from and append to")
+    parser.add_argument('--verify', action='store_true', help="Compare checksums after copying between drives")
+    parser.add_argument('--dry-run', action='store_true', help="Only print the moves")
+    args = parser.parse_args()
+
+    moves = plan_moves(args.source, args.destination, [ext.lower() for ext in args.ext], args.keep_folders)
+    totals = move_files(moves, args.workers, args.manifest, args.verify, args.dry_run)
+    print(f"{totals['renamed'] + totals['copied']} moved ({totals['renamed']} renamed, {totals['copied']} copied, "
+          f"{totals['bytes'] / 1e6:.1f} MB), {totals['skipped']} already done, {totals['failed']} failed")
@@ -1,37 +1,29 @@
 import os
-import re
+from rename_planner import plan_renames, execute_plan
 
-def remove_file_prefix(directory):
+# Pattern to match: 3 letters followed by a dash at start of filename
+PREFIX_PATTERN = r'^[A-Za-z]{3}-'
+
+def remove_file_prefix(directory, recursive=False, journal_path=None, dry_run=False):
     """
     Renames .wav files in the specified directory by removing a 3-character prefix and dash.
     
     Parameters:
     directory (str): Path to the directory containing .wav files
+    recursive (bool): Include sub-folders. Default is False.
+    journal_path (str, optional): Journal to record the renames in, for rename_planner.undo_journal.
+    dry_run (bool): Only print the renames. Default is False.
     
     Example:
     ABC-song.wav -> song.wav
     XYZ-music.wav -> music.wav
     song.wav -> song.wav (unchanged)
+    ABC-song.wav -> skipped if song.wav already exists
     """
-    # Pattern to match: 3 letters followed by a dash at start of filename
-    pattern = r'^[A-Za-z]{3}-'
-    
-    for filename in os.listdir(directory):
-        # Check if file is .wav and matches our pattern
-        if filename.endswith('.wav') and re.match(pattern, filename):
-            # Create the new filename by removing first 4 characters
-            new_filename = filename[4:]
-            
-            # Get full file paths
-            old_path = os.path.join(directory, filename)
-            new_path = os.path.join(directory, new_filename)
-            
-            try:
-                # Rename the file
-                os.rename(old_path, new_path)
-                print(f'Renamed: {filename} -> {new_filename}')
-            except OSError as e:
-                print(f'Error renaming {filename}: {e}')
+    plan = plan_renames(directory, [('extensions', '.wav'), ('strip', PREFIX_PATTERN)], recursive)
+    for source, target, reason in plan.collisions:
+        print(f'Error renaming {os.path.basename(source)}: {reason}')
+    execute_plan(plan, journal_path, dry_run)
 
 # Example usage
 if __name__ == "__main__":
@@ -1,33 +1,31 @@
 import os
+from find_duplicates import find_duplicates, plan_actions, apply_plan
 
-def remove_duplicates(new_presets_folder, to_dedup_folder):
+def remove_duplicates(new_presets_folder, to_dedup_folder, dry_run=False):
     """
     Removes duplicate files from the 'To Dedup' folder if they also exist in the 'New Presets' folder.
 
+    Files are compared by content (see find_duplicates), so renamed copies are found and
+    same-named files that differ are kept. Both folders are searched recursively.
+
     Parameters:
     new_presets_folder (str): Path to the 'New Presets' folder.
     to_dedup_folder (str): Path to the 'To Dedup' folder.
+    dry_run (bool): Only print what would be removed. Default is False.
 
     Returns:
     None
     """
-    # Get the list of files in the 'New Presets' folder
-    new_presets_files = set(os.listdir(new_presets_folder))
-
-    # Get the list of files in the 'To Dedup' folder
-    to_dedup_files = os.listdir(to_dedup_folder)
+    groups = find_duplicates([new_presets_folder, to_dedup_folder])
 
-    # Iterate over the files in the 'To Dedup' folder
-    for file_name in to_dedup_files:
-        # Check if the file also exists in the 'New Presets' folder
-        if file_name in new_presets_files:
-            # Construct the full file path
-            file_path = os.path.join(to_dedup_folder, file_name)
-            # Remove the duplicate file
-            os.remove(file_path)
-            print(f"Removed duplicate file: {file_path}")
+    # Only groups with a copy in 'New Presets' (root 0); every copy in 'To Dedup' goes
+    groups = [group for group in groups if group['files'][0]['root'] == 0]
+    plan = [step for step in plan_actions(groups, action='delete', keep='first_root')
+            if os.path.abspath(step['path']).startswith(os.path.join(os.path.abspath(to_dedup_folder), ''))]
+    apply_plan(plan, dry_run)
 
 # Example usage
-new_presets_folder = r"C:\Users\Kenrm\repositories\music-prod\New Presets"
-to_dedup_folder = r"C:\Users\Kenrm\repositories\music-prod\To Dedup"
-remove_duplicates(new_presets_folder, to_dedup_folder)
\ No newline at end of file
+if __name__ == "__main__":
+    new_presets_folder = r"C:\Users\Kenrm\repositories\music-prod\New Presets"
+    to_dedup_folder = r"C:\Users\Kenrm\repositories\music-prod\To Dedup"
+    remove_duplicates(new_presets_folder, to_dedup_folder)
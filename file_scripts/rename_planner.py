@@ -0,0 +1,269 @@
+import os
+import re
+import json
+import time
+from collections import deque
+
+def compile_rules(rules):
+    """
+    Compiles an ordered list of rename rules into a function from file name to new file name.
+
+    Rules are tuples, applied to the whole file name in order:
+    ('extensions', '.wav', ...)      only rename files with one of these extensions (case-insensitive)
+    ('replace', old, new)            replace every occurrence of a substring
+    ('strip', pattern)               remove every match of a regular expression
+    ('prefix', prefix)               add a prefix, unless the name already starts with it
+
+    Parameters:
+    rules (list): Rule tuples.
+
+    Returns:
+    function: name -> new name, or None if the file is filtered out.
+    """
+    extensions = None
+    steps = []
+    for rule in rules:
+        kind, args = rule[0], rule[1:]
+        if kind == 'extensions':
+            extensions = tuple(extension.lower() for extension in args)
+        elif kind == 'replace':
+            old, new = args
+            steps.append(lambda name, old=old, new=new: name.replace(old, new))
+        elif kind == 'strip':
+            pattern = re.compile(args[0])
+            steps.append(lambda name, pattern=pattern: pattern.sub('', name))
+        elif kind == 'prefix':
+            prefix = args[0]
+            steps.append(lambda name, prefix=prefix: name if name.startswith(prefix) else prefix + name)
+        else:
+            raise ValueError(f"Unknown rename rule '{kind}'. Choose from 'extensions', 'replace', 'strip', or 'prefix'.")
+
+    def apply(name):
+        if extensions is not None and not name.lower().endswith(extensions):
+            return None
+        for step in steps:
+            name = step(name)
+        return name
+    return apply
+
+class RenamePlan:
+    """
+    The result of plan_renames: what will be renamed, in which order, and what can't be.
+
+    Attributes:
+    renames (list): (source, target) pairs that will be applied.
+    steps (list): (source, target) renames in execution order; cycles go through temporary names.
+    collisions (list): (source, target, reason) for renames that were left out.
+    scanned (int): Number of files scanned.
+    """
+    def __init__(self, renames, steps, collisions, scanned):
+        self.renames = renames
+        self.steps = steps
+        self.collisions = collisions
+        self.scanned = scanned
+
+    def __len__(self):
+        return len(self.renames)
+
+    def print_summary(self, limit=20):
+        print(f"{self.scanned} files scanned, {len(self.renames)} to rename, {len(self.collisions)} left out")
+        for source, target in self.renames[:limit]:
+            print(f"  {source} -> {os.path.basename(target)}")
+        for source, target, reason in self.collisions[:limit]:
+            print(f"  SKIPPED {source} -> {os.path.basename(target)}: {reason}")
+
+def _scan(directory, recursive):
+    # One scandir pass: the files to consider and every name that exists in each folder
+    files = []
+    occupied = set()
+    stack = [directory]
+    while stack:
+        folder = stack.pop()
+        try:
+            entries = os.scandir(folder)
+        except OSError as e:
+            print(f"Skipping {e.filename}: {e.strerror}")
+            continue
+        with entries:
+            for entry in entries:
+                occupied.add(os.path.normcase(entry.path))
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    files.append((folder, entry.name))
+    return files, occupied
+
+def _temp_name(folder, name, taken):
+    counter = 0
+    while True:
+        candidate = os.path.join(folder, f".{name}.renaming-{counter}")
+        if os.path.normcase(candidate) not in taken:
+            taken.add(os.path.normcase(candidate))
+            return candidate
+        counter += 1
+
+def _order_steps(renames, occupied):
+    # A rename whose target is another pending rename's source waits for it; renames
+    # left when nothing is ready form cycles and are broken with a temporary name
+    pending = {os.path.normcase(source): (source, target) for source, target in renames}
+    blocked_by = {}
+    ready = deque()
+    for key, (source, target) in pending.items():
+        target_key = os.path.normcase(target)
+        if target_key in pending and target_key != key:
+            blocked_by[target_key] = key
+        else:
+            ready.append(key)
+
+    steps = []
+    taken = set(occupied)
+    while pending:
+        while ready:
+            key = ready.popleft()
+            steps.append(pending.pop(key))
+            if key in blocked_by:
+                ready.append(blocked_by.pop(key))
+        if pending:
+            key = next(iter(pending))
+            source, target = pending[key]
+            temp = _temp_name(os.path.dirname(source), os.path.basename(source), taken)
+            steps.append((source, temp))
+            pending[key] = (temp, target)
+            if key in blocked_by:
+                ready.append(blocked_by.pop(key))
+    return steps
+
+def plan_renames(directory, rules, recursive=True):
+    """
+    Scans a folder tree once and plans the renames an ordered rule list produces.
+
+    Renames that would overwrite an existing file, or that give two files the same name,
+    are left out and reported; chains and cycles (A -> B, B -> A) are ordered so that
+    no file is ever overwritten.
+
+    Parameters:
+    directory (str): Folder to scan.
+    rules (list): Rule tuples (see compile_rules).
+    recursive (bool): Include sub-folders. Default is True.
+
+    Returns:
+    RenamePlan: The plan.
+    """
+    rename = compile_rules(rules)
+    files, occupied = _scan(directory, recursive)
+
+    proposed = {}
+    collisions = []
+    for folder, name in files:
+        new_name = rename(name)
+        if new_name is None or new_name == name:
+            continue
+        source, target = os.path.join(folder, name), os.path.join(folder, new_name)
+        if not new_name or os.sep in new_name or (os.altsep and os.altsep in new_name):
+            collisions.append((source, target, "invalid file name"))
+            continue
+        proposed[os.path.normcase(source)] = (source, target)
+
+    # Drop conflicting renames until the rest is consistent: a dropped rename keeps its
+    # source in place, which can block renames that were counting on it moving
+    while True:
+        targets = {}
+        for key, (source, target) in proposed.items():
+            targets.setdefault(os.path.normcase(target), []).append(key)
+        dropped = []
+        for target_key, keys in targets.items():
+            if len(keys) > 1:
+                dropped.extend((key, "several files would get this name") for key in keys)
+            elif target_key in occupied and target_key not in proposed and target_key != keys[0]:
+                dropped.append((keys[0], "target already exists"))
+        if not dropped:
+            break
+        for key, reason in dropped:
+            if key in proposed:
+                source, target = proposed.pop(key)
+                collisions.append((source, target, reason))
+
+    renames = sorted(proposed.values())
+    return RenamePlan(renames, _order_steps(renames, occupied), collisions, len(files))
+
+def execute_plan(plan, journal_path=None, dry_run=False):
+    """
+    Applies a RenamePlan, appending each completed step to a JSONL journal so the batch
+    can be reverted with undo_journal.
+
+    Parameters:
+    plan (RenamePlan): Result of plan_renames.
+    journal_path (str, optional): Journal file to append to.
+    dry_run (bool): Only print the renames. Default is False.
+
+    Returns:
+    int: Number of files renamed.
+    """
+    if dry_run:
+        plan.print_summary(limit=len(plan.renames) + len(plan.collisions))
+        return 0
+
+    batch = f"{time.strftime('%Y%m%dT%H%M%S')}.{time.time_ns() % 10 ** 9:09d}"
+    final_targets = {target for _, target in plan.renames}
+    origins = {}
+    journal = open(journal_path, 'a') if journal_path else None
+    done = 0
+    try:
+        for source, target in plan.steps:
+            # Never overwrite, even if the folder changed since it was scanned
+            if os.path.exists(target) and os.path.normcase(source) != os.path.normcase(target):
+                print(f"Error renaming {source}: {target} already exists")
+                continue
+            try:
+                os.rename(source, target)
+            except OSError as e:
+                print(f"Error renaming {source}: {e}")
+                continue
+            if journal:
+                journal.write(json.dumps({'batch': batch, 'source': source, 'target': target}) + '\n')
+                journal.flush()
+            if target in final_targets:
+                print(f'Renamed: {origins.get(source, source)} to {target}')
+                done += 1
+            else:
+                origins[target] = source
+    finally:
+        if journal:
+            journal.close()
+    return done
+
+def undo_journal(journal_path, batch=None):
+    """
+    Reverts the renames recorded in a journal, newest first.
+
+    Parameters:
+    journal_path (str): Journal written by execute_plan.
+    batch (str, optional): Only revert this batch. Default is the most recent batch.
+
+    Returns:
+    int: Number of renames reverted.
+    """
+    with open(journal_path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    if not entries:
+        return 0
+    batch = batch or entries[-1]['batch']
+    undone = 0
+    for entry in reversed([entry for entry in entries if entry['batch'] == batch]):
+        if os.path.exists(entry['source']) and os.path.normcase(entry['source']) != os.path.normcase(entry['target']):
+            print(f"Can't revert {entry['target']}: {entry['source']} exists again")
+            continue
+        try:
+            os.rename(entry['target'], entry['source'])
+            undone += 1
+        except OSError as e:
+            print(f"Error reverting {entry['target']}: {e}")
+    print(f"Reverted {undone} renames of batch {batch}")
+    return undone
+
+# Example usage
+if __name__ == "__main__":
+    directory = r"C:\Users\Kenrm\OneDrive\Documents\Image-Line\FL Studio\Projects\02_Drum Stems\Drum Stems"
+    plan = plan_renames(directory, [('extensions', '.wav'), ('replace', '130 BPM', 'AsIs_130 BPM')])
+    execute_plan(plan, dry_run=True)
@@ -1,10 +1,15 @@
 import pygame
 import numpy as np
-from pygame import gfxdraw
 import librosa
-import random
-import math
 import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'wave_scripts'))
+from stream_analysis import stream_onsets_and_beats
+from feature_graph import N_FFT, HOP_LENGTH
+from wav_loader import load_wav
+from render_tables import band_matrix, band_heights, build_render_tables, near_beat, N_BANDS
+from particles import ParticleSystem
 
 # Initialize pygame
 pygame.init()
@@ -14,61 +19,116 @@ WIDTH, HEIGHT = 800, 600
 screen = pygame.display.set_mode((WIDTH, HEIGHT))
 pygame.display.set_caption("EDM Visualizer")
 
-# Load and process audio
-def load_audio(file_path):
-    # Load the audio file with librosa
-    y, sr = librosa.load(file_path)
+# Bar color for every bar height (blue to pink gradient), so drawing a bar is a lookup
+def bar_palette(max_height=HEIGHT // 2):
+    palette = []
+    for bar_height in range(max_height + 1):
+        color = pygame.Color(0, 0, 0)
+        color.hsva = (int(180 + (bar_height / (HEIGHT/2) * 60)) % 360, 80, 90, 100)
+        palette.append(color)
+    return palette
+
+BAR_COLORS = bar_palette()
+
+# Load and analyze audio once, then precompute the per-frame tables render_frame reads
+def load_audio(file_path, streaming=False, spectrum_bars=N_BANDS):
+    if streaming:
+        # Read the file block by block and keep only the bar heights of each frame,
+        # so long mixes don't need the full signal and spectrogram in memory
+        sr = librosa.get_samplerate(file_path)
+        weights = band_matrix(sr, N_FFT, spectrum_bars)
+        heights = []
+        audio_data = stream_onsets_and_beats(
+            file_path, on_block=lambda S: heights.append(band_heights(S, sr, HEIGHT // 2, spectrum_bars, weights))
+        )
+        audio_data.update(build_render_tables(np.concatenate(heights), audio_data['onset_env'],
+                                              audio_data['beat_times'], sr, HOP_LENGTH))
+        return audio_data
+
+    # Load the audio file (display only, so cheap resampling is good enough)
+    y, sr = load_wav(file_path, quality='fast')
     
     # Get various audio features
-    tempo, beats = librosa.beat.beat_track(y=y, sr=sr)
-    beat_times = librosa.frames_to_time(beats, sr=sr)
+    tempo, beats = librosa.beat.beat_track(y=y, sr=sr, hop_length=HOP_LENGTH)
+    beat_times = librosa.frames_to_time(beats, sr=sr, hop_length=HOP_LENGTH)
     
     # Extract onset strength (for detecting "hits" in the music)
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+    onset_env = librosa.onset.onset_strength(y=y, sr=sr, hop_length=HOP_LENGTH)
     
-    # Get spectral features 
-    spectral = np.abs(librosa.stft(y))
+    # Spectrum analyzer bars for every frame; the spectrogram itself isn't kept
+    heights = band_heights(np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH)), sr, HEIGHT // 2, spectrum_bars)
     
-    return {
+    audio_data = {
         'y': y,
         'sr': sr,
+        'duration': len(y) / sr,
         'tempo': tempo,
-        'beat_times': beat_times,
-        'onset_env': onset_env,
-        'spectral': spectral
     }
+    audio_data.update(build_render_tables(heights, onset_env, beat_times, sr, HOP_LENGTH))
+    return audio_data
 
-# Particle class for visual effects
-class Particle:
-    def __init__(self, x, y, size, color, speed):
-        self.x = x
-        self.y = y
-        self.size = size
-        self.color = color
-        self.speed = speed
-        self.angle = random.uniform(0, 2 * math.pi)
-        self.life = 255
-        self.decay = random.uniform(1, 5)
-        
-    def update(self):
-        self.x += math.cos(self.angle) * self.speed
-        self.y += math.sin(self.angle) * self.speed
-        self.life -= self.decay
-        self.size *= 0.98
+# Number of particles an onset of the given strength spawns
+def burst_size(onset):
+    return int(onset * 5 * 0.5)  # Reduce particle count by 50%
+
+# Draw one frame of the visualization for the given song position (in seconds).
+# Particles are kept in the particles ParticleSystem across frames.
+# Everything per frame comes from the tables load_audio precomputed.
+def render_frame(surface, particle_surface, audio_data, particles, current_time, spectrum_bars=64):
+    # Find current frame in audio data
+    heights = audio_data['spectrum_heights']
+    frame_idx = max(0, min(int(current_time * audio_data['frame_rate']), len(heights) - 1))
         
-    def draw(self, surface):
-        if self.life > 0 and self.size > 0.5:
-            alpha = int(self.life)
-            color = (self.color[0], self.color[1], self.color[2], alpha)
-            gfxdraw.filled_circle(surface, int(self.x), int(self.y), int(self.size), color)
+    # Get current spectrum data and onset strength
+    spectrum = heights[frame_idx].tolist() if len(heights) else []
+    onset_env = audio_data['onset_env']
+    onset = float(onset_env[min(frame_idx, len(onset_env) - 1)]) if len(onset_env) else 0
+    
+    # Check if we're on a beat
+    on_beat = near_beat(audio_data['beat_times'], current_time)
             
-    def is_dead(self):
-        return self.life <= 0 or self.size <= 0.5
+    # Clear the screen
+    surface.fill((0, 0, 0))
+    particle_surface.fill((0, 0, 0, 0))
+    
+    # Draw spectrum analyzer
+    bar_width = WIDTH // spectrum_bars
+    for i in range(spectrum_bars):
+        if i < len(spectrum):
+            bar_height = max(5, spectrum[i])
+            color = BAR_COLORS[min(bar_height, len(BAR_COLORS) - 1)]
+            
+            pygame.draw.rect(surface, color, 
+                            (i * bar_width, HEIGHT - bar_height, 
+                             bar_width - 2, bar_height))
+    
+    # Create particles on beats or high onset strength
+    if on_beat or onset > audio_data['onset_threshold']:
+        particle_count = burst_size(onset)
+        
+        # Create particles from center or from bars
+        rng = particles.rng
+        from_bar = (rng.random(particle_count) <= 0.5) & (len(spectrum) > 0)
+        bar_idx = rng.integers(0, max(1, min(spectrum_bars, len(spectrum))), particle_count)
+        x = np.where(from_bar, bar_idx * bar_width + bar_width // 2, WIDTH // 2)
+        y = np.where(from_bar, HEIGHT - np.asarray(spectrum + [0], dtype=np.float32)[bar_idx], HEIGHT // 2)
+        particles.emit(x, y, particle_count)
+    
+    # Update and draw particles
+    particles.update()
+    particles.draw(particle_surface)
+    
+    # Draw the particle surface
+    surface.blit(particle_surface, (0, 0))
+    
+    # Draw a center circle that pulses with the music
+    circle_radius = 50 + int(onset * 10)
+    pygame.draw.circle(surface, (255, 255, 255), (WIDTH // 2, HEIGHT // 2), circle_radius, 2)
 
 # Main visualization function
-def visualize_music(audio_file):
+def visualize_music(audio_file, streaming=False):
     # Load audio data
-    audio_data = load_audio(audio_file)
+    audio_data = load_audio(audio_file, streaming)
     
     # Create pygame mixer to play the audio
     pygame.mixer.init()
@@ -76,7 +136,7 @@ def visualize_music(audio_file):
     
     # Setup visualization elements
     spectrum_bars = 64
-    particles = []
+    particles = ParticleSystem()
     
     # Create a transparent surface for particles
     particle_surface = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
@@ -94,91 +154,11 @@ def visualize_music(audio_file):
                 
         # Calculate current position in the song
         current_time = (pygame.time.get_ticks() - start_time) / 1000.0
-        if current_time >= len(audio_data['y']) / audio_data['sr']:
+        if current_time >= audio_data['duration']:
             running = False
             continue
         
-        # Find current frame in audio data
-        frame_idx = int(current_time * audio_data['sr'] / 512)  # Assuming hop_length of 512
-        if frame_idx >= len(audio_data['onset_env']):
-            frame_idx = len(audio_data['onset_env']) - 1
-            
-        # Get current spectrum data and onset strength
-        if frame_idx < audio_data['spectral'].shape[1]:
-            spectrum = audio_data['spectral'][:, frame_idx]
-            spectrum = librosa.amplitude_to_db(spectrum, ref=np.max)
-            spectrum = np.interp(spectrum, [np.min(spectrum), np.max(spectrum)], [0, HEIGHT/2])
-        else:
-            spectrum = np.zeros(spectrum_bars)
-            
-        onset = audio_data['onset_env'][frame_idx] if frame_idx < len(audio_data['onset_env']) else 0
-        
-        # Check if we're on a beat
-        on_beat = False
-        for beat_time in audio_data['beat_times']:
-            if abs(current_time - beat_time) < 0.05:
-                on_beat = True
-                break
-                
-        # Clear the screen
-        screen.fill((0, 0, 0))
-        particle_surface.fill((0, 0, 0, 0))
-        
-        # Draw spectrum analyzer
-        bar_width = WIDTH // spectrum_bars
-        for i in range(spectrum_bars):
-            if i < len(spectrum):
-                bar_height = max(5, int(spectrum[i]))
-                # Calculate color based on height (blue to pink gradient)
-                hue = int(180 + (bar_height / (HEIGHT/2) * 60))
-                color = pygame.Color(0, 0, 0)
-                color.hsva = (hue % 360, 80, 90, 100)
-                
-                pygame.draw.rect(screen, color, 
-                                (i * bar_width, HEIGHT - bar_height, 
-                                 bar_width - 2, bar_height))
-        
-        # Create particles on beats or high onset strength
-        if on_beat or onset > np.mean(audio_data['onset_env']) * 1.5:
-            particle_count = int(onset * 5 * 0.5)  # Reduce particle count by 50%
-            for _ in range(particle_count):
-                # Random colors that match EDM aesthetic
-                colors = [
-                    (255, 0, 220, 255),  # Magenta
-                    (0, 255, 220, 255),  # Cyan
-                    (255, 220, 0, 255),  # Yellow
-                    (120, 0, 255, 255),  # Purple
-                ]
-                color = random.choice(colors)
-                
-                # Create particles from center or from bars
-                if random.random() > 0.5:
-                    x, y = WIDTH // 2, HEIGHT // 2
-                else:
-                    bar_idx = random.randint(0, spectrum_bars - 1)
-                    if bar_idx < len(spectrum):
-                        x = bar_idx * bar_width + bar_width // 2
-                        y = HEIGHT - int(spectrum[bar_idx])
-                    else:
-                        x, y = WIDTH // 2, HEIGHT // 2
-                
-                size = random.randint(5, 15)
-                speed = random.uniform(2, 8)
-                particles.append(Particle(x, y, size, color, speed))
-        
-        # Update and draw particles
-        for p in particles[:]:
-            p.update()
-            p.draw(particle_surface)
-            if p.is_dead():
-                particles.remove(p)
-        
-        # Draw the particle surface
-        screen.blit(particle_surface, (0, 0))
-        
-        # Draw a center circle that pulses with the music
-        circle_radius = 50 + int(onset * 10)
-        pygame.draw.circle(screen, (255, 255, 255), (WIDTH // 2, HEIGHT // 2), circle_radius, 2)
+        render_frame(screen, particle_surface, audio_data, particles, current_time, spectrum_bars)
         
         # Update the display
         pygame.display.flip()
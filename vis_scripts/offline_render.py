@@ -0,0 +1,192 @@
+import os
+
+# Render without a window or sound card; must be set before pygame is imported
+os.environ['SDL_VIDEODRIVER'] = 'dummy'
+os.environ['SDL_AUDIODRIVER'] = 'dummy'
+
+import math
+import time
+import argparse
+import multiprocessing
+import numpy as np
+import pygame
+from concurrent.futures import ProcessPoolExecutor
+import basic_music_animation as vis
+from particles import ParticleSystem, MAX_PARTICLES, max_lifetime
+
+FRAME_RATE = 60
+
+OUTPUT_FORMATS = ('png', 'raw')
+
+# Frames rendered (but not written) before each chunk so its first frame has the same
+# particles as in a serial render; one more than a particle can live, for rounding.
+# This only holds while no burst is cut short by a full pool, see particle_capacity.
+WARMUP_FRAMES = max_lifetime() + 1
+
+# Chunks per worker; more chunks balance better, fewer repeat less warm-up
+CHUNKS_PER_WORKER = 2
+
+def frame_count(duration, fps=FRAME_RATE):
+    return math.ceil(duration * fps)
+
+def frame_rng(seed, frame):
+    """
+    Returns the random generator of one frame. Seeding every frame on its own makes a
+    frame's particles depend only on the seed and the frames shortly before it.
+    """
+    return np.random.default_rng((seed, frame))
+
+def particle_capacity(audio_data, lifetime=WARMUP_FRAMES):
+    """
+    Returns a particle pool size the track can never fill: its largest burst for every
+    frame a particle can live. A full pool would drop particles depending on what came
+    before, so a chunk's warm-up would no longer reproduce the serial render.
+
+    Parameters:
+    audio_data (dict): Result of basic_music_animation.load_audio.
+    lifetime (int): Most frames a particle is alive. Default is WARMUP_FRAMES.
+
+    Returns:
+    int: Pool capacity, at least MAX_PARTICLES.
+    """
+    onset_env = audio_data['onset_env']
+    largest = vis.burst_size(float(onset_env.max())) if len(onset_env) else 0
+    return max(MAX_PARTICLES, largest * lifetime)
+
+def render_frames(audio_data, first, last, fps=FRAME_RATE, seed=0, warmup=WARMUP_FRAMES):
+    """
+    Renders frames at a fixed timestep: frame n shows the song at n / fps seconds.
+
+    Parameters:
+    audio_data (dict): Result of basic_music_animation.load_audio.
+    first (int): First frame to yield.
+    last (int): Frame after the last one to yield.
+    fps (int): Frames per second. Default is FRAME_RATE.
+    seed (int): Particle seed. Default is 0.
+    warmup (int): Frames rendered before first to build up its particles. Default is WARMUP_FRAMES.
+
+    Yields:
+    tuple: (frame number, pygame.Surface); the surface is reused for the next frame.
+    """
+    surface = pygame.Surface((vis.WIDTH, vis.HEIGHT))
+    particle_surface = pygame.Surface((vis.WIDTH, vis.HEIGHT), pygame.SRCALPHA)
+    particles = ParticleSystem(capacity=particle_capacity(audio_data))
+    for frame in range(max(0, first - warmup), last):
+        particles.rng = frame_rng(seed, frame)
+        vis.render_frame(surface, particle_surface, audio_data, particles, frame / fps)
+        if frame >= first:
+            yield frame, surface
+
+def frame_path(output, frame):
+    return os.path.join(output, f"frame_{frame:06d}.png")
+
+def write_frames(audio_data, first, last, output, fmt='png', fps=FRAME_RATE, seed=0, origin=0):
+    """
+    Renders a frame range and writes it: one PNG per frame into the output folder, or
+    RGB24 frames at their place in the raw output file (which must already exist), where
+    frame origin comes first.
+
+    Returns:
+    int: Number of frames written.
+    """
+    frame_bytes = vis.WIDTH * vis.HEIGHT * 3
+    written = 0
+    raw = open(output, 'r+b') if fmt == 'raw' else None
+    try:
+        for frame, surface in render_frames(audio_data, first, last, fps, seed):
+            if raw is not None:
+                raw.seek((frame - origin) * frame_bytes)
+                raw.write(pygame.image.tobytes(surface, 'RGB'))
+            else:
+                pygame.image.save(surface, frame_path(output, frame))
+            written += 1
+    finally:
+        if raw is not None:
+            raw.close()
+    return written
+
+# Analysis data of the track, sent to each worker process once
+_worker_audio = None
+
+def _init_worker(audio_data):
+    global _worker_audio
+    _worker_audio = audio_data
+
+def _write_chunk(first, last, output, fmt, fps, seed, origin):
+    return write_frames(_worker_audio, first, last, output, fmt, fps, seed, origin)
+
+def render_offline(audio_file, output, fmt='png', fps=FRAME_RATE, seed=0, workers=None, start=0.0, end=None,
+                   streaming=False):
+    """
+    Renders the visualization of a track to an image sequence or a raw video file without
+    a display, faster than real time. Frame ranges are rendered in parallel processes
+    with a particle pool sized so that no burst is ever cut short (see particle_capacity);
+    the output is then identical to a serial render with the same seed.
+
+    Parameters:
+    audio_file (str): Path to the audio file.
+    output (str): Folder for 'png' frames, or file for 'raw' RGB24 frames.
+    fmt (str): 'png' or 'raw'. Default is 'png'.
+    fps (int): Frames per second. Default is FRAME_RATE.
+    seed (int): Particle seed. Default is 0.
+    workers (int, optional): Worker processes; 1 renders serially. Default is the CPU count.
+    start (float): Song position of the first frame in seconds. Default is 0.
+    end (float, optional): Song position to stop at. Default is the end of the track.
+    streaming (bool): Analyze the track block by block (see load_audio). Default is False.
+
+    Returns:
+    dict: 'frames' written, 'seconds' taken and 'fps' achieved.
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Invalid value for 'fmt'. Choose from {', '.join(OUTPUT_FORMATS)}.")
+    audio_data = vis.load_audio(audio_file, streaming)
+    # The signal isn't needed for rendering; don't copy it to every worker
+    audio_data.pop('y', None)
+
+    total = frame_count(audio_data['duration'], fps)
+    first = min(total, int(start * fps))
+    last = total if end is None else min(total, frame_count(end, fps))
+    workers = workers or os.cpu_count() or 1
+
+    if fmt == 'raw':
+        with open(output, 'wb') as f:
+            f.truncate(max(0, last - first) * vis.WIDTH * vis.HEIGHT * 3)
+    else:
+        os.makedirs(output, exist_ok=True)
+
+    begin = time.perf_counter()
+    if workers == 1 or last - first <= WARMUP_FRAMES:
+        written = write_frames(audio_data, first, last, output, fmt, fps, seed, first)
+    else:
+        # Chunks much shorter than the warm-up would spend most of their time on it
+        size = max(4 * WARMUP_FRAMES, math.ceil((last - first) / (workers * CHUNKS_PER_WORKER)))
+        chunks = [(begin_frame, min(begin_frame + size, last)) for begin_frame in range(first, last, size)]
+        # Spawned workers behave the same on every platform and don't inherit SDL state
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context,
+                                 initializer=_init_worker, initargs=(audio_data,)) as executor:
+            futures = [executor.submit(_write_chunk, a, b, output, fmt, fps, seed, first) for a, b in chunks]
+            written = sum(future.result() for future in futures)
+    seconds = time.perf_counter() - begin
+    return {'frames': written, 'seconds': seconds, 'fps': written / seconds if seconds > 0 else 0.0}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Renders the music visualization to frames without a display.")
+    parser.add_argument('audio_file')
+    parser.add_argument('output', help="Folder for PNG frames, or file for raw RGB24 frames")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='png')
+    parser.add_argument('--fps', type=int, default=FRAME_RATE)
+    parser.add_argument('--seed', type=int, default=0, help="Particle seed")
+    parser.add_argument('--workers', type=int, help="Worker processes (default: one per CPU, 1 for serial)")
+    parser.add_argument('--start', type=float, default=0.0, help="Start position in seconds")
+    parser.add_argument('--end', type=float, help="End position in seconds")
+    parser.add_argument('--streaming', action='store_true', help="Analyze long tracks block by block")
+    args = parser.parse_args()
+
+    stats = render_offline(args.audio_file, args.output, args.format, args.fps, args.seed, args.workers,
+                           args.start, args.end, args.streaming)
+    print(f"{stats['frames']} frames in {stats['seconds']:.1f} s ({stats['fps']:.0f} frames/s, "
+          f"{stats['fps'] / args.fps:.1f}x real time)")
+    if args.format == 'raw':
+        print(f"Encode with: ffmpeg -f rawvideo -pix_fmt rgb24 -s {vis.WIDTH}x{vis.HEIGHT} -r {args.fps} "
+              f"-i \"{args.output}\" -i \"{args.audio_file}\" -shortest video.mp4")
@@ -0,0 +1,171 @@
+import math
+import numpy as np
+import pygame
+from pygame import gfxdraw
+
+# Most particles alive at once; bursts beyond it are cut short
+MAX_PARTICLES = 4096
+
+# Particles shrink by this factor every update and die below MIN_SIZE or at zero life
+SHRINK = 0.98
+MIN_SIZE = 0.5
+
+# Ranges new particles are drawn from: radius in pixels, speed in pixels per update and
+# life (out of 255) lost per update
+SIZE_RANGE = (5, 15)
+SPEED_RANGE = (2, 8)
+DECAY_RANGE = (1, 5)
+
+# Sprites are cached per color, radius and alpha; alpha is rounded to this many levels
+ALPHA_LEVELS = 16
+
+# Largest particle radius a sprite is cached for
+MAX_RADIUS = 32
+
+# Colors that match the EDM aesthetic
+DEFAULT_COLORS = (
+    (255, 0, 220),  # Magenta
+    (0, 255, 220),  # Cyan
+    (255, 220, 0),  # Yellow
+    (120, 0, 255),  # Purple
+)
+
+def max_lifetime(size_range=SIZE_RANGE, decay_range=DECAY_RANGE):
+    """
+    Returns the most updates a particle can survive: it dies when it has shrunk below
+    MIN_SIZE or faded out, whichever comes first. Rendering that many frames before a
+    frame reproduces its particles without rendering the frames before that.
+
+    Parameters:
+    size_range (tuple): Radius range particles are spawned with. Default is SIZE_RANGE.
+    decay_range (tuple): Fade range particles are spawned with. Default is DECAY_RANGE.
+
+    Returns:
+    int: Number of updates.
+    """
+    shrunk = math.ceil(math.log(MIN_SIZE / size_range[1]) / math.log(SHRINK))
+    faded = math.ceil(255 / decay_range[0])
+    return max(1, min(shrunk, faded))
+
+class ParticleSystem:
+    """
+    Particles stored as one NumPy array per attribute, with every live particle in the
+    first `count` slots. Updates are vectorized and dead particles are removed by
+    compacting the arrays, so a frame costs the same few array operations however many
+    particles there are; drawing is a single Surface.blits call with cached sprites.
+
+    Parameters:
+    capacity (int): Most particles alive at once. Default is MAX_PARTICLES.
+    colors (sequence): RGB colors particles are picked from. Default is DEFAULT_COLORS.
+    seed (int, optional): Seed of the random generator, for reproducible renders.
+    """
+    def __init__(self, capacity=MAX_PARTICLES, colors=DEFAULT_COLORS, seed=None):
+        self.capacity = capacity
+        self.colors = [tuple(color) for color in colors]
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+        self.x = np.zeros(capacity, dtype=np.float32)
+        self.y = np.zeros(capacity, dtype=np.float32)
+        self.vx = np.zeros(capacity, dtype=np.float32)
+        self.vy = np.zeros(capacity, dtype=np.float32)
+        self.size = np.zeros(capacity, dtype=np.float32)
+        self.life = np.zeros(capacity, dtype=np.float32)
+        self.decay = np.zeros(capacity, dtype=np.float32)
+        self.color = np.zeros(capacity, dtype=np.intp)
+        self._arrays = (self.x, self.y, self.vx, self.vy, self.size, self.life, self.decay, self.color)
+        # Sprite of every (color, radius, alpha level), built on first use
+        self._sprites = [None] * (len(self.colors) * (MAX_RADIUS + 1) * ALPHA_LEVELS)
+        self.dropped = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.count = 0
+
+    def emit(self, x, y, count, size_range=SIZE_RANGE, speed_range=SPEED_RANGE, decay_range=DECAY_RANGE):
+        """
+        Spawns particles flying off in random directions.
+
+        Parameters:
+        x, y (float or np.ndarray): Start position, one for all or one per particle.
+        count (int): Number of particles.
+        size_range (tuple): Integer radius range, inclusive. Default is SIZE_RANGE.
+        speed_range (tuple): Pixels per update. Default is SPEED_RANGE.
+        decay_range (tuple): Life (out of 255) lost per update. Default is DECAY_RANGE.
+
+        Returns:
+        int: Number of particles spawned; fewer than count if the pool is full.
+        """
+        spawned = max(0, min(count, self.capacity - self.count))
+        self.dropped += count - spawned
+        if spawned == 0:
+            return 0
+        rng = self.rng
+        window = slice(self.count, self.count + spawned)
+        angle = rng.uniform(0, 2 * np.pi, spawned)
+        speed = rng.uniform(*speed_range, spawned)
+        self.x[window] = np.broadcast_to(x, (count,))[:spawned]
+        self.y[window] = np.broadcast_to(y, (count,))[:spawned]
+        self.vx[window] = np.cos(angle) * speed
+        self.vy[window] = np.sin(angle) * speed
+        self.size[window] = rng.integers(size_range[0], size_range[1] + 1, spawned)
+        self.life[window] = 255
+        self.decay[window] = rng.uniform(*decay_range, spawned)
+        self.color[window] = rng.integers(0, len(self.colors), spawned)
+        self.count += spawned
+        return spawned
+
+    def update(self):
+        """
+        Moves, shrinks and fades every particle one step and drops the dead ones.
+        """
+        n = self.count
+        if n == 0:
+            return
+        self.x[:n] += self.vx[:n]
+        self.y[:n] += self.vy[:n]
+        self.life[:n] -= self.decay[:n]
+        self.size[:n] *= SHRINK
+        alive = (self.life[:n] > 0) & (self.size[:n] > MIN_SIZE)
+        if not alive.all():
+            # Compaction keeps the live particles in order at the front
+            keep = np.flatnonzero(alive)
+            for array in self._arrays:
+                array[:len(keep)] = array[keep]
+            self.count = len(keep)
+
+    def _sprite(self, key):
+        sprite = self._sprites[key]
+        if sprite is None:
+            color, rest = divmod(key, (MAX_RADIUS + 1) * ALPHA_LEVELS)
+            radius, level = divmod(rest, ALPHA_LEVELS)
+            alpha = min(255, (level + 1) * 256 // ALPHA_LEVELS)
+            sprite = pygame.Surface((2 * radius + 1, 2 * radius + 1), pygame.SRCALPHA)
+            gfxdraw.filled_circle(sprite, radius, radius, radius, (*self.colors[color], alpha))
+            self._sprites[key] = sprite
+        return sprite
+
+    def draw(self, surface):
+        """
+        Draws every live particle with one Surface.blits call.
+
+        Parameters:
+        surface (pygame.Surface): Surface to draw on.
+
+        Returns:
+        None
+        """
+        n = self.count
+        if n == 0:
+            return
+        radius = np.minimum(self.size[:n].astype(np.intp), MAX_RADIUS)
+        left = self.x[:n].astype(np.intp) - radius
+        top = self.y[:n].astype(np.intp) - radius
+        # Particles that flew off the surface cost nothing to draw
+        width, height = surface.get_size()
+        visible = np.flatnonzero((left < width) & (top < height) & (left + 2 * radius >= 0) & (top + 2 * radius >= 0))
+        radius, left, top = radius[visible], left[visible], top[visible]
+        level = np.clip(self.life[visible].astype(np.intp) * ALPHA_LEVELS // 256, 0, ALPHA_LEVELS - 1)
+        keys = (self.color[visible] * (MAX_RADIUS + 1) + radius) * ALPHA_LEVELS + level
+        surface.blits(zip(map(self._sprite, keys.tolist()), zip(left.tolist(), top.tolist())), doreturn=False)
@@ -0,0 +1,107 @@
+import numpy as np
+
+# Bars of the spectrum analyzer and the frequency range they cover (log-spaced)
+N_BANDS = 64
+MIN_FREQ = 30.0
+
+# Quietest level drawn, in dB below the loudest band of the frame
+TOP_DB = 80.0
+
+# A frame counts as on the beat within this many seconds of a beat
+BEAT_WINDOW = 0.05
+
+# Onsets stronger than this multiple of the track's mean onset strength spawn particles
+ONSET_THRESHOLD_RATIO = 1.5
+
+def band_matrix(sr, n_fft, n_bands=N_BANDS, fmin=MIN_FREQ):
+    """
+    Builds the matrix that averages STFT power bins into log-spaced frequency bands.
+    Bands narrower than one bin (at the bottom, for short FFTs) take the nearest bin.
+
+    Parameters:
+    sr (int): Sampling rate.
+    n_fft (int): FFT size of the spectrogram.
+    n_bands (int): Number of bands. Default is N_BANDS.
+    fmin (float): Lower edge of the first band in Hz. Default is MIN_FREQ.
+
+    Returns:
+    np.ndarray: (n_bands x n_fft // 2 + 1) float32 weights; each row sums to 1.
+    """
+    freqs = np.arange(n_fft // 2 + 1) * sr / n_fft
+    edges = np.geomspace(fmin, sr / 2, n_bands + 1)
+    weights = np.zeros((n_bands, len(freqs)), dtype=np.float32)
+    for band in range(n_bands):
+        inside = (freqs >= edges[band]) & (freqs < edges[band + 1])
+        if inside.any():
+            weights[band, inside] = 1.0 / inside.sum()
+        else:
+            weights[band, np.argmin(np.abs(freqs - np.sqrt(edges[band] * edges[band + 1])))] = 1.0
+    return weights
+
+def band_heights(S, sr, max_height, n_bands=N_BANDS, weights=None):
+    """
+    Turns magnitude spectrogram frames into spectrum analyzer bar heights: band power in
+    dB relative to the frame's loudest band (floored TOP_DB below it), scaled so each
+    frame spans 0 to max_height.
+
+    Parameters:
+    S (np.ndarray): Magnitude spectrogram, (n_fft // 2 + 1 x frames).
+    sr (int): Sampling rate.
+    max_height (int): Height of the tallest bar in pixels.
+    n_bands (int): Number of bars. Default is N_BANDS.
+    weights (np.ndarray, optional): band_matrix result, to reuse it across blocks.
+
+    Returns:
+    np.ndarray: (frames x n_bands) uint16 heights in pixels.
+    """
+    if weights is None:
+        weights = band_matrix(sr, 2 * (S.shape[0] - 1), n_bands)
+    power = weights @ np.square(S, dtype=np.float32)
+    db = 10 * np.log10(np.maximum(power, 1e-10))
+    db = np.maximum(db, db.max(axis=0) - TOP_DB)
+    low, high = db.min(axis=0), db.max(axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    return np.rint((db - low) / span * max_height).T.astype(np.uint16)
+
+def build_render_tables(spectrum_heights, onset_env, beat_times, sr, hop_length):
+    """
+    Collects the per-frame tables the render loop reads, so drawing a frame only indexes
+    arrays: bar heights and onset strength per analysis frame, the sorted beat times for
+    a binary search and the particle threshold.
+
+    Parameters:
+    spectrum_heights (np.ndarray): (frames x bars) heights from band_heights.
+    onset_env (np.ndarray): Onset strength per frame.
+    beat_times (np.ndarray): Beat times in seconds.
+    sr (int): Sampling rate.
+    hop_length (int): Hop between analysis frames.
+
+    Returns:
+    dict: 'frame_rate', 'spectrum_heights', 'onset_env' (float32), 'onset_threshold' and
+    'beat_times' (sorted float64).
+    """
+    onset_env = np.asarray(onset_env, dtype=np.float32)
+    return {
+        'frame_rate': sr / hop_length,
+        'spectrum_heights': spectrum_heights,
+        'onset_env': onset_env,
+        'onset_threshold': float(onset_env.mean()) * ONSET_THRESHOLD_RATIO if len(onset_env) else np.inf,
+        'beat_times': np.sort(np.asarray(beat_times, dtype=np.float64)),
+    }
+
+def near_beat(beat_times, current_time, window=BEAT_WINDOW):
+    """
+    Checks whether a time is within window seconds of a beat with a binary search.
+
+    Parameters:
+    beat_times (np.ndarray): Sorted beat times in seconds.
+    current_time (float): Song position in seconds.
+    window (float): Tolerance in seconds. Default is BEAT_WINDOW.
+
+    Returns:
+    bool: True if a beat is closer than window.
+    """
+    i = int(np.searchsorted(beat_times, current_time))
+    if i < len(beat_times) and beat_times[i] - current_time < window:
+        return True
+    return i > 0 and current_time - beat_times[i - 1] < window
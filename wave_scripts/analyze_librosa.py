@@ -1,125 +1,256 @@
-import json
 import numpy as np
 import matplotlib.pyplot as plt
 import pandas as pd
+import warnings
+from feature_store import load_results
 
-# Load the analysis results from the JSON file
-with open(r"C:\Users\Kenrm\repositories\music-prod\data\analysis_results.json", 'r') as f:
-    analysis_results = json.load(f)
-
-file_names = [result['file'] for result in analysis_results]
-tempos = [result['features']['tempo'] for result in analysis_results if result['features']['tempo'] is not None]
-average_tempo = np.mean(tempos)
-print(f"Average Tempo: {average_tempo:.2f} BPM")
-
-rms_values = [np.mean(result['features']['rms']) for result in analysis_results if np.mean(result['features']['rms']) is not None]
-average_rms = np.mean(rms_values)
-print(f"Average RMS Energy: {average_rms:.2f}")
-
-spectral_bandwidths = [np.mean(result['features']['spectral_bandwidth']) for result in analysis_results if np.mean(result['features']['spectral_bandwidth']) is not None]
-average_spectral_bandwidth = np.mean(spectral_bandwidths)
-print(f"Average Spectral Bandwidth: {average_spectral_bandwidth:.2f} Hz")
-
-# Extract chroma features from the first analyzed file
-chroma = np.array(analysis_results[0]['features']['chroma'])
-
-# Plot the chroma features
-plt.figure(figsize=(10, 4))
-plt.imshow(chroma, aspect='auto', origin='lower', cmap='coolwarm')
-plt.title('Chroma Features')
-plt.xlabel('Time')
-plt.ylabel('Pitch Class')
-plt.colorbar()
-plt.show()
-
-# Extract spectral centroid from the first analyzed file
-spectral_centroid = np.array(analysis_results[0]['features']['spectral_centroid'])
-
-# Plot the spectral centroid
-plt.figure(figsize=(10, 4))
-plt.plot(spectral_centroid[0])
-plt.title('Spectral Centroid')
-plt.xlabel('Time')
-plt.ylabel('Frequency (Hz)')
-plt.show()
-
-# Extract spectral bandwidth from the first analyzed file
-spectral_bandwidth = np.array(analysis_results[0]['features']['spectral_bandwidth'])
-
-# Plot the spectral bandwidth
-plt.figure(figsize=(10, 4))
-plt.plot(spectral_bandwidth[0])
-plt.title('Spectral Bandwidth')
-plt.xlabel('Time')
-plt.ylabel('Bandwidth (Hz)')
-plt.show()
-
-# Extract spectral contrast from the first analyzed file
-spectral_contrast = np.array(analysis_results[0]['features']['spectral_contrast'])
-
-# Plot the spectral contrast
-plt.figure(figsize=(10, 4))
-plt.imshow(spectral_contrast, aspect='auto', origin='lower', cmap='coolwarm')
-plt.title('Spectral Contrast')
-plt.xlabel('Time')
-plt.ylabel('Frequency Bands')
-plt.colorbar()
-plt.show()
-
-# Extract spectral flatness from the first analyzed file
-spectral_flatness = np.array(analysis_results[0]['features']['spectral_flatness'])
-
-# Plot the spectral flatness
-plt.figure(figsize=(10, 4))
-plt.plot(spectral_flatness[0])
-plt.title('Spectral Flatness')
-plt.xlabel('Time')
-plt.ylabel('Flatness')
-plt.show()
-
-# Extract spectral rolloff from the first analyzed file
-spectral_rolloff = np.array(analysis_results[0]['features']['spectral_rolloff'])
-
-# Plot the spectral rolloff
-plt.figure(figsize=(10, 4))
-plt.plot(spectral_rolloff[0])
-plt.title('Spectral Rolloff')
-plt.xlabel('Time')
-plt.ylabel('Frequency (Hz)')
-plt.show()
-
-# Filter out None values from file_names, tempos, and rms_values
-filtered_file_names = [result['file'] for result in analysis_results if result['features']['tempo'] is not None]
-filtered_rms_values = [np.mean(result['features']['rms']) for result in analysis_results if np.mean(result['features']['rms']) is not None]
-
-plt.figure(figsize=(10, 5))
-plt.subplot(2, 1, 1)
-plt.bar(filtered_file_names, tempos)
-plt.title('Tempo of Each File')
-plt.xlabel('File')
-plt.ylabel('Tempo (BPM)')
-plt.xticks(rotation=90)
-
-plt.subplot(2, 1, 2)
-plt.bar(filtered_file_names, filtered_rms_values)
-plt.title('RMS Energy of Each File')
-plt.xlabel('File')
-plt.ylabel('RMS Energy')
-plt.xticks(rotation=90)
-
-plt.tight_layout()
-plt.show()
-
-# Create a DataFrame from the analysis results
-data = {
-    'tempo': [result['features']['tempo'] for result in analysis_results if result['features']['tempo'] is not None],
-    'rms': [np.mean(result['features']['rms']) for result in analysis_results if np.mean(result['features']['rms']) is not None],
-    'spectral_centroid': [np.mean(result['features']['spectral_centroid']) for result in analysis_results if np.mean(result['features']['spectral_centroid']) is not None],
-    'spectral_bandwidth': [np.mean(result['features']['spectral_bandwidth']) for result in analysis_results if np.mean(result['features']['spectral_bandwidth']) is not None]
-}
-
-df = pd.DataFrame(data)
-
-# Calculate the correlation matrix
-correlation_matrix = df.corr()
-print(correlation_matrix)
\ No newline at end of file
+# Features stored without a time axis: one value (or one value per row) per file
+TIMELESS_FEATURES = ('tempo', 'key')
+
+# Suffixes of the whole-track summaries streamed results carry next to each frame feature
+SUMMARY_SUFFIXES = ('_mean', '_std')
+
+def is_timeless(name):
+    """
+    Returns True for features that have no time axis to aggregate over: the scalar
+    features and the streaming summaries. Frame features count as having one even when
+    a file is shorter than a hop and has a single frame.
+    """
+    return name in TIMELESS_FEATURES or name.endswith(SUMMARY_SUFFIXES)
+
+def _as_frames(value):
+    """
+    Returns a feature value as a (rows x frames) float array, or None if it's missing.
+    """
+    if value is None:
+        return None
+    array = np.asarray(value, dtype=np.float64)
+    if array.size == 0:
+        return None
+    if array.ndim == 0:
+        return array.reshape(1, 1)
+    if array.ndim == 1:
+        # One value per row (tempo, streaming summaries), no time axis
+        return array.reshape(-1, 1)
+    return array.reshape(-1, array.shape[-1])
+
+def _segment_reduce(values, counts, aggregate):
+    """
+    Reduces consecutive segments of the frame axis with NaN-aware np.*.reduceat calls.
+
+    Parameters:
+    values (np.ndarray): (rows x total_frames) frames of all files, concatenated.
+    counts (np.ndarray): Number of frames of each file (all non-zero).
+    aggregate (str): 'mean', 'std', 'min' or 'max'.
+
+    Returns:
+    np.ndarray: (files x rows) aggregates; NaN where a file has no valid frame.
+    """
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    valid = ~np.isnan(values)
+    n_valid = np.add.reduceat(valid, starts, axis=1).T
+    with np.errstate(invalid='ignore', divide='ignore'):
+        if aggregate in ('mean', 'std'):
+            total = np.add.reduceat(np.where(valid, values, 0.0), starts, axis=1).T
+            mean = total / n_valid
+            if aggregate == 'mean':
+                return mean
+            centered = values - np.repeat(mean.T, counts, axis=1)
+            squares = np.add.reduceat(np.where(valid, centered ** 2, 0.0), starts, axis=1).T
+            return np.sqrt(squares / n_valid)
+        if aggregate == 'min':
+            result = np.minimum.reduceat(np.where(valid, values, np.inf), starts, axis=1).T
+        else:
+            result = np.maximum.reduceat(np.where(valid, values, -np.inf), starts, axis=1).T
+    return np.where(n_valid > 0, result, np.nan)
+
+def _put_column(columns, label, values):
+    # Streaming results carry precomputed '<name>_mean' / '<name>_std' summaries that land
+    # in the same columns as the aggregates computed from frames; merge instead of overwrite
+    if label in columns:
+        values = np.where(np.isnan(columns[label]), values, columns[label])
+    columns[label] = values
+
+def build_feature_table(analysis_results, aggregates=('mean',), features=None):
+    """
+    Turns analysis results into a tidy DataFrame with one row per file, in a single pass.
+
+    Every feature is reduced over its time axis with each aggregate. Single-row features
+    give one column per aggregate ('rms_mean'); multi-row features give one column per
+    row ('chroma_mean_0' .. 'chroma_mean_11'), even for files with a single frame; values
+    without a time axis (tempo, key, see is_timeless) are used as-is ('tempo'). Missing features and NaN frames become NaN instead of being
+    dropped, so every column stays aligned with the file index.
+
+    Parameters:
+    analysis_results (list): {'file': path, 'features': dict} entries, as written by analyze_folder.
+    aggregates (tuple): Any of 'mean', 'std', 'min', 'max', 'median' or 'pNN' (NN-th percentile).
+        Default is ('mean',).
+    features (iterable, optional): Names of the features to include. Defaults to every
+        feature of the first file.
+
+    Returns:
+    pd.DataFrame: Feature table indexed by file path.
+    """
+    files = []
+    frames = {}
+    for result in analysis_results:
+        if features is None:
+            features = list(result['features'])
+        row = len(files)
+        files.append(result['file'])
+        for name in features:
+            value = _as_frames(result['features'].get(name))
+            if value is not None:
+                frames.setdefault(name, []).append((row, value))
+
+    columns = {}
+    for name in features or []:
+        entries = frames.get(name, [])
+        if not entries:
+            _put_column(columns, name, np.full(len(files), np.nan))
+            continue
+        n_rows = entries[0][1].shape[0]
+        rows = np.array([row for row, _ in entries])
+        if is_timeless(name):
+            table = np.full((len(files), n_rows), np.nan)
+            table[rows] = np.concatenate([value for _, value in entries], axis=1).T
+            labels = [name] if n_rows == 1 else [f"{name}_{i}" for i in range(n_rows)]
+            for i, label in enumerate(labels):
+                _put_column(columns, label, table[:, i])
+            continue
+
+        values = np.concatenate([value for _, value in entries], axis=1)
+        counts = np.array([value.shape[1] for _, value in entries])
+        for aggregate in aggregates:
+            table = np.full((len(files), n_rows), np.nan)
+            if aggregate in ('mean', 'std', 'min', 'max'):
+                table[rows] = _segment_reduce(values, counts, aggregate)
+            else:
+                q = 50.0 if aggregate == 'median' else float(aggregate.lstrip('p'))
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', RuntimeWarning)
+                    table[rows] = [np.nanpercentile(value, q, axis=1) for _, value in entries]
+            if n_rows == 1:
+                _put_column(columns, f"{name}_{aggregate}", table[:, 0])
+            else:
+                for i in range(n_rows):
+                    _put_column(columns, f"{name}_{aggregate}_{i}", table[:, i])
+
+    return pd.DataFrame(columns, index=pd.Index(files, name='file'))
+
+if __name__ == "__main__":
+    # Load the analysis results from the feature store (or a .json export)
+    analysis_results = load_results(r"C:\Users\Kenrm\repositories\music-prod\data\analysis_results.features")
+    table = build_feature_table(
+        analysis_results,
+        features=['tempo', 'rms', 'spectral_centroid', 'spectral_bandwidth']
+    )
+
+    average_tempo = table['tempo'].mean()
+    print(f"Average Tempo: {average_tempo:.2f} BPM")
+
+    average_rms = table['rms_mean'].mean()
+    print(f"Average RMS Energy: {average_rms:.2f}")
+
+    average_spectral_bandwidth = table['spectral_bandwidth_mean'].mean()
+    print(f"Average Spectral Bandwidth: {average_spectral_bandwidth:.2f} Hz")
+
+    # Extract chroma features from the first analyzed file
+    chroma = np.array(analysis_results[0]['features']['chroma'])
+
+    # Plot the chroma features
+    plt.figure(figsize=(10, 4))
+    plt.imshow(chroma, aspect='auto', origin='lower', cmap='coolwarm')
+    plt.title('Chroma Features')
+    plt.xlabel('Time')
+    plt.ylabel('Pitch Class')
+    plt.colorbar()
+    plt.show()
+
+    # Extract spectral centroid from the first analyzed file
+    spectral_centroid = np.array(analysis_results[0]['features']['spectral_centroid'])
+
+    # Plot the spectral centroid
+    plt.figure(figsize=(10, 4))
+    plt.plot(spectral_centroid[0])
+    plt.title('Spectral Centroid')
+    plt.xlabel('Time')
+    plt.ylabel('Frequency (Hz)')
+    plt.show()
+
+    # Extract spectral bandwidth from the first analyzed file
+    spectral_bandwidth = np.array(analysis_results[0]['features']['spectral_bandwidth'])
+
+    # Plot the spectral bandwidth
+    plt.figure(figsize=(10, 4))
+    plt.plot(spectral_bandwidth[0])
+    plt.title('Spectral Bandwidth')
+    plt.xlabel('Time')
+    plt.ylabel('Bandwidth (Hz)')
+    plt.show()
+
+    # Extract spectral contrast from the first analyzed file
+    spectral_contrast = np.array(analysis_results[0]['features']['spectral_contrast'])
+
+    # Plot the spectral contrast
+    plt.figure(figsize=(10, 4))
+    plt.imshow(spectral_contrast, aspect='auto', origin='lower', cmap='coolwarm')
+    plt.title('Spectral Contrast')
+    plt.xlabel('Time')
+    plt.ylabel('Frequency Bands')
+    plt.colorbar()
+    plt.show()
+
+    # Extract spectral flatness from the first analyzed file
+    spectral_flatness = np.array(analysis_results[0]['features']['spectral_flatness'])
+
+    # Plot the spectral flatness
+    plt.figure(figsize=(10, 4))
+    plt.plot(spectral_flatness[0])
+    plt.title('Spectral Flatness')
+    plt.xlabel('Time')
+    plt.ylabel('Flatness')
+    plt.show()
+
+    # Extract spectral rolloff from the first analyzed file
+    spectral_rolloff = np.array(analysis_results[0]['features']['spectral_rolloff'])
+
+    # Plot the spectral rolloff
+    plt.figure(figsize=(10, 4))
+    plt.plot(spectral_rolloff[0])
+    plt.title('Spectral Rolloff')
+    plt.xlabel('Time')
+    plt.ylabel('Frequency (Hz)')
+    plt.show()
+
+    # Only plot files that have both values, so the two bar charts line up
+    plotted = table.dropna(subset=['tempo', 'rms_mean'])
+
+    plt.figure(figsize=(10, 5))
+    plt.subplot(2, 1, 1)
+    plt.bar(plotted.index, plotted['tempo'])
+    plt.title('Tempo of Each File')
+    plt.xlabel('File')
+    plt.ylabel('Tempo (BPM)')
+    plt.xticks(rotation=90)
+
+    plt.subplot(2, 1, 2)
+    plt.bar(plotted.index, plotted['rms_mean'])
+    plt.title('RMS Energy of Each File')
+    plt.xlabel('File')
+    plt.ylabel('RMS Energy')
+    plt.xticks(rotation=90)
+
+    plt.tight_layout()
+    plt.show()
+
+    # Create a DataFrame from the analysis results
+    df = table[['tempo', 'rms_mean', 'spectral_centroid_mean', 'spectral_bandwidth_mean']].rename(columns={
+        'rms_mean': 'rms',
+        'spectral_centroid_mean': 'spectral_centroid',
+        'spectral_bandwidth_mean': 'spectral_bandwidth'
+    })
+
+    # Calculate the correlation matrix
+    correlation_matrix = df.corr()
+    print(correlation_matrix)
@@ -0,0 +1,359 @@
+import os
+import librosa
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.ndimage import maximum_filter
+from wav_loader import load_wav
+
+# Fingerprints are taken at a low rate: the peaks that survive are what identifies a
+# loop, and resampling everything to one rate makes 44.1/48/96 kHz copies comparable.
+FINGERPRINT_SR = 11025
+N_FFT = 1024
+HOP_LENGTH = 256
+
+# Spectral peaks: local maxima over (frequency bins, frames), no more than PEAK_FLOOR_DB
+# below the loudest bin of the file, so the peaks don't depend on gain or dither
+PEAK_NEIGHBORHOOD = (15, 11)
+PEAK_FLOOR_DB = 50.0
+
+# Only the strongest peaks of each second are kept, so noise and dither in quiet
+# passages can't crowd out the peaks a clean copy shares
+PEAKS_PER_SECOND = 30
+
+# Landmarks pair each peak with up to FAN_OUT later peaks at most MAX_DT frames later
+# and MAX_DF bins apart
+FAN_OUT = 5
+MAX_DT = 63
+MAX_DF = 63
+PAIR_WINDOW = 32
+
+# Hashes with more postings than this (silence, hum) are too common to vote
+MAX_BUCKET = 2000
+
+# Matches with an offset within this many frames of each other count as the same alignment
+OFFSET_TOLERANCE = 1
+
+def landmark_hashes(y, sr=FINGERPRINT_SR):
+    """
+    Computes spectral-peak landmark hashes: pairs of nearby peaks encoded as
+    (anchor bin, bin difference, frame difference).
+
+    Parameters:
+    y (np.ndarray): Mono audio at FINGERPRINT_SR.
+    sr (int): Sampling rate of y. Default is FINGERPRINT_SR.
+
+    Returns:
+    tuple: (hashes, times) arrays (uint32 and uint16), times being the anchor frame of each hash.
+    """
+    S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    if S.size == 0 or not S.any():
+        return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.uint16)
+    db = librosa.amplitude_to_db(S, ref=np.max, top_db=None)
+    peaks = (maximum_filter(db, size=PEAK_NEIGHBORHOOD, mode='constant', cval=-np.inf) == db) \
+        & (db > -PEAK_FLOOR_DB)
+    freqs, frames = np.nonzero(peaks)
+    strength = db[freqs, frames]
+    second = frames // max(1, round(sr / HOP_LENGTH))
+    order = np.lexsort((-strength, second))
+    rank = np.arange(len(order)) - np.searchsorted(second[order], second[order], side='left')
+    keep = order[rank < PEAKS_PER_SECOND]
+    freqs, frames = freqs[keep], frames[keep]
+    order = np.argsort(frames, kind='stable')
+    freqs, frames = np.minimum(freqs[order], 511).astype(np.int64), frames[order].astype(np.int64)
+
+    hashes, times = [], []
+    taken = np.zeros(len(frames), dtype=np.int64)
+    for step in range(1, PAIR_WINDOW + 1):
+        if step >= len(frames):
+            break
+        anchors = np.arange(len(frames) - step)
+        dt = frames[step:] - frames[:-step]
+        df = freqs[step:] - freqs[:-step]
+        valid = (dt >= 1) & (dt <= MAX_DT) & (np.abs(df) <= MAX_DF) & (taken[:-step] < FAN_OUT)
+        anchors = anchors[valid]
+        taken[anchors] += 1
+        hashes.append((freqs[anchors] << 13) | ((df[valid] + 64) << 6) | dt[valid])
+        times.append(frames[anchors])
+    if not hashes:
+        return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.uint16)
+    return (np.concatenate(hashes).astype(np.uint32),
+            np.minimum(np.concatenate(times), np.iinfo(np.uint16).max).astype(np.uint16))
+
+def fingerprint_file(file_path):
+    """
+    Loads an audio file at FINGERPRINT_SR and computes its landmark hashes.
+
+    Parameters:
+    file_path (str): Path to the audio file.
+
+    Returns:
+    tuple: (hashes, times) as returned by landmark_hashes.
+    """
+    y, sr = load_wav(file_path, sr=FINGERPRINT_SR, quality='fast')
+    return landmark_hashes(y, sr)
+
+def _fingerprint_worker(file_path):
+    try:
+        return file_path, fingerprint_file(file_path), None
+    except Exception as e:
+        return file_path, None, str(e)
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+
+    def union(self, a, b):
+        self.parent[self.find(a)] = self.find(b)
+
+class FingerprintIndex:
+    """
+    Inverted index from landmark hash to (file, time) postings, stored as flat arrays
+    sorted by hash. A query looks up each of its hashes with a binary search and votes
+    for (file, time offset) pairs; copies of the same audio agree on one offset, however
+    much leading silence, gain or resampling separates them.
+    """
+    def __init__(self):
+        self.files = []
+        self.rows = {}
+        self._pending = []
+        self._file_hashes = np.empty(0, dtype=np.uint32)
+        self._file_times = np.empty(0, dtype=np.uint16)
+        self._file_starts = np.zeros(1, dtype=np.int64)
+        self._sorted = None
+
+    def __len__(self):
+        return len(self.files)
+
+    def add(self, file_path, hashes, times):
+        """
+        Adds a file's fingerprint (as returned by fingerprint_file).
+
+        Parameters:
+        file_path (str): Path of the file.
+        hashes (np.ndarray): Landmark hashes.
+        times (np.ndarray): Anchor frame of each hash.
+
+        Returns:
+        None
+        """
+        if file_path in self.rows:
+            raise ValueError(f"{file_path} is already in the index")
+        self.rows[file_path] = len(self.files)
+        self.files.append(file_path)
+        self._pending.append((np.asarray(hashes, dtype=np.uint32), np.asarray(times, dtype=np.uint16)))
+        self._sorted = None
+
+    def add_files(self, file_paths, workers=1):
+        """
+        Fingerprints files (in a process pool if workers > 1) and adds them.
+
+        Parameters:
+        file_paths (iterable): Paths of the audio files.
+        workers (int): Number of worker processes. Default is 1.
+
+        Returns:
+        None
+        """
+        file_paths = [path for path in file_paths if path not in self.rows]
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                outcomes = list(executor.map(_fingerprint_worker, file_paths, chunksize=16))
+        else:
+            outcomes = map(_fingerprint_worker, file_paths)
+        for file_path, fingerprint, error in outcomes:
+            if error is not None:
+                print(f"Error fingerprinting {os.path.basename(file_path)}: {error}")
+                continue
+            self.add(file_path, *fingerprint)
+
+    def _build(self):
+        if self._pending:
+            counts = [len(hashes) for hashes, _ in self._pending]
+            self._file_hashes = np.concatenate([self._file_hashes] + [hashes for hashes, _ in self._pending])
+            self._file_times = np.concatenate([self._file_times] + [times for _, times in self._pending])
+            self._file_starts = np.concatenate([self._file_starts, self._file_starts[-1] + np.cumsum(counts)])
+            self._pending = []
+        file_ids = np.repeat(np.arange(len(self.files), dtype=np.uint32), np.diff(self._file_starts))
+        order = np.argsort(self._file_hashes, kind='stable')
+        self._sorted = (self._file_hashes[order], file_ids[order], self._file_times[order])
+
+    def fingerprint_of(self, file_path):
+        """
+        Returns the stored (hashes, times) of an indexed file.
+        """
+        if self._sorted is None:
+            self._build()
+        row = self.rows[file_path]
+        start, stop = self._file_starts[row], self._file_starts[row + 1]
+        return self._file_hashes[start:stop], self._file_times[start:stop]
+
+    def query(self, hashes, times, exclude=None, min_votes=5, min_score=0.1, k=10):
+        """
+        Finds indexed files that share time-aligned landmarks with a fingerprint.
+
+        Parameters:
+        hashes (np.ndarray): Landmark hashes of the query.
+        times (np.ndarray): Anchor frames of the query hashes.
+        exclude (str, optional): File to leave out (the query itself).
+        min_votes (int): Minimum number of aligned matching hashes. Default is 5.
+        min_score (float): Minimum similarity score. Default is 0.1.
+        k (int): Maximum number of matches. Default is 10.
+
+        Returns:
+        list: (file_path, score, offset_seconds) tuples, best first. score is the share of
+        the shorter fingerprint's hashes that line up; offset_seconds is how much later the
+        matched file's audio starts.
+        """
+        if self._sorted is None:
+            self._build()
+        sorted_hashes, sorted_files, sorted_times = self._sorted
+        hashes = np.asarray(hashes, dtype=np.uint32)
+        if len(hashes) == 0 or len(sorted_hashes) == 0:
+            return []
+
+        lo = np.searchsorted(sorted_hashes, hashes, side='left')
+        hi = np.searchsorted(sorted_hashes, hashes, side='right')
+        lengths = np.where(hi - lo <= MAX_BUCKET, hi - lo, 0)
+        total = int(lengths.sum())
+        if total == 0:
+            return []
+        # Positions of every posting of every query hash
+        starts = np.cumsum(lengths) - lengths
+        positions = np.repeat(lo, lengths) + np.arange(total) - np.repeat(starts, lengths)
+        files = sorted_files[positions].astype(np.int64)
+        offsets = sorted_times[positions].astype(np.int64) - np.repeat(np.asarray(times, dtype=np.int64), lengths)
+        if exclude is not None:
+            keep = files != self.rows[exclude]
+            files, offsets = files[keep], offsets[keep]
+            if len(files) == 0:
+                return []
+
+        # Votes per (file, offset), with neighbouring offsets pooled
+        width = 2 ** 17
+        keys, votes = np.unique(files * width + offsets + width // 2, return_counts=True)
+        pooled = votes.copy()
+        for shift in range(1, OFFSET_TOLERANCE + 1):
+            for neighbour in (keys - shift, keys + shift):
+                index = np.searchsorted(keys, neighbour)
+                found = (index < len(keys)) & (keys[np.minimum(index, len(keys) - 1)] == neighbour)
+                pooled[found] += votes[index[found]]
+
+        # Best offset per file
+        key_files = keys // width
+        order = np.lexsort((-pooled, key_files))
+        first = order[np.concatenate([[True], key_files[order][1:] != key_files[order][:-1]])]
+        counts = np.diff(self._file_starts)
+        matches = []
+        for index in first:
+            file_id = int(key_files[index])
+            score = pooled[index] / max(min(len(hashes), counts[file_id]), 1)
+            if pooled[index] >= min_votes and score >= min_score:
+                offset = (keys[index] % width - width // 2) * HOP_LENGTH / FINGERPRINT_SR
+                matches.append((self.files[file_id], float(min(score, 1.0)), float(offset)))
+        matches.sort(key=lambda match: match[1], reverse=True)
+        return matches[:k]
+
+    def query_file(self, file_path, **kwargs):
+        """
+        Finds near-duplicates of a file, indexed or not.
+
+        Parameters:
+        file_path (str): Path to the audio file.
+        kwargs: Passed on to query().
+
+        Returns:
+        list: (file_path, score, offset_seconds) tuples, best first.
+        """
+        if file_path in self.rows:
+            return self.query(*self.fingerprint_of(file_path), exclude=file_path, **kwargs)
+        return self.query(*fingerprint_file(file_path), **kwargs)
+
+    def find_near_duplicates(self, min_score=0.25, min_votes=5):
+        """
+        Groups the indexed files into clusters of near-duplicates, one lookup per file.
+
+        Parameters:
+        min_score (float): Minimum similarity score for two files to be linked. Default is 0.25.
+        min_votes (int): Minimum number of aligned matching hashes. Default is 5.
+
+        Returns:
+        list: One dict per cluster, largest first, with 'files', 'score' (the weakest link
+        holding the cluster together) and 'pairs' ((file_a, file_b, score, offset_seconds) tuples).
+        """
+        if self._sorted is None:
+            self._build()
+        links = _UnionFind(len(self.files))
+        pairs = {}
+        for file_path in self.files:
+            for match, score, offset in self.query(*self.fingerprint_of(file_path), exclude=file_path,
+                                                   min_votes=min_votes, min_score=min_score,
+                                                   k=len(self.files)):
+                a, b = sorted((self.rows[file_path], self.rows[match]))
+                if (a, b) not in pairs or pairs[(a, b)][0] < score:
+                    pairs[(a, b)] = (score, offset if self.rows[file_path] == a else -offset)
+                links.union(a, b)
+
+        clusters = {}
+        for (a, b), (score, offset) in pairs.items():
+            cluster = clusters.setdefault(links.find(a), {'members': set(), 'pairs': []})
+            cluster['members'].update((a, b))
+            cluster['pairs'].append((self.files[a], self.files[b], score, offset))
+        result = [
+            {'files': [self.files[i] for i in sorted(cluster['members'])],
+             'score': min(pair[2] for pair in cluster['pairs']),
+             'pairs': sorted(cluster['pairs'], key=lambda pair: pair[2], reverse=True)}
+            for cluster in clusters.values()
+        ]
+        result.sort(key=lambda cluster: (len(cluster['files']), cluster['score']), reverse=True)
+        return result
+
+    def save(self, path):
+        """
+        Saves the fingerprints to a .npz file.
+
+        Parameters:
+        path (str): Output path.
+
+        Returns:
+        None
+        """
+        if self._sorted is None:
+            self._build()
+        np.savez(path, files=np.array(self.files, dtype=str), hashes=self._file_hashes,
+                 times=self._file_times, starts=self._file_starts)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an index saved with save().
+
+        Parameters:
+        path (str): Path to the .npz file.
+
+        Returns:
+        FingerprintIndex: The loaded index.
+        """
+        data = np.load(path)
+        index = cls()
+        index.files = [str(file_path) for file_path in data['files']]
+        index.rows = {file_path: row for row, file_path in enumerate(index.files)}
+        index._file_hashes = data['hashes']
+        index._file_times = data['times']
+        index._file_starts = data['starts']
+        return index
+
+# Example usage
+if __name__ == "__main__":
+    from run_librosa import find_wav_files
+
+    index = FingerprintIndex()
+    index.add_files(find_wav_files(r"C:\Users\Kenrm\repositories\music-prod\data\Wave Files"), workers=os.cpu_count())
+    index.save(r"C:\Users\Kenrm\repositories\music-prod\data\fingerprints.npz")
+    for cluster in index.find_near_duplicates():
+        print(f"{cluster['score']:.2f}  " + "\n      ".join(cluster['files']))
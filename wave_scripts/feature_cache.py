@@ -0,0 +1,260 @@
+import os
+import sqlite3
+import pickle
+import hashlib
+import time
+
+# Number of rows fetched per SELECT ... IN (...) query
+LOOKUP_BATCH = 500
+
+def hash_file(file_path, block_size=1024 * 1024):
+    """
+    Computes a BLAKE2b digest of a file's contents.
+
+    Parameters:
+    file_path (str): Path to the file.
+    block_size (int): Read size in bytes. Default is 1 MB.
+
+    Returns:
+    str: Hex digest of the file contents.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class FeatureCache:
+    """
+    Persistent on-disk cache of per-file analysis results, stored in a SQLite database.
+
+    Entries are keyed by (namespace, version, path) and are valid while the file's size
+    and mtime (or, with hash_contents, its content hash) match. Entries of other feature-set
+    versions are kept, so switching between feature sets doesn't throw away the other's
+    results; the least recently used entries of any version are evicted once the namespace
+    grows past max_bytes, and purge_other_versions() drops them explicitly.
+
+    Parameters:
+    cache_path (str): Path to the SQLite database file.
+    namespace (str): Name of the analysis that owns the entries, e.g. 'librosa'.
+    version (str): Feature-set version; change it whenever feature parameters change.
+    max_bytes (int, optional): Maximum total size of the stored features. Default is unbounded.
+    hash_contents (bool): If True, a file whose size or mtime changed is still a hit when its
+        content hash is unchanged. Default is False.
+    """
+    def __init__(self, cache_path, namespace, version, max_bytes=None, hash_contents=False):
+        self.cache_path = cache_path
+        self.namespace = namespace
+        self.version = str(version)
+        self.max_bytes = max_bytes
+        self.hash_contents = hash_contents
+
+        self.conn = sqlite3.connect(cache_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT,
+                version TEXT NOT NULL,
+                nbytes INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                features BLOB NOT NULL,
+                PRIMARY KEY (namespace, version, path)
+            )
+        """)
+        key_columns = {row[1] for row in self.conn.execute("PRAGMA table_info(entries)") if row[5]}
+        if 'version' not in key_columns:
+            # Caches created when one version per namespace was kept
+            self.conn.execute("ALTER TABLE entries RENAME TO entries_old")
+            self.conn.execute("DROP INDEX IF EXISTS entries_lru")
+            self.conn.execute("""
+                CREATE TABLE entries (
+                    namespace TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    content_hash TEXT,
+                    version TEXT NOT NULL,
+                    nbytes INTEGER NOT NULL,
+                    last_access REAL NOT NULL,
+                    features BLOB NOT NULL,
+                    PRIMARY KEY (namespace, version, path)
+                )
+            """)
+            self.conn.execute("INSERT INTO entries SELECT * FROM entries_old")
+            self.conn.execute("DROP TABLE entries_old")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (namespace, last_access)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup(self, file_paths):
+        """
+        Splits files into cache hits and files that need to be (re-)analyzed.
+
+        Only one stat per file is needed when size and mtime are unchanged; with
+        hash_contents, changed files are hashed before being declared a miss.
+
+        Parameters:
+        file_paths (list): Paths of the files to look up.
+
+        Returns:
+        tuple: (hits, misses) where hits maps path -> features and misses is a list of paths.
+        """
+        hits = {}
+        misses = []
+        now = time.time()
+        for start in range(0, len(file_paths), LOOKUP_BATCH):
+            batch = file_paths[start:start + LOOKUP_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            rows = self.conn.execute(
+                f"SELECT path, size, mtime_ns, content_hash, features FROM entries "
+                f"WHERE namespace = ? AND version = ? AND path IN ({placeholders})",
+                [self.namespace, self.version, *batch]
+            ).fetchall()
+            stored = {row[0]: row[1:] for row in rows}
+
+            touched = []
+            for file_path in batch:
+                entry = stored.get(file_path)
+                if entry is None:
+                    misses.append(file_path)
+                    continue
+                size, mtime_ns, content_hash, blob = entry
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    # Removed or unreadable since it was listed; analysis will report it
+                    misses.append(file_path)
+                    continue
+                if st.st_size == size and st.st_mtime_ns == mtime_ns:
+                    hits[file_path] = pickle.loads(blob)
+                    touched.append((now, self.namespace, self.version, file_path))
+                elif self.hash_contents and content_hash and st.st_size == size \
+                        and hash_file(file_path) == content_hash:
+                    # Touched or copied but unchanged: refresh the stat key
+                    hits[file_path] = pickle.loads(blob)
+                    self.conn.execute(
+                        "UPDATE entries SET mtime_ns = ? WHERE namespace = ? AND version = ? AND path = ?",
+                        (st.st_mtime_ns, self.namespace, self.version, file_path)
+                    )
+                    touched.append((now, self.namespace, self.version, file_path))
+                else:
+                    misses.append(file_path)
+
+            self.conn.executemany(
+                "UPDATE entries SET last_access = ? WHERE namespace = ? AND version = ? AND path = ?",
+                touched
+            )
+        self.conn.commit()
+        return hits, misses
+
+    def put(self, file_path, features):
+        """
+        Stores the features of a file, then evicts old entries if the cache is over budget.
+
+        Parameters:
+        file_path (str): Path to the analyzed file.
+        features (dict): The extracted features.
+
+        Returns:
+        None
+        """
+        self.put_many([(file_path, features)])
+
+    def put_many(self, items):
+        """
+        Stores the features of several files in one transaction.
+
+        Parameters:
+        items (list): (file_path, features) pairs.
+
+        Returns:
+        None
+        """
+        now = time.time()
+        rows = []
+        for file_path, features in items:
+            try:
+                st = os.stat(file_path)
+            except OSError:
+                continue  # Gone since it was analyzed; nothing to key the entry on
+            content_hash = hash_file(file_path) if self.hash_contents else None
+            blob = pickle.dumps(features, protocol=pickle.HIGHEST_PROTOCOL)
+            rows.append((
+                self.namespace, file_path, st.st_size, st.st_mtime_ns, content_hash,
+                self.version, len(blob), now, blob
+            ))
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO entries "
+            "(namespace, path, size, mtime_ns, content_hash, version, nbytes, last_access, features) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        self.conn.commit()
+        if self.max_bytes is not None:
+            self.evict(self.max_bytes)
+
+    def total_bytes(self):
+        """
+        Returns the total size of the features stored in this namespace, all versions included.
+
+        Returns:
+        int: Size in bytes.
+        """
+        row = self.conn.execute(
+            "SELECT COALESCE(SUM(nbytes), 0) FROM entries WHERE namespace = ?",
+            (self.namespace,)
+        ).fetchone()
+        return row[0]
+
+    def evict(self, max_bytes):
+        """
+        Deletes least recently used entries, of any version, until the namespace fits in max_bytes.
+
+        Parameters:
+        max_bytes (int): Size budget in bytes.
+
+        Returns:
+        int: Number of evicted entries.
+        """
+        excess = self.total_bytes() - max_bytes
+        if excess <= 0:
+            return 0
+        victims = []
+        for version, path, nbytes in self.conn.execute(
+            "SELECT version, path, nbytes FROM entries WHERE namespace = ? ORDER BY last_access",
+            (self.namespace,)
+        ):
+            victims.append((self.namespace, version, path))
+            excess -= nbytes
+            if excess <= 0:
+                break
+        self.conn.executemany("DELETE FROM entries WHERE namespace = ? AND version = ? AND path = ?", victims)
+        self.conn.commit()
+        return len(victims)
+
+    def purge_other_versions(self):
+        """
+        Deletes the entries of this namespace written with any other feature-set version.
+
+        Returns:
+        int: Number of deleted entries.
+        """
+        cursor = self.conn.execute(
+            "DELETE FROM entries WHERE namespace = ? AND version != ?",
+            (self.namespace, self.version)
+        )
+        self.conn.commit()
+        return cursor.rowcount
@@ -0,0 +1,193 @@
+import librosa
+import numpy as np
+from instrumentation import stage
+from key_detection import key_feature
+
+# Analysis parameters shared by every node (librosa's defaults)
+N_FFT = 2048
+HOP_LENGTH = 512
+BINS_PER_OCTAVE = 36
+N_OCTAVES = 7
+
+# The features analyze_audio returns by default, in output order
+DEFAULT_FEATURES = (
+    'tempo',
+    'chroma',
+    'tonnetz',
+    'key',
+    'rms',
+    'spectral_centroid',
+    'spectral_bandwidth',
+    'spectral_contrast',
+    'spectral_flatness',
+    'spectral_rolloff',
+)
+
+# name -> (dependencies, function). Functions receive the values of their
+# dependencies as keyword arguments; 'y' and 'sr' are always available.
+FEATURE_GRAPH = {}
+
+def register_feature(name, *dependencies):
+    """
+    Decorator that adds a node to the feature graph.
+
+    Parameters:
+    name (str): Name of the feature or intermediate.
+    dependencies (str): Names of the nodes (or 'y' / 'sr') the function needs.
+
+    Returns:
+    function: The decorator.
+    """
+    def decorator(func):
+        FEATURE_GRAPH[name] = (dependencies, func)
+        return func
+    return decorator
+
+# === INTERMEDIATES ===
+
+@register_feature('stft_magnitude', 'y')
+def _stft_magnitude(y):
+    return np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+
+@register_feature('mel_db', 'stft_magnitude', 'sr')
+def _mel_db(stft_magnitude, sr):
+    mel = librosa.feature.melspectrogram(S=stft_magnitude ** 2, sr=sr, n_fft=N_FFT)
+    return librosa.power_to_db(mel)
+
+@register_feature('onset_envelope', 'mel_db', 'sr')
+def _onset_envelope(mel_db, sr):
+    # Same envelope beat_track builds internally (median aggregation)
+    return librosa.onset.onset_strength(S=mel_db, sr=sr, hop_length=HOP_LENGTH, aggregate=np.median)
+
+@register_feature('tuning', 'stft_magnitude', 'sr')
+def _tuning(stft_magnitude, sr):
+    # chroma_cqt estimates the tuning from its own spectrogram; reuse ours instead
+    return librosa.estimate_tuning(S=stft_magnitude, sr=sr, bins_per_octave=BINS_PER_OCTAVE)
+
+@register_feature('cqt_magnitude', 'y', 'sr', 'tuning')
+def _cqt_magnitude(y, sr, tuning):
+    return np.abs(librosa.cqt(
+        y,
+        sr=sr,
+        hop_length=HOP_LENGTH,
+        n_bins=N_OCTAVES * BINS_PER_OCTAVE,
+        bins_per_octave=BINS_PER_OCTAVE,
+        tuning=tuning
+    ))
+
+# === FEATURES ===
+
+@register_feature('tempo', 'onset_envelope', 'sr')
+def _tempo(onset_envelope, sr):
+    tempo, _ = librosa.beat.beat_track(onset_envelope=onset_envelope, sr=sr, hop_length=HOP_LENGTH)
+    return tempo
+
+@register_feature('chroma', 'cqt_magnitude', 'sr')
+def _chroma(cqt_magnitude, sr):
+    return librosa.feature.chroma_cqt(C=cqt_magnitude, sr=sr, bins_per_octave=BINS_PER_OCTAVE)
+
+@register_feature('tonnetz', 'chroma', 'sr')
+def _tonnetz(chroma, sr):
+    return librosa.feature.tonnetz(sr=sr, chroma=chroma)
+
+@register_feature('key', 'chroma')
+def _key(chroma):
+    # [template index, correlation, confidence]; key_detection.decode_key gives the name
+    return key_feature(chroma)
+
+@register_feature('rms', 'y')
+def _rms(y):
+    # Time-domain RMS is cheaper than going through the spectrogram
+    return librosa.feature.rms(y=y, frame_length=N_FFT, hop_length=HOP_LENGTH)
+
+@register_feature('spectral_centroid', 'stft_magnitude', 'sr')
+def _spectral_centroid(stft_magnitude, sr):
+    return librosa.feature.spectral_centroid(S=stft_magnitude, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+
+@register_feature('spectral_bandwidth', 'stft_magnitude', 'sr')
+def _spectral_bandwidth(stft_magnitude, sr):
+    return librosa.feature.spectral_bandwidth(S=stft_magnitude, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+
+@register_feature('spectral_contrast', 'stft_magnitude', 'sr')
+def _spectral_contrast(stft_magnitude, sr):
+    return librosa.feature.spectral_contrast(S=stft_magnitude, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+
+@register_feature('spectral_flatness', 'stft_magnitude')
+def _spectral_flatness(stft_magnitude):
+    return librosa.feature.spectral_flatness(S=stft_magnitude, n_fft=N_FFT, hop_length=HOP_LENGTH)
+
+@register_feature('spectral_rolloff', 'stft_magnitude', 'sr')
+def _spectral_rolloff(stft_magnitude, sr):
+    return librosa.feature.spectral_rolloff(S=stft_magnitude, sr=sr, n_fft=N_FFT, hop_length=HOP_LENGTH)
+
+# === EVALUATION ===
+
+def resolve_order(features, known=()):
+    """
+    Returns every node needed for the requested features, dependencies first.
+
+    Parameters:
+    features (iterable): Names of the requested features.
+    known (iterable): Nodes whose values are already available; neither they nor
+        dependencies only they need are evaluated.
+
+    Returns:
+    list: Node names in evaluation order.
+    """
+    order = []
+    visiting = set()
+
+    def visit(name):
+        if name in order or name in ('y', 'sr') or name in known:
+            return
+        if name not in FEATURE_GRAPH:
+            raise ValueError(f"Unknown feature '{name}'. Available: {', '.join(sorted(FEATURE_GRAPH))}")
+        if name in visiting:
+            raise ValueError(f"Feature graph has a cycle through '{name}'")
+        visiting.add(name)
+        for dependency in FEATURE_GRAPH[name][0]:
+            visit(dependency)
+        visiting.discard(name)
+        order.append(name)
+
+    for name in features:
+        visit(name)
+    return order
+
+def compute_features(y, sr, features=None, known=None):
+    """
+    Computes the requested features, evaluating each shared intermediate once.
+
+    Intermediates that weren't requested are released as soon as their last
+    consumer has run. Each node is timed as an instrumentation stage of the same name.
+
+    Parameters:
+    y (np.ndarray): Audio time series.
+    sr (int): Sampling rate of y.
+    features (iterable, optional): Names of the features to return. Defaults to DEFAULT_FEATURES.
+    known (dict, optional): Node name -> value computed elsewhere (e.g. a tempo confirmed
+        from the file name); those nodes are used as-is instead of being evaluated.
+
+    Returns:
+    dict: Requested feature name -> value, in the requested order.
+    """
+    features = list(DEFAULT_FEATURES if features is None else features)
+    known = known or {}
+    order = resolve_order(features, known)
+    consumers = {name: 0 for name in order}
+    for name in order:
+        for dependency in FEATURE_GRAPH[name][0]:
+            if dependency in consumers:
+                consumers[dependency] += 1
+
+    values = {'y': y, 'sr': sr, **known}
+    for name in order:
+        dependencies, func = FEATURE_GRAPH[name]
+        with stage(name):
+            values[name] = func(**{dependency: values[dependency] for dependency in dependencies})
+        for dependency in dependencies:
+            if dependency in consumers:
+                consumers[dependency] -= 1
+                if consumers[dependency] == 0 and dependency not in features:
+                    del values[dependency]
+    return {name: values[name] for name in features}
@@ -0,0 +1,288 @@
+import os
+import json
+import shutil
+import numpy as np
+from collections.abc import Mapping
+
+STORE_VERSION = 1
+MANIFEST = 'manifest.json'
+DTYPE = np.float32
+
+def _block_name(feature):
+    return f"{feature}.f32"
+
+def _index_name(feature):
+    return f"{feature}.idx.npy"
+
+class FeatureStoreWriter:
+    """
+    Writes analysis results into a columnar feature store directory.
+
+    Every feature gets one flat float32 block file that each analyzed file's array is
+    appended to, plus an index of (offset, shape) per file. A small manifest lists the
+    files and features. The store is written next to its destination and moved into
+    place on close, so readers never see a half-written store.
+
+    Parameters:
+    store_path (str): Path to the store directory to create (replaced if it exists).
+    """
+    def __init__(self, store_path):
+        self.store_path = store_path
+        self.tmp_path = store_path + '.tmp'
+        if os.path.exists(self.tmp_path):
+            shutil.rmtree(self.tmp_path)
+        os.makedirs(self.tmp_path)
+        self.files = []
+        self.blocks = {}
+        self.offsets = {}
+        self.index = {}
+        self.ndims = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def append(self, file_path, features):
+        """
+        Appends one file's features to the store.
+
+        Parameters:
+        file_path (str): Path of the analyzed file.
+        features (dict): Feature name -> array or scalar. None values are stored as missing.
+
+        Returns:
+        None
+        """
+        row = len(self.files)
+        self.files.append(file_path)
+        for name, value in features.items():
+            if name not in self.blocks:
+                self.blocks[name] = open(os.path.join(self.tmp_path, _block_name(name)), 'wb')
+                self.offsets[name] = 0
+                self.index[name] = []
+            # Files analyzed before this feature first appeared have no value for it
+            self.index[name].extend([None] * (row - len(self.index[name])))
+            if value is None:
+                self.index[name].append(None)
+                continue
+
+            array = np.ascontiguousarray(value, dtype=DTYPE)
+            self.ndims.setdefault(name, array.ndim)
+            if array.ndim != self.ndims[name]:
+                raise ValueError(f"Feature '{name}' of {file_path} has {array.ndim} dimensions, "
+                                 f"expected {self.ndims[name]}")
+            self.blocks[name].write(array.tobytes())
+            self.index[name].append((self.offsets[name], *array.shape))
+            self.offsets[name] += array.size
+
+    def close(self):
+        """
+        Writes the indexes and manifest and moves the store into place.
+
+        Returns:
+        None
+        """
+        for name, block in self.blocks.items():
+            block.close()
+            ndim = self.ndims.get(name, 0)
+            entries = self.index[name] + [None] * (len(self.files) - len(self.index[name]))
+            index = np.array(
+                [entry if entry is not None else (-1,) + (0,) * ndim for entry in entries],
+                dtype=np.int64
+            ).reshape(len(self.files), 1 + ndim)
+            np.save(os.path.join(self.tmp_path, _index_name(name)), index)
+
+        manifest = {
+            'version': STORE_VERSION,
+            'dtype': np.dtype(DTYPE).name,
+            'files': self.files,
+            'features': {name: {'ndim': self.ndims.get(name, 0)} for name in self.blocks}
+        }
+        with open(os.path.join(self.tmp_path, MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+
+        if os.path.exists(self.store_path):
+            shutil.rmtree(self.store_path)
+        os.replace(self.tmp_path, self.store_path)
+
+    def abort(self):
+        """
+        Discards a partially written store.
+
+        Returns:
+        None
+        """
+        for block in self.blocks.values():
+            block.close()
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+
+class FeatureStore:
+    """
+    Read-only, memory-mapped access to a feature store written by FeatureStoreWriter.
+
+    Opening a store only reads the manifest. A feature's index and block are mapped the
+    first time that feature is requested, and each array returned is a view into the
+    mapped block, so reading one file's chroma touches only those bytes on disk.
+
+    Parameters:
+    store_path (str): Path to the store directory.
+    """
+    def __init__(self, store_path):
+        self.store_path = store_path
+        with open(os.path.join(store_path, MANIFEST)) as f:
+            manifest = json.load(f)
+        if manifest['version'] != STORE_VERSION:
+            raise ValueError(f"Unsupported feature store version {manifest['version']}")
+        self.dtype = np.dtype(manifest['dtype'])
+        self.files = manifest['files']
+        self.features = manifest['features']
+        self.rows = {file_path: row for row, file_path in enumerate(self.files)}
+        self._indexes = {}
+        self._blocks = {}
+
+    def __len__(self):
+        return len(self.files)
+
+    def _index(self, feature):
+        if feature not in self._indexes:
+            self._indexes[feature] = np.load(
+                os.path.join(self.store_path, _index_name(feature)), mmap_mode='r'
+            )
+        return self._indexes[feature]
+
+    def _block(self, feature):
+        if feature not in self._blocks:
+            path = os.path.join(self.store_path, _block_name(feature))
+            if os.path.getsize(path) == 0:
+                self._blocks[feature] = np.empty(0, dtype=self.dtype)
+            else:
+                self._blocks[feature] = np.memmap(path, dtype=self.dtype, mode='r')
+        return self._blocks[feature]
+
+    def get(self, file_path, feature):
+        """
+        Returns one feature of one file as a read-only memory-mapped array.
+
+        Parameters:
+        file_path (str): Path of the analyzed file, as stored.
+        feature (str): Feature name, e.g. 'chroma'.
+
+        Returns:
+        np.ndarray: The feature array, or None if the file has no value for it.
+        """
+        return self.get_row(self.rows[file_path], feature)
+
+    def get_row(self, row, feature):
+        """
+        Returns one feature of the file stored at a given row.
+
+        Parameters:
+        row (int): Position of the file in the store.
+        feature (str): Feature name.
+
+        Returns:
+        np.ndarray: The feature array, or None if the file has no value for it.
+        """
+        entry = self._index(feature)[row]
+        offset = int(entry[0])
+        if offset < 0:
+            return None
+        shape = tuple(int(n) for n in entry[1:])
+        size = int(np.prod(shape))
+        return self._block(feature)[offset:offset + size].reshape(shape)
+
+    def results(self):
+        """
+        Returns the store's contents in the same layout as the JSON results.
+
+        Returns:
+        list: One {'file': path, 'features': mapping} dict per file; feature arrays are
+        loaded lazily on access.
+        """
+        return [{'file': file_path, 'features': _LazyFeatures(self, row)}
+                for row, file_path in enumerate(self.files)]
+
+class _LazyFeatures(Mapping):
+    def __init__(self, store, row):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, feature):
+        if feature not in self.store.features:
+            raise KeyError(feature)
+        return self.store.get_row(self.row, feature)
+
+    def __iter__(self):
+        return iter(self.store.features)
+
+    def __len__(self):
+        return len(self.store.features)
+
+def write_store(results, store_path):
+    """
+    Writes a list of analysis results to a feature store.
+
+    Parameters:
+    results (list): {'file': path, 'features': dict} entries.
+    store_path (str): Path to the store directory.
+
+    Returns:
+    None
+    """
+    with FeatureStoreWriter(store_path) as writer:
+        for result in results:
+            writer.append(result['file'], result['features'])
+
+def load_results(path):
+    """
+    Loads analysis results from a feature store directory or a JSON export.
+
+    Parameters:
+    path (str): Path to a feature store directory or a .json file.
+
+    Returns:
+    list: One {'file': path, 'features': mapping} dict per analyzed file.
+    """
+    if os.path.isdir(path):
+        return FeatureStore(path).results()
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def export_json(store_path, output_file):
+    """
+    Exports a feature store to the indented JSON interchange format.
+
+    Parameters:
+    store_path (str): Path to the store directory.
+    output_file (str): Path to the output JSON file.
+
+    Returns:
+    None
+    """
+    store = FeatureStore(store_path)
+    results = []
+    for result in store.results():
+        features = {name: (value.tolist() if value is not None else None)
+                    for name, value in result['features'].items()}
+        results.append({'file': result['file'], 'features': features})
+    with open(output_file, 'w') as f:
+        json.dump(results, f, indent=4)
+
+def import_json(json_file, store_path):
+    """
+    Converts a JSON results file into a feature store.
+
+    Parameters:
+    json_file (str): Path to the JSON results file.
+    store_path (str): Path to the store directory.
+
+    Returns:
+    None
+    """
+    with open(json_file, 'r') as f:
+        write_store(json.load(f), store_path)
@@ -0,0 +1,54 @@
+import os
+import sys
+
+# Buffer size of the user-space copy used when the kernel can't copy between two files
+COPY_BUFFER = 1024 * 1024
+
+def copy_byte_range(src, dst, offset, length, buffer_size=COPY_BUFFER):
+    """
+    Copies a byte range of one open file to the current position of another, inside the
+    kernel where possible (copy_file_range, then sendfile) and through a buffer otherwise.
+
+    Both kernel copies write at dst's file position and advance it, so when one stops
+    part-way the next one (or the buffered copy) carries on right after what it wrote.
+
+    Parameters:
+    src (file): Source file opened for binary reading.
+    dst (file): Destination file opened for binary writing.
+    offset (int): Start of the range in src.
+    length (int): Number of bytes to copy.
+    buffer_size (int): Read size of the buffered copy. Default is COPY_BUFFER.
+
+    Returns:
+    None
+    """
+    dst.flush()
+    start = dst.tell()
+    copied = 0
+    kernel_copies = []
+    if hasattr(os, 'copy_file_range'):
+        kernel_copies.append(lambda count, at: os.copy_file_range(src.fileno(), dst.fileno(), count, at))
+    if sys.platform.startswith('linux'):
+        kernel_copies.append(lambda count, at: os.sendfile(dst.fileno(), src.fileno(), at, count))
+    for kernel_copy in kernel_copies:
+        try:
+            while copied < length:
+                count = kernel_copy(length - copied, offset + copied)
+                if count == 0:
+                    break
+                copied += count
+            break
+        except OSError:
+            # Not supported for this file system pair; continue where it stopped
+            continue
+
+    dst.seek(start + copied)
+    src.seek(offset + copied)
+    buffer = bytearray(min(buffer_size, max(length - copied, 1)))
+    view = memoryview(buffer)
+    while copied < length:
+        count = src.readinto(view[:min(len(buffer), length - copied)])
+        if not count:
+            raise OSError(f"{src.name} ended {length - copied} bytes before the end of the copied range")
+        dst.write(view[:count])
+        copied += count
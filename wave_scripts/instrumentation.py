@@ -0,0 +1,363 @@
+import os
+import sys
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Metrics of the file currently being analyzed in this process, or None when
+# instrumentation is off. stage() and record() are no-ops while it is None.
+_current = None
+_NULL_STAGE = nullcontext()
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of the current process in MB, or None where
+    the resource module isn't available.
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / 1e6 if sys.platform == 'darwin' else peak / 1e3
+
+class FileMetrics:
+    """
+    Wall/CPU time per stage and counters collected while one file is analyzed.
+
+    Parameters:
+    file_path (str): Path of the file being analyzed.
+    """
+    def __init__(self, file_path):
+        self.file = file_path
+        self.stages = {}
+        self.counters = {'bytes_read': 0, 'audio_duration': 0.0}
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_rss_mb = None
+        self.peak_traced_mb = None
+
+    def add_stage(self, name, wall, cpu):
+        totals = self.stages.setdefault(name, [0.0, 0.0])
+        totals[0] += wall
+        totals[1] += cpu
+
+    def to_record(self, error=None):
+        """
+        Converts the metrics to the JSON-serializable record passed to sinks.
+
+        Parameters:
+        error (str, optional): Error message if the analysis failed.
+
+        Returns:
+        dict: The 'file' event record.
+        """
+        duration = self.counters['audio_duration']
+        return {
+            'event': 'file',
+            'file': self.file,
+            'error': error,
+            'wall_s': self.wall,
+            'cpu_s': self.cpu,
+            'realtime_factor': duration / self.wall if self.wall > 0 else None,
+            'peak_rss_mb': self.peak_rss_mb,
+            'peak_traced_mb': self.peak_traced_mb,
+            'pid': os.getpid(),
+            **self.counters,
+            'stages': {name: {'wall_s': wall, 'cpu_s': cpu} for name, (wall, cpu) in self.stages.items()},
+        }
+
+@contextmanager
+def _timed_stage(metrics, name):
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        metrics.add_stage(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+def stage(name):
+    """
+    Context manager that adds the wall and CPU time of its block to a stage of the
+    current file. Returns a shared no-op context when instrumentation is off.
+
+    Parameters:
+    name (str): Stage name, e.g. 'decode' or a feature graph node.
+
+    Returns:
+    contextmanager: The timing context.
+    """
+    if _current is None:
+        return _NULL_STAGE
+    return _timed_stage(_current, name)
+
+def enabled():
+    """
+    Returns True while a file is being measured, so callers can skip computing
+    values only needed for record().
+    """
+    return _current is not None
+
+def record(**counters):
+    """
+    Adds to the counters of the current file, e.g. record(bytes_read=n). No-op when
+    instrumentation is off.
+
+    Parameters:
+    counters: Counter name -> amount to add.
+
+    Returns:
+    None
+    """
+    if _current is None:
+        return
+    for name, value in counters.items():
+        _current.counters[name] = _current.counters.get(name, 0) + value
+
+@contextmanager
+def measure_file(file_path, trace_memory=False):
+    """
+    Collects metrics for everything analyzed inside the block.
+
+    Parameters:
+    file_path (str): Path of the file being analyzed.
+    trace_memory (bool): Also track the peak of Python/NumPy allocations with tracemalloc,
+        which is per file (RSS is a process-wide high-water mark) but slows allocation and
+        numba compilation down considerably. Default is False.
+
+    Returns:
+    contextmanager: Yields the FileMetrics being filled in.
+    """
+    global _current
+    metrics = FileMetrics(file_path)
+    if trace_memory:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+    previous, _current = _current, metrics
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield metrics
+    finally:
+        metrics.wall = time.perf_counter() - wall
+        metrics.cpu = time.process_time() - cpu
+        _current = previous
+        metrics.peak_rss_mb = peak_rss_mb()
+        if trace_memory:
+            metrics.peak_traced_mb = tracemalloc.get_traced_memory()[1] / 1e6
+
+class JsonlSink:
+    """
+    Metrics sink that writes one JSON object per line.
+
+    Parameters:
+    path (str): Output path; an existing file is overwritten.
+    """
+    def __init__(self, path):
+        self.file = open(path, 'w')
+
+    def __call__(self, record):
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class Instrumentation:
+    """
+    Collects per-file and run-level metrics from analyze_folder and forwards every
+    record to its sinks. A sink is any callable taking a record dict; sinks with a
+    close() method are closed with the instrumentation.
+
+    Parameters:
+    jsonl_path (str, optional): Also write the records to this JSONL file.
+    sinks (iterable, optional): Additional sinks.
+    trace_memory (bool): Track per-file allocation peaks (see measure_file). Default is False.
+    print_summary (bool): Print summarize_records() on close. Default is True.
+    """
+    def __init__(self, jsonl_path=None, sinks=(), trace_memory=False, print_summary=True):
+        self.sinks = list(sinks)
+        if jsonl_path is not None:
+            self.sinks.append(JsonlSink(jsonl_path))
+        self.trace_memory = trace_memory
+        self.print_summary = print_summary
+        self.records = []
+        self.run_stages = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def emit(self, record):
+        """
+        Stores a record for the summary and passes it to every sink.
+
+        Parameters:
+        record (dict): A 'file' or 'run' event record.
+
+        Returns:
+        None
+        """
+        self.records.append(record)
+        for sink in self.sinks:
+            sink(record)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times a run-level stage in the calling process, e.g. the cache lookup or the output write.
+
+        Parameters:
+        name (str): Stage name.
+
+        Returns:
+        contextmanager: The timing context.
+        """
+        wall = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.run_stages[name] = self.run_stages.get(name, 0.0) + time.perf_counter() - wall
+
+    def emit_run(self, **fields):
+        """
+        Emits the 'run' record with the run-level stages timed so far.
+
+        Parameters:
+        fields: Extra fields, e.g. folder, files and wall_s.
+
+        Returns:
+        None
+        """
+        self.emit({'event': 'run', **fields, 'peak_rss_mb': peak_rss_mb(),
+                   'stages': {name: {'wall_s': wall} for name, wall in self.run_stages.items()}})
+        self.run_stages = {}
+
+    def summary(self, top=10):
+        return summarize_records(self.records, top)
+
+    def close(self):
+        if self.print_summary and self.records:
+            print_summary(self.summary())
+        for sink in self.sinks:
+            if hasattr(sink, 'close'):
+                sink.close()
+
+def run_stage(instrumentation, name):
+    """
+    Returns instrumentation.stage(name), or a no-op context if instrumentation is None.
+    """
+    if instrumentation is None:
+        return _NULL_STAGE
+    return instrumentation.stage(name)
+
+def summarize_records(records, top=10):
+    """
+    Aggregates metric records (as emitted by Instrumentation or read back from JSONL).
+
+    Parameters:
+    records (iterable): 'file' and 'run' event records.
+    top (int): Number of slowest files to list. Default is 10.
+
+    Returns:
+    dict: Totals, real-time factors, per-stage breakdown and the slowest files.
+    """
+    files = [r for r in records if r['event'] == 'file']
+    runs = [r for r in records if r['event'] == 'run']
+    wall = sum(r['wall_s'] for r in files)
+    audio = sum(r['audio_duration'] for r in files)
+    run_wall = sum(r.get('wall_s', 0.0) for r in runs)
+
+    stages = {}
+    for r in files:
+        for name, times in r['stages'].items():
+            totals = stages.setdefault(name, {'wall_s': 0.0, 'cpu_s': 0.0, 'files': 0})
+            totals['wall_s'] += times['wall_s']
+            totals['cpu_s'] += times['cpu_s']
+            totals['files'] += 1
+    for totals in stages.values():
+        totals['share'] = totals['wall_s'] / wall if wall > 0 else 0.0
+
+    run_stages = {}
+    for r in runs:
+        for name, times in r['stages'].items():
+            run_stages[name] = run_stages.get(name, 0.0) + times['wall_s']
+
+    # Outcome counts of analyze_audio's 'hint' tempo mode, e.g. tempo_hint_confirmed
+    tempo_hints = {}
+    for r in files:
+        for name, value in r.items():
+            if name.startswith('tempo_hint_'):
+                outcome = name[len('tempo_hint_'):]
+                tempo_hints[outcome] = tempo_hints.get(outcome, 0) + value
+
+    rss = [r['peak_rss_mb'] for r in records if r.get('peak_rss_mb') is not None]
+    slowest = sorted(files, key=lambda r: r['wall_s'], reverse=True)[:top]
+    return {
+        'files': len(files),
+        'errors': sum(1 for r in files if r['error'] is not None),
+        'audio_duration_s': audio,
+        'bytes_read': sum(r['bytes_read'] for r in files),
+        'file_wall_s': wall,
+        'file_cpu_s': sum(r['cpu_s'] for r in files),
+        'run_wall_s': run_wall,
+        # Audio seconds analyzed per second of analysis (per worker) and of the whole run
+        'realtime_factor': audio / wall if wall > 0 else None,
+        'run_realtime_factor': audio / run_wall if run_wall > 0 else None,
+        'peak_rss_mb': max(rss) if rss else None,
+        'stages': dict(sorted(stages.items(), key=lambda item: item[1]['wall_s'], reverse=True)),
+        'run_stages': run_stages,
+        'tempo_hints': tempo_hints,
+        'slowest': [
+            {'file': r['file'], 'wall_s': r['wall_s'], 'audio_duration': r['audio_duration'],
+             'top_stage': max(r['stages'], key=lambda name: r['stages'][name]['wall_s'], default=None)}
+            for r in slowest
+        ],
+    }
+
+def print_summary(summary):
+    """
+    Prints the result of summarize_records as a short report.
+
+    Parameters:
+    summary (dict): Result of summarize_records.
+
+    Returns:
+    None
+    """
+    print(f"Analyzed {summary['files']} files ({summary['errors']} errors), "
+          f"{summary['audio_duration_s']:.1f} s of audio, {summary['bytes_read'] / 1e6:.1f} MB read")
+    if summary['realtime_factor'] is not None:
+        print(f"Analysis time {summary['file_wall_s']:.2f} s wall / {summary['file_cpu_s']:.2f} s CPU, "
+              f"{summary['realtime_factor']:.1f}x real time per worker")
+    if summary['run_realtime_factor'] is not None:
+        print(f"Run time {summary['run_wall_s']:.2f} s, {summary['run_realtime_factor']:.1f}x real time overall")
+    if summary['peak_rss_mb'] is not None:
+        print(f"Peak RSS {summary['peak_rss_mb']:.1f} MB")
+
+    hints = summary.get('tempo_hints')
+    if hints:
+        labelled = hints.get('confirmed', 0) + hints.get('rejected', 0)
+        rate = f" ({hints.get('confirmed', 0) / labelled:.0%} of labelled files)" if labelled else ""
+        print(f"Tempo hints: {hints.get('confirmed', 0)} confirmed{rate}, {hints.get('rejected', 0)} rejected, "
+              f"{hints.get('unlabeled', 0)} unlabeled")
+
+    print("Stage breakdown:")
+    for name, totals in summary['stages'].items():
+        print(f"  {name:<22} {totals['wall_s']:9.2f} s wall {totals['cpu_s']:9.2f} s CPU {totals['share']:7.1%}")
+    for name, wall in summary['run_stages'].items():
+        print(f"  {name:<22} {wall:9.2f} s wall (run)")
+
+    print("Slowest files:")
+    for entry in summary['slowest']:
+        print(f"  {entry['wall_s']:8.2f} s  {entry['audio_duration']:8.1f} s audio  "
+              f"{entry['top_stage'] or '-':<16} {entry['file']}")
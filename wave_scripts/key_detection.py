@@ -0,0 +1,233 @@
+import numpy as np
+
+PITCH_CLASSES = ('C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B')
+
+# Krumhansl-Kessler probe-tone ratings, tonic first
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+# Semitones of each scale degree above the tonic
+MAJOR_SCALE = (0, 2, 4, 5, 7, 9, 11)
+MODE_SCALES = {
+    'dorian': (0, 2, 3, 5, 7, 9, 10),
+    'phrygian': (0, 1, 3, 5, 7, 8, 10),
+    'lydian': (0, 2, 4, 6, 7, 9, 11),
+    'mixolydian': (0, 2, 4, 5, 7, 9, 10),
+    'locrian': (0, 1, 3, 5, 6, 8, 10),
+}
+
+# Semitones from a mode's tonic up to the tonic of the major scale it shares notes with
+PARENT_MAJOR = {'major': 0, 'minor': 3, 'dorian': 10, 'phrygian': 8, 'lydian': 7, 'mixolydian': 5, 'locrian': 1}
+
+DEFAULT_MODES = ('major', 'minor')
+
+def mode_profile(mode):
+    """
+    Returns the 12-bin key profile of a mode, tonic first.
+
+    Major and minor are the Krumhansl-Kessler profiles. The other modes put the major
+    profile's weight for each scale degree on the mode's own degrees, so the tonic and
+    fifth stay emphasized, and give the remaining pitch classes the major profile's
+    average out-of-scale weight.
+
+    Parameters:
+    mode (str): 'major', 'minor' or a key of MODE_SCALES.
+
+    Returns:
+    np.ndarray: The profile.
+    """
+    if mode == 'major':
+        return MAJOR_PROFILE
+    if mode == 'minor':
+        return MINOR_PROFILE
+    if mode not in MODE_SCALES:
+        raise ValueError(f"Unknown mode '{mode}'. Choose from 'major', 'minor' or {', '.join(MODE_SCALES)}.")
+    outside = np.delete(MAJOR_PROFILE, MAJOR_SCALE).mean()
+    profile = np.full(12, outside)
+    profile[list(MODE_SCALES[mode])] = MAJOR_PROFILE[list(MAJOR_SCALE)]
+    return profile
+
+def key_templates(modes=DEFAULT_MODES):
+    """
+    Builds every transposition of the mode profiles, z-scored so one matrix product gives
+    Pearson correlations.
+
+    Parameters:
+    modes (iterable): Modes to include. Default is major and minor (24 keys).
+
+    Returns:
+    tuple: (templates, names) where templates is a (12 * len(modes) x 12) array and names
+    lists the (tonic, mode) of each row.
+    """
+    rows, names = [], []
+    for mode in modes:
+        profile = mode_profile(mode)
+        for tonic in range(12):
+            rows.append(np.roll(profile, tonic))
+            names.append((tonic, mode))
+    templates = np.array(rows)
+    templates = (templates - templates.mean(axis=1, keepdims=True)) / templates.std(axis=1, keepdims=True)
+    return templates, names
+
+def camelot_code(tonic, mode):
+    """
+    Returns the Camelot wheel code of a key, e.g. 8A for A minor and 8B for C major.
+    Church modes get the code of the major key they share their notes with (F lydian -> 8B).
+
+    Parameters:
+    tonic (int): Pitch class of the tonic, 0 = C.
+    mode (str): Mode name.
+
+    Returns:
+    str: The code.
+    """
+    if mode == 'minor':
+        return f"{(7 * (tonic + 3) + 7) % 12 + 1}A"
+    return f"{(7 * (tonic + PARENT_MAJOR[mode]) + 7) % 12 + 1}B"
+
+def key_name(tonic, mode):
+    return f"{PITCH_CLASSES[tonic]} {mode}"
+
+def aggregate_chroma(chroma):
+    """
+    Reduces a (12 x frames) chromagram to one 12-bin pitch-class distribution.
+
+    Parameters:
+    chroma (np.ndarray): Chromagram; a 12-element vector is returned as-is.
+
+    Returns:
+    np.ndarray: Mean energy per pitch class (NaN frames ignored).
+    """
+    chroma = np.asarray(chroma, dtype=np.float64)
+    if chroma.ndim == 1:
+        return chroma
+    return np.nanmean(chroma, axis=1)
+
+def estimate_keys(chroma_vectors, modes=DEFAULT_MODES):
+    """
+    Estimates the key of many files at once by correlating their pitch-class distributions
+    with every key profile in a single matrix product.
+
+    Parameters:
+    chroma_vectors (np.ndarray): (files x 12) aggregated chroma, e.g. from aggregate_chroma.
+    modes (iterable): Modes to consider. Default is major and minor; add e.g. 'lydian'
+        or 'dorian' for modal material.
+
+    Returns:
+    dict: Per-file arrays 'tonic' (pitch class), 'mode', 'key' (e.g. 'A minor'), 'camelot',
+    'correlation' (with the best profile), 'confidence' (how far the best correlation is
+    ahead of the runner-up, 0 when ambiguous) and 'index' (the template row, see decode_key).
+    Rows that are silent or NaN get key None, index -1 and confidence 0.
+    """
+    chroma_vectors = np.atleast_2d(np.asarray(chroma_vectors, dtype=np.float64))
+    templates, names = key_templates(modes)
+
+    std = chroma_vectors.std(axis=1, keepdims=True)
+    valid = (std[:, 0] > 0) & np.isfinite(chroma_vectors).all(axis=1)
+    z = np.where(valid[:, None], (chroma_vectors - chroma_vectors.mean(axis=1, keepdims=True)) / np.where(std > 0, std, 1), 0)
+    correlations = z @ templates.T / 12
+
+    # Best and runner-up template of every row without sorting all of them
+    top_two = np.argpartition(-correlations, 1, axis=1)[:, :2]
+    rows = np.arange(len(z))
+    best = top_two[:, 0]
+    correlation = correlations[rows, best]
+    confidence = np.where(valid, correlation - correlations[rows, top_two[:, 1]], 0.0)
+
+    # Names are looked up per template, not per file
+    tonics = np.array([tonic for tonic, _ in names])
+    mode_names = np.array([mode for _, mode in names] + [None], dtype=object)
+    key_names = np.array([key_name(tonic, mode) for tonic, mode in names] + [None], dtype=object)
+    camelot = np.array([camelot_code(tonic, mode) for tonic, mode in names] + [None], dtype=object)
+    index = np.where(valid, best, -1)
+    return {
+        'tonic': np.where(valid, tonics[best], -1),
+        'mode': mode_names[index],
+        'key': key_names[index],
+        'camelot': camelot[index],
+        'correlation': np.where(valid, correlation, np.nan),
+        'confidence': confidence,
+        'index': index,
+    }
+
+def estimate_key(chroma, modes=DEFAULT_MODES):
+    """
+    Estimates the key of a single chromagram.
+
+    Parameters:
+    chroma (np.ndarray): (12 x frames) chromagram or 12-bin vector.
+    modes (iterable): Modes to consider. Default is major and minor.
+
+    Returns:
+    dict: 'key', 'tonic', 'mode', 'camelot', 'correlation' and 'confidence' (see estimate_keys).
+    """
+    keys = estimate_keys(aggregate_chroma(chroma)[None, :], modes)
+    return {'key': keys['key'][0], 'tonic': int(keys['tonic'][0]), 'mode': keys['mode'][0],
+            'camelot': keys['camelot'][0], 'correlation': float(keys['correlation'][0]),
+            'confidence': float(keys['confidence'][0])}
+
+def decode_key(index, modes=DEFAULT_MODES):
+    """
+    Turns the template index stored by the 'key' feature back into a key name and Camelot code.
+
+    Parameters:
+    index (int): Row of key_templates(modes); negative for no key.
+    modes (iterable): The modes the index was computed with. Default is major and minor.
+
+    Returns:
+    tuple: (key, camelot), or (None, None).
+    """
+    index = int(index)
+    if index < 0:
+        return None, None
+    tonic, mode = index % 12, list(modes)[index // 12]
+    return key_name(tonic, mode), camelot_code(tonic, mode)
+
+def key_feature(chroma):
+    """
+    Packs the key estimate of one chromagram into the float array the 'key' feature stores:
+    [template index (see decode_key), correlation, confidence], with major/minor templates.
+
+    Parameters:
+    chroma (np.ndarray): (12 x frames) chromagram or 12-bin vector.
+
+    Returns:
+    np.ndarray: float32 array of length 3.
+    """
+    keys = estimate_keys(aggregate_chroma(chroma)[None, :])
+    return np.array([keys['index'][0], keys['correlation'][0], keys['confidence'][0]], dtype=np.float32)
+
+def estimate_keys_from_results(analysis_results, modes=DEFAULT_MODES):
+    """
+    Estimates the keys of every analyzed file with chroma in one vectorized call.
+
+    Parameters:
+    analysis_results (list): {'file': path, 'features': dict} entries, as written by analyze_folder.
+    modes (iterable): Modes to consider. Default is major and minor.
+
+    Returns:
+    list: {'file', 'key', 'camelot', 'confidence', 'correlation'} dicts for the files that have chroma.
+    """
+    files, vectors = [], []
+    for result in analysis_results:
+        chroma = result['features'].get('chroma')
+        if chroma is None:
+            continue
+        files.append(result['file'])
+        vectors.append(aggregate_chroma(chroma))
+    if not files:
+        return []
+    keys = estimate_keys(np.vstack(vectors), modes)
+    return [
+        {'file': file_path, 'key': keys['key'][i], 'camelot': keys['camelot'][i],
+         'confidence': float(keys['confidence'][i]), 'correlation': float(keys['correlation'][i])}
+        for i, file_path in enumerate(files)
+    ]
+
+# Example usage
+if __name__ == "__main__":
+    from feature_store import load_results
+
+    results = load_results(r"C:\Users\Kenrm\repositories\music-prod\data\analysis_results.features")
+    for entry in estimate_keys_from_results(results, modes=('major', 'minor', 'lydian', 'dorian')):
+        print(f"{entry['camelot'] or '-':>4}  {entry['key'] or '-':<14} {entry['confidence']:.2f}  {entry['file']}")
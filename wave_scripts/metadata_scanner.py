@@ -0,0 +1,305 @@
+import io
+import os
+import re
+import json
+import time
+import struct
+import logging
+import argparse
+import eyed3
+import eyed3.id3
+import eyed3.mp3
+import soundfile as sf
+from concurrent.futures import ThreadPoolExecutor
+from wav_loader import read_wav_header
+from key_detection import PITCH_CLASSES, camelot_code, key_name
+from tempo_hints import FLATS
+
+# Extensions scanned by default
+METADATA_EXTENSIONS = ('.wav', '.mp3', '.aif', '.aiff', '.flac')
+
+# Keys of every scan result; values that the file doesn't have are None
+METADATA_FIELDS = ('path', 'format', 'duration', 'sample_rate', 'channels', 'bits_per_sample', 'tempo', 'key',
+                   'camelot', 'root_note', 'midi_note', 'beats', 'meter', 'one_shot', 'loops', 'artist', 'title',
+                   'album', 'genre', 'comment', 'spotify_id', 'error')
+
+# RIFF chunks read besides fmt: text tags, ACID loop info, sampler info and embedded ID3 tags
+WAV_METADATA_CHUNKS = ('LIST', 'acid', 'smpl', 'id3 ', 'ID3 ')
+
+# LIST/INFO sub-chunks and the fields they fill
+INFO_FIELDS = {'INAM': 'title', 'IART': 'artist', 'IPRD': 'album', 'IGNR': 'genre', 'ICMT': 'comment'}
+
+# ACID chunk flags
+ACID_ONE_SHOT = 0x01
+ACID_ROOT_NOTE = 0x02
+
+# ID3 key (TKEY) notation: 'Am', 'F#m', 'Bb', 'C major'
+ID3_KEY_PATTERN = re.compile(r'^([A-Ga-g])([#b♯♭]?)\s*((?i:minor|min|major|maj|m))?$')
+
+# Camelot code -> key name, for tags written by DJ software
+CAMELOT_KEYS = {camelot_code(tonic, mode): key_name(tonic, mode) for tonic in range(12) for mode in ('major', 'minor')}
+KEY_CAMELOT = {key: code for code, key in CAMELOT_KEYS.items()}
+
+SPOTIFY_ID_PATTERN = re.compile(r'(?:open\.spotify\.com/track/|spotify:track:)([0-9A-Za-z]{22})')
+
+# eyeD3 logs a warning for every slightly malformed tag
+eyed3.log.setLevel(logging.ERROR)
+
+def parse_key(text):
+    """
+    Normalizes an embedded key, e.g. 'Am', 'F#m', 'Bb major' or the Camelot code '8A',
+    to the spelling used by key_detection ('A minor', 'A# major').
+
+    Parameters:
+    text (str): Key as found in the tag.
+
+    Returns:
+    str: The key, or None if the text isn't one.
+    """
+    if not text:
+        return None
+    text = text.strip()
+    if text.upper() in CAMELOT_KEYS:
+        return CAMELOT_KEYS[text.upper()]
+    match = ID3_KEY_PATTERN.match(text)
+    if not match:
+        return None
+    note, accidental, mode = match.groups()
+    note = note.upper() + accidental.replace('♯', '#').replace('♭', 'b')
+    note = FLATS.get(note, note)
+    if note not in PITCH_CLASSES:
+        note = PITCH_CLASSES[(PITCH_CLASSES.index(note[0]) + 1) % 12]  # E# -> F, B# -> C
+    return f"{note} {'minor' if mode and mode.lower() in ('m', 'min', 'minor') else 'major'}"
+
+def _midi_note_name(note):
+    return PITCH_CLASSES[note % 12]
+
+def _decode_text(raw):
+    raw = raw.split(b'\x00', 1)[0]
+    try:
+        text = raw.decode('utf-8')
+    except UnicodeDecodeError:
+        text = raw.decode('latin-1')
+    return text.strip() or None
+
+def _parse_info_list(payload, metadata):
+    # LIST chunks other than INFO (e.g. adtl cue labels) carry no tags
+    if payload[:4] != b'INFO':
+        return
+    position = 4
+    while position + 8 <= len(payload):
+        sub_id, size = struct.unpack_from('<4sI', payload, position)
+        field = INFO_FIELDS.get(sub_id.decode('latin-1'))
+        if field and metadata[field] is None:
+            metadata[field] = _decode_text(payload[position + 8:position + 8 + size])
+        position += 8 + size + (size & 1)
+
+def _parse_acid(payload, metadata):
+    if len(payload) < 24:
+        return
+    flags, root, _, _, beats, meter_denominator, meter_numerator, tempo = struct.unpack_from('<IHHfIHHf', payload)
+    metadata['one_shot'] = bool(flags & ACID_ONE_SHOT)
+    if flags & ACID_ROOT_NOTE:
+        metadata['midi_note'] = root
+    if not metadata['one_shot']:
+        if beats:
+            metadata['beats'] = beats
+        if meter_numerator and meter_denominator:
+            metadata['meter'] = f"{meter_numerator}/{meter_denominator}"
+        if 0 < tempo < 1000:
+            metadata['tempo'] = round(float(tempo), 3)
+
+def _parse_smpl(payload, metadata):
+    if len(payload) < 36:
+        return
+    unity_note, _, _, _, loop_count = struct.unpack_from('<IIIII', payload, 12)
+    # The ACID root note is set on purpose; the sampler unity note defaults to 60 in many writers
+    if metadata['midi_note'] is None and unity_note < 128:
+        metadata['midi_note'] = unity_note
+    metadata['loops'] = loop_count
+
+def _apply_id3(tag, metadata):
+    """
+    Copies artist, title, album, genre, comment, tempo (TBPM), key (TKEY) and a Spotify
+    track ID found in the comments, user text or URL frames of an eyeD3 tag.
+    """
+    for field in ('artist', 'title', 'album'):
+        if metadata[field] is None and getattr(tag, field):
+            metadata[field] = getattr(tag, field)
+    if metadata['genre'] is None and tag.genre is not None:
+        metadata['genre'] = tag.genre.name
+    comments = [comment.text for comment in tag.comments if comment.text]
+    if metadata['comment'] is None and comments:
+        metadata['comment'] = comments[0]
+
+    if metadata['tempo'] is None:
+        try:
+            tempo = float(tag.getTextFrame(b'TBPM') or 0)
+        except ValueError:
+            tempo = 0
+        if 0 < tempo < 1000:
+            metadata['tempo'] = tempo
+    if metadata['key'] is None:
+        metadata['key'] = parse_key(tag.getTextFrame(b'TKEY'))
+        metadata['camelot'] = KEY_CAMELOT.get(metadata['key'])
+
+    texts = comments + [frame.text for frame in tag.user_text_frames if frame.text]
+    texts += [frame.url for frame in tag.user_url_frames if frame.url]
+    for text in texts:
+        match = SPOTIFY_ID_PATTERN.search(text)
+        if match:
+            metadata['spotify_id'] = match.group(1)
+            break
+
+def read_wav_metadata(file_path, metadata=None):
+    """
+    Reads the format, ACID/sampler loop info and tags of a .wav file from its RIFF chunks
+    in a single pass over the chunk headers, without reading any audio.
+
+    Parameters:
+    file_path (str): Path to the .wav file.
+    metadata (dict, optional): Result dict to fill. Default is a new one.
+
+    Returns:
+    dict: Scan result with the keys in METADATA_FIELDS.
+    """
+    metadata = metadata or dict.fromkeys(METADATA_FIELDS)
+    header = read_wav_header(file_path, WAV_METADATA_CHUNKS)
+    metadata.update(path=file_path, format='wav', duration=header['duration'], sample_rate=header['sample_rate'],
+                    channels=header['channels'], bits_per_sample=header['bits_per_sample'])
+    payloads = header['payloads']
+    for payload in payloads.get('LIST', []):
+        _parse_info_list(payload, metadata)
+    for payload in payloads.get('acid', [])[:1]:
+        _parse_acid(payload, metadata)
+    for payload in payloads.get('smpl', [])[:1]:
+        _parse_smpl(payload, metadata)
+    for payload in payloads.get('id3 ', []) + payloads.get('ID3 ', []):
+        buffer = io.BytesIO(payload)
+        buffer.name = file_path  # eyeD3 records the file name of the tag it parses
+        tag = eyed3.id3.Tag()
+        if tag.parse(buffer):
+            _apply_id3(tag, metadata)
+    if metadata['midi_note'] is not None:
+        metadata['root_note'] = _midi_note_name(metadata['midi_note'])
+    return metadata
+
+def read_mp3_metadata(file_path, metadata=None):
+    """
+    Reads the ID3 tag and the first MPEG frame header (plus any Xing/VBRI header for the
+    length of VBR files) of an .mp3 file without decoding it.
+
+    Parameters:
+    file_path (str): Path to the .mp3 file.
+    metadata (dict, optional): Result dict to fill. Default is a new one.
+
+    Returns:
+    dict: Scan result with the keys in METADATA_FIELDS.
+    """
+    metadata = metadata or dict.fromkeys(METADATA_FIELDS)
+    metadata.update(path=file_path, format='mp3')
+    audio = eyed3.mp3.Mp3AudioFile(file_path)
+    if audio.info is not None:
+        header = audio.info.mp3_header
+        metadata.update(duration=audio.info.time_secs, sample_rate=header.sample_freq,
+                        channels=1 if header.mode == 'Mono' else 2)
+    if audio.tag is not None:
+        _apply_id3(audio.tag, metadata)
+    return metadata
+
+def read_metadata(file_path):
+    """
+    Reads the header metadata of an audio file: .wav and .mp3 files are parsed directly,
+    other formats (.aif, .flac) get their format from libsndfile.
+
+    Parameters:
+    file_path (str): Path to the audio file.
+
+    Returns:
+    dict: Scan result with the keys in METADATA_FIELDS. Files that can't be read have
+    'error' set instead of raising.
+    """
+    metadata = dict.fromkeys(METADATA_FIELDS)
+    metadata['path'] = file_path
+    extension = os.path.splitext(file_path)[1].lower()
+    try:
+        if extension == '.wav':
+            try:
+                return read_wav_metadata(file_path, metadata)
+            except ValueError:
+                pass  # Not a plain RIFF file; let libsndfile try
+        elif extension == '.mp3':
+            return read_mp3_metadata(file_path, metadata)
+        info = sf.info(file_path)
+        metadata.update(format=extension.lstrip('.'), duration=info.duration, sample_rate=info.samplerate,
+                        channels=info.channels)
+    except (OSError, RuntimeError, ValueError, struct.error, eyed3.Error) as e:
+        metadata['error'] = str(e)
+    return metadata
+
+def find_audio_files(roots, extensions=METADATA_EXTENSIONS):
+    """
+    Lists the audio files under one or more folders with a scandir walk.
+
+    Parameters:
+    roots (iterable): Folders to scan recursively.
+    extensions (iterable): Lower-case extensions to include. Default is METADATA_EXTENSIONS.
+
+    Returns:
+    list: File paths.
+    """
+    extensions = tuple(extensions)
+    files = []
+    stack = list(roots)
+    while stack:
+        folder = stack.pop()
+        try:
+            entries = os.scandir(folder)
+        except OSError as e:
+            print(f"Skipping {e.filename}: {e.strerror}")
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False) and entry.name.lower().endswith(extensions):
+                    files.append(entry.path)
+    return files
+
+def scan_metadata(file_paths, workers=16):
+    """
+    Reads the header metadata of many files over a thread pool. Header reads are small
+    and mostly wait on the drive, so many in flight hide the latency of network and USB
+    drives.
+
+    Parameters:
+    file_paths (iterable): Audio files.
+    workers (int): Files read at once. Default is 16.
+
+    Returns:
+    list: read_metadata results in the order of file_paths.
+    """
+    file_paths = list(file_paths)
+    if workers <= 1 or len(file_paths) < 2:
+        return [read_metadata(file_path) for file_path in file_paths]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(read_metadata, file_paths))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reads tempo, key, format and tags from audio file headers.")
+    parser.add_argument('roots', nargs='+', help="Folders to scan recursively")
+    parser.add_argument('--workers', type=int, default=16, help="Files read at once")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    files = find_audio_files(args.roots)
+    results = scan_metadata(files, args.workers)
+    elapsed = time.perf_counter() - start
+    print(f"{len(results)} files in {elapsed:.1f} s ({len(results) / max(elapsed, 1e-9) * 60:.0f} files per minute): "
+          f"{sum(r['tempo'] is not None for r in results)} with tempo, {sum(r['key'] is not None for r in results)} with key, "
+          f"{sum(r['root_note'] is not None for r in results)} with root note, "
+          f"{sum(r['artist'] is not None for r in results)} with artist, {sum(r['error'] is not None for r in results)} errors")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
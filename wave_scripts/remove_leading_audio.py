@@ -3,24 +3,205 @@
 
 from pydub import AudioSegment
 from pydub.silence import detect_nonsilent
+import numpy as np
 import logging
+import shutil
+import struct
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from wav_loader import read_wav_header, map_wav_frames, to_float32, WAVE_FORMAT_IEEE_FLOAT
+from file_copy import copy_byte_range
 
 logging.basicConfig(level=logging.INFO)
 
-def remove_leading_silence(input_file, output_file, silence_thresh=-50, min_silence_len=1000):
+# Milliseconds of windows checked per block, so only the start of a file is read
+# when the silence ends early
+WINDOW_BLOCK = 5000
+
+def _frames_at(ms, frame_rate):
+    # pydub's ms -> frame conversion (int(ms * frame_rate / 1000.0))
+    return (np.asarray(ms, dtype=np.float64) * (frame_rate / 1000.0)).astype(np.int64)
+
+def _silent_windows(frames, header, first, last, min_silence_len, threshold):
     """
-    Removes leading silence from an audio file.
+    Evaluates pydub's silence test for the windows starting at first..last-1 ms.
+
+    A window covers [ms, ms + min_silence_len) and is silent if the RMS over all samples of
+    all channels is at most threshold; frames past the end of the file count as zeros,
+    like pydub's padded slices.
+
+    Returns:
+    np.ndarray: Boolean mask, one entry per window.
+    """
+    frame_rate = header['sample_rate']
+    starts = _frames_at(np.arange(first, last), frame_rate)
+    ends = _frames_at(np.arange(first, last) + min_silence_len, frame_rate)
+    base, stop = starts[0], min(ends[-1], len(frames))
+
+    # Per-frame energy summed over channels, as a running sum over the block
+    energy = np.zeros(max(stop - base, 0) + 1)
+    for channel in range(header['channels']):
+        samples = to_float32(frames[base:stop, channel], header['bits_per_sample']).astype(np.float64)
+        energy[1:] += samples * samples
+    energy = np.cumsum(energy)
+
+    window_energy = energy[np.clip(ends, base, stop) - base] - energy[np.clip(starts, base, stop) - base]
+    counts = (ends - starts) * header['channels']
+    full_scale = 1.0 if header['format'] == WAVE_FORMAT_IEEE_FLOAT else 2.0 ** (header['bits_per_sample'] - 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rms = np.sqrt(np.where(counts > 0, window_energy / counts, 0.0)) * full_scale
+    if header['format'] != WAVE_FORMAT_IEEE_FLOAT:
+        # audioop.rms truncates to an integer
+        rms = np.floor(rms)
+    return rms <= threshold * full_scale
+
+def find_leading_silence(frames, header, silence_thresh=-50, min_silence_len=1000):
+    """
+    Finds where the first non-silent range of a file starts, with the same result as
+    pydub.silence.detect_nonsilent(...)[0][0] but computed with NumPy a block of
+    windows at a time. Reading stops as soon as the leading silent range has ended.
 
     Parameters:
-    input_file (str): Path to the input audio file.
-    output_file (str): Path to save the output audio file.
-    silence_thresh (int): Silence threshold in dB. Default is -50 dB.
+    frames (np.ndarray): Samples from wav_loader.map_wav_frames.
+    header (dict): Result of wav_loader.read_wav_header.
+    silence_thresh (int): Silence threshold in dBFS. Default is -50 dB.
     min_silence_len (int): Minimum length of silence in milliseconds. Default is 1000 ms.
 
+    Returns:
+    int: Start of the first non-silent range in ms (0 if the file doesn't start silent),
+    or None if the whole file is silent.
+    """
+    seg_len = round(1000 * header['frames'] / header['sample_rate'])
+    if seg_len < min_silence_len:
+        return 0
+    threshold = 10 ** (silence_thresh / 20)
+    last_start = seg_len - min_silence_len
+
+    # Silent windows less than min_silence_len apart belong to the same silent range,
+    # which ends min_silence_len after its last silent window
+    previous = None
+    for first in range(0, last_start + 1, WINDOW_BLOCK):
+        last = min(first + WINDOW_BLOCK, last_start + 1)
+        silent = np.flatnonzero(_silent_windows(frames, header, first, last, min_silence_len, threshold)) + first
+        if previous is None:
+            if silent.size == 0 or silent[0] != 0:
+                return 0
+            previous = 0
+        gaps = np.flatnonzero(np.diff(np.concatenate([[previous], silent])) > min_silence_len)
+        if gaps.size:
+            previous = silent[gaps[0] - 1] if gaps[0] > 0 else previous
+            break
+        if silent.size:
+            previous = int(silent[-1])
+        if last - 1 >= previous + min_silence_len:
+            break
+
+    end = int(previous) + min_silence_len
+    return None if end == seg_len else end
+
+def _shift_position(payload, offset, start_frame):
+    # Sample positions before the trim point move to the new start
+    value = struct.unpack_from('<I', payload, offset)[0]
+    struct.pack_into('<I', payload, offset, max(value - start_frame, 0))
+
+def _fix_ds64(payload, trim):
+    struct.pack_into('<QQQ', payload, 0, trim['riff_size'], trim['data_size'], trim['frames'])
+
+def _fix_fact(payload, trim):
+    struct.pack_into('<I', payload, 0, min(trim['frames'], 0xFFFFFFFF))
+
+def _fix_cue(payload, trim):
+    # Cue points: dwName, dwPosition, fccChunk, dwChunkStart, dwBlockStart, dwSampleOffset
+    count = struct.unpack_from('<I', payload, 0)[0]
+    for i in range(min(count, (len(payload) - 4) // 24)):
+        _shift_position(payload, 4 + 24 * i + 4, trim['start_frame'])
+        _shift_position(payload, 4 + 24 * i + 20, trim['start_frame'])
+
+def _fix_smpl(payload, trim):
+    # Sampler loops follow a 36-byte header: id, type, start, end, fraction, play count
+    count = struct.unpack_from('<I', payload, 28)[0] if len(payload) >= 36 else 0
+    for i in range(min(count, (len(payload) - 36) // 24)):
+        _shift_position(payload, 36 + 24 * i + 8, trim['start_frame'])
+        _shift_position(payload, 36 + 24 * i + 12, trim['start_frame'])
+
+def _fix_bext(payload, trim):
+    # BWF TimeReference: sample count since midnight of the first sample
+    if len(payload) >= 346:
+        reference = struct.unpack_from('<Q', payload, 338)[0]
+        struct.pack_into('<Q', payload, 338, reference + trim['start_frame'])
+
+# Chunks whose sample counts or positions change when the start of the audio is cut;
+# every other chunk (LIST, inst, acid, ...) is copied as is
+CHUNK_FIXUPS = {
+    'ds64': _fix_ds64,
+    'fact': _fix_fact,
+    'cue ': _fix_cue,
+    'smpl': _fix_smpl,
+    'bext': _fix_bext,
+}
+
+def trim_wav(input_file, output_file, start_frame, header=None):
+    """
+    Writes a copy of a .wav file without its first start_frame frames, without decoding.
+
+    Every chunk is kept in its original order; sizes, sample counts and cue/loop positions
+    are adjusted, and the remaining audio bytes are copied straight from the source. The
+    result is written to a temporary file next to output_file and renamed over it, so
+    output_file may be input_file and is never left half-written.
+
+    Parameters:
+    input_file (str): Path to the source .wav file.
+    output_file (str): Path of the trimmed file.
+    start_frame (int): Number of frames to cut from the start.
+    header (dict, optional): Result of read_wav_header, if already parsed.
+
     Returns:
     None
     """
+    if header is None:
+        header = read_wav_header(input_file)
+    start_frame = min(start_frame, header['frames'])
+    frames = header['frames'] - start_frame
+    data_size = frames * header['block_align']
+    sizes = [data_size if chunk_id == 'data' else size for chunk_id, _, size in header['chunks']]
+    trim = {
+        'start_frame': start_frame,
+        'frames': frames,
+        'data_size': data_size,
+        'riff_size': 4 + sum(8 + size + (size & 1) for size in sizes),
+    }
+
+    directory = os.path.dirname(os.path.abspath(output_file))
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(output_file)}.", suffix='.tmp', dir=directory)
+    try:
+        with open(input_file, 'rb') as src, os.fdopen(fd, 'wb') as dst:
+            riff_id = src.read(4)
+            rf64 = riff_id == b'RF64'
+            dst.write(struct.pack('<4sI4s', riff_id, 0xFFFFFFFF if rf64 else trim['riff_size'], b'WAVE'))
+            for (chunk_id, offset, size), new_size in zip(header['chunks'], sizes):
+                if chunk_id == 'data':
+                    dst.write(struct.pack('<4sI', b'data', 0xFFFFFFFF if rf64 else data_size))
+                    copy_byte_range(src, dst, header['data_offset'] + start_frame * header['block_align'], data_size)
+                else:
+                    src.seek(offset)
+                    payload = bytearray(src.read(size))
+                    payload.extend(bytes(size - len(payload)))
+                    if chunk_id in CHUNK_FIXUPS:
+                        CHUNK_FIXUPS[chunk_id](payload, trim)
+                    dst.write(struct.pack('<4sI', chunk_id.encode('latin-1'), size) + payload)
+                if new_size & 1:
+                    dst.write(b'\0')
+            dst.flush()
+            os.fsync(dst.fileno())
+        shutil.copymode(input_file, temp_path)
+        os.replace(temp_path, output_file)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+def _remove_leading_silence_pydub(input_file, output_file, silence_thresh, min_silence_len, dry_run=False):
     audio = AudioSegment.from_wav(input_file)
 
     # Detect non-silent parts (returns a list of tuples representing non-silent ranges)
@@ -34,16 +215,73 @@ def remove_leading_silence(input_file, output_file, silence_thresh=-50, min_sile
             logging.info(f"The leading audio is shorter than the minimum threshold of {min_silence_len}ms. No output file created.")
             return None
         
+        if dry_run:
+            logging.info(f"Would trim {start_trim}ms of leading silence from {input_file}")
+            return start_trim
+
         # Trim the silence from the start
         trimmed_audio = audio[start_trim:]
         if trimmed_audio:
             trimmed_audio.export(output_file, format="wav")
         logging.info("!!! Silent parts found in the audio. Output file created !!!")
+        return start_trim
     else:
         logging.info("No non-silent parts found in the audio. No output file created.")
         return None
 
-def process_folder(folder_path, silence_thresh=-50, min_silence_len=250):
+def remove_leading_silence(input_file, output_file, silence_thresh=-50, min_silence_len=1000, dry_run=False):
+    """
+    Removes leading silence from an audio file.
+
+    Uncompressed .wav files are scanned through a memory map with a NumPy RMS envelope
+    (see find_leading_silence) and trimmed with trim_wav, which keeps metadata chunks,
+    copies the audio without decoding and replaces output_file atomically. Other files
+    go through pydub.
+
+    Parameters:
+    input_file (str): Path to the input audio file.
+    output_file (str): Path to save the output audio file.
+    silence_thresh (int): Silence threshold in dB. Default is -50 dB.
+    min_silence_len (int): Minimum length of silence in milliseconds. Default is 1000 ms.
+    dry_run (bool): Only report what would be trimmed. Default is False.
+
+    Returns:
+    int: Milliseconds trimmed (or that would be trimmed), or None if the file was left alone.
+    """
+    try:
+        header = read_wav_header(input_file)
+        frames = map_wav_frames(input_file, header)
+    except (ValueError, OSError, struct.error):
+        return _remove_leading_silence_pydub(input_file, output_file, silence_thresh, min_silence_len, dry_run)
+
+    start_trim = find_leading_silence(frames, header, silence_thresh, min_silence_len)
+    del frames
+    if start_trim is None:
+        logging.info("No non-silent parts found in the audio. No output file created.")
+        return None
+    if start_trim < min_silence_len:
+        logging.info(f"The leading audio is shorter than the minimum threshold of {min_silence_len}ms. No output file created.")
+        return None
+
+    if dry_run:
+        logging.info(f"Would trim {start_trim}ms of leading silence from {input_file}")
+        return start_trim
+
+    start_frame = min(int(_frames_at(start_trim, header['sample_rate'])), header['frames'])
+    if round(1000 * (header['frames'] - start_frame) / header['sample_rate']) > 0:
+        trim_wav(input_file, output_file, start_frame, header)
+    logging.info("!!! Silent parts found in the audio. Output file created !!!")
+    return start_trim
+
+def _process_file(input_file, silence_thresh, min_silence_len, dry_run):
+    logging.info(f"Processing file: {input_file}")
+    try:
+        return remove_leading_silence(input_file, input_file, silence_thresh, min_silence_len, dry_run)
+    except Exception as e:
+        logging.error(f"Error trimming {input_file}: {e}")
+        return None
+
+def process_folder(folder_path, silence_thresh=-50, min_silence_len=250, workers=1, dry_run=False):
     """
     Processes all .wav files in a given folder and its sub-folders to remove leading silence.
 
@@ -51,19 +289,29 @@ def process_folder(folder_path, silence_thresh=-50, min_silence_len=250):
     folder_path (str): Path to the folder containing .wav files.
     silence_thresh (int): Silence threshold in dB. Default is -50 dB.
     min_silence_len (int): Minimum length of silence in milliseconds. Default is 250 ms.
+    workers (int): Number of files trimmed concurrently. Default is 1.
+    dry_run (bool): Only report what would be trimmed. Default is False.
 
     Returns:
-    None
+    list: (file_path, trimmed_ms) for every file that was (or would be) trimmed.
     """
+    wav_files = []
     for root, _, files in os.walk(folder_path):
         for filename in files:
             if filename.endswith(".wav"):
-                input_file = os.path.join(root, filename)
-                logging.info(f"Processing file: {input_file}")
-                remove_leading_silence(input_file, input_file, silence_thresh, min_silence_len)
+                wav_files.append(os.path.join(root, filename))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        trims = list(executor.map(lambda path: _process_file(path, silence_thresh, min_silence_len, dry_run), wav_files))
+
+    trimmed = [(path, ms) for path, ms in zip(wav_files, trims) if ms is not None]
+    total = sum(ms for _, ms in trimmed) / 1000
+    logging.info(f"{'Would trim' if dry_run else 'Trimmed'} {len(trimmed)} of {len(wav_files)} files ({total:.1f}s of silence)")
+    return trimmed
 
 # Example usage
-folder_path = "C://Program Files//Image-Line//Packs//Vocals//Black Octopus Sound - Katty Heath Vocal Sample Pack"
-process_folder(folder_path, -50, 150)
+if __name__ == "__main__":
+    folder_path = "C://Program Files//Image-Line//Packs//Vocals//Black Octopus Sound - Katty Heath Vocal Sample Pack"
+    process_folder(folder_path, -50, 150, workers=os.cpu_count())
 
 
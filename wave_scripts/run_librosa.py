@@ -1,7 +1,35 @@
 import os
-import librosa
+import time
 import numpy as np
 import json
+import soundfile as sf
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from feature_cache import FeatureCache
+from feature_store import write_store
+from feature_graph import compute_features, DEFAULT_FEATURES, N_FFT, HOP_LENGTH
+from stream_analysis import analyze_audio_streaming, BLOCK_LENGTH
+from wav_loader import load_wav
+from instrumentation import Instrumentation, stage, record, enabled, measure_file, run_stage
+from tempo_hints import hinted_tempo
+
+# Bump whenever analyze_audio's features or their parameters change, so cached
+# results computed with the old settings are invalidated.
+FEATURE_VERSION = 1
+
+# Rough multiplier from decoded signal size to peak working set of analyze_audio
+# (signal + STFT + CQT + resampling buffers).
+MEMORY_OVERHEAD = 8
+
+# librosa.load resamples to this rate by default
+ANALYSIS_SR = 22050
+
+# wav_loader quality used to reach ANALYSIS_SR: 'hq' matches librosa.load,
+# 'fast' is cheaper but changes the features slightly
+RESAMPLE_QUALITY = 'hq'
+
+# How analyze_audio gets the tempo: 'beat_track' always runs librosa's beat tracker;
+# 'hint' takes the BPM in the file name when a low-rate tempogram agrees with it
+TEMPO_MODES = ('beat_track', 'hint')
 
 # Custom JSON encoder to handle NumPy arrays
 class NumpyEncoder(json.JSONEncoder):
@@ -14,72 +42,328 @@ class NumpyEncoder(json.JSONEncoder):
             return int(obj)
         return json.JSONEncoder.default(self, obj)
 
-def analyze_audio(file_path):
+def analyze_audio(file_path, features=None, streaming=False, tempo_mode='beat_track'):
     """
     Analyzes a .wav file and extracts features including bpm, key, and additional audio features.
 
+    Intermediates such as the magnitude STFT and the CQT are computed once and shared by
+    every feature that needs them (see feature_graph.FEATURE_GRAPH).
+
     Parameters:
     file_path (str): Path to the .wav file.
+    features (iterable, optional): Names of the features to compute, e.g. ('tempo', 'rms').
+        Defaults to feature_graph.DEFAULT_FEATURES.
+    streaming (bool): If True, analyze the file block by block with bounded memory
+        (see stream_analysis.analyze_audio_streaming). Default is False.
+    tempo_mode (str): 'beat_track' (default) or 'hint', which uses the BPM in the file name
+        ("130 BPM") once a cheap low-rate tempogram confirms it and only beat-tracks files
+        without a hint or whose audio disagrees (see tempo_hints.hinted_tempo). Streamed
+        files are always beat-tracked.
 
     Returns:
     dict: A dictionary containing the extracted features.
     """
-    y, sr = librosa.load(file_path)
-    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-    chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
-    tonnetz = librosa.feature.tonnetz(y=y, sr=sr)
-    rms = librosa.feature.rms(y=y)
-    spectral_centroid = librosa.feature.spectral_centroid(y=y, sr=sr)
-    spectral_bandwidth = librosa.feature.spectral_bandwidth(y=y, sr=sr)
-    spectral_contrast = librosa.feature.spectral_contrast(y=y, sr=sr)
-    spectral_flatness = librosa.feature.spectral_flatness(y=y)
-    spectral_rolloff = librosa.feature.spectral_rolloff(y=y, sr=sr)
-
-    features = {
-        'tempo': tempo,
-        'chroma': chroma,
-        'tonnetz': tonnetz,
-        'rms': rms,
-        'spectral_centroid': spectral_centroid,
-        'spectral_bandwidth': spectral_bandwidth,
-        'spectral_contrast': spectral_contrast,
-        'spectral_flatness': spectral_flatness,
-        'spectral_rolloff': spectral_rolloff
-    }
-
-    return features
-
-def analyze_folder(folder_path, output_file):
+    if tempo_mode not in TEMPO_MODES:
+        raise ValueError(f"Invalid value for 'tempo_mode'. Choose from {', '.join(TEMPO_MODES)}.")
+    if streaming:
+        if enabled():
+            record(bytes_read=os.path.getsize(file_path), audio_duration=sf.info(file_path).duration)
+        with stage('streaming'):
+            return analyze_audio_streaming(file_path, features)
+    with stage('decode'):
+        y, sr = load_wav(file_path, sr=ANALYSIS_SR, quality=RESAMPLE_QUALITY)
+    if enabled():
+        record(bytes_read=os.path.getsize(file_path), audio_duration=len(y) / sr)
+    known = None
+    if tempo_mode == 'hint' and 'tempo' in (DEFAULT_FEATURES if features is None else features):
+        with stage('tempo_hint'):
+            tempo, outcome = hinted_tempo(y, sr, file_path)
+        record(**{f'tempo_hint_{outcome}': 1})
+        if tempo is not None:
+            known = {'tempo': tempo}
+    return compute_features(y, sr, features, known)
+
+def feature_version(features=None, streaming_duration=None, tempo_mode='beat_track'):
     """
-    Analyzes all .wav files in a given folder and extracts features.
+    Returns the version string that identifies the current feature set and parameters.
+
+    Parameters:
+    features (iterable, optional): Names of the requested features. Defaults to DEFAULT_FEATURES.
+    streaming_duration (float, optional): Streaming threshold passed to analyze_folder.
+    tempo_mode (str): Tempo mode passed to analyze_folder. Default is 'beat_track'.
+
+    Returns:
+    str: The feature-set version used as part of the cache key.
+    """
+    names = ','.join(DEFAULT_FEATURES if features is None else features)
+    version = f"{FEATURE_VERSION}:sr={ANALYSIS_SR}:{RESAMPLE_QUALITY}:{names}:stream>{streaming_duration}"
+    # Keep the existing cache keys valid for the default mode
+    return version if tempo_mode == 'beat_track' else f"{version}:tempo={tempo_mode}"
+
+def open_feature_cache(cache_path, features=None, streaming_duration=None, max_bytes=None,
+                       hash_contents=False, tempo_mode='beat_track'):
+    """
+    Opens the persistent feature cache used by analyze_folder.
+
+    Parameters:
+    cache_path (str): Path to the SQLite cache file.
+    features (iterable, optional): Names of the features analyze_folder will compute.
+    streaming_duration (float, optional): Streaming threshold analyze_folder will use.
+    max_bytes (int, optional): Size limit of the cache. Default is unbounded.
+    hash_contents (bool): Fall back to content hashes when size/mtime changed. Default is False.
+    tempo_mode (str): Tempo mode analyze_folder will use. Default is 'beat_track'.
+
+    Returns:
+    FeatureCache: The opened cache.
+    """
+    return FeatureCache(cache_path, 'librosa', feature_version(features, streaming_duration, tempo_mode),
+                        max_bytes, hash_contents)
+
+def find_wav_files(folder_path):
+    """
+    Lists all .wav files in a folder and its sub-folders, in os.walk order.
 
     Parameters:
     folder_path (str): Path to the folder containing .wav files.
-    output_file (str): Path to the output JSON file.
 
     Returns:
-    None
+    list: Paths of the .wav files.
     """
-    results = []
+    wav_files = []
     for root, _, files in os.walk(folder_path):
         for filename in files:
             if filename.endswith(".wav"):
-                file_path = os.path.join(root, filename)
+                wav_files.append(os.path.join(root, filename))
+    return wav_files
+
+def use_streaming(file_path, streaming_duration):
+    """
+    Decides whether a file is long enough to be analyzed block by block.
+
+    Parameters:
+    file_path (str): Path to the audio file.
+    streaming_duration (float): Threshold in seconds, or None to never stream.
+
+    Returns:
+    bool: True if the file should be streamed.
+    """
+    if streaming_duration is None:
+        return False
+    try:
+        return sf.info(file_path).duration > streaming_duration
+    except Exception:
+        return False
+
+def estimate_decoded_bytes(file_path, streaming_duration=None):
+    """
+    Estimates the peak memory needed to analyze a file from its header (duration x rate).
+
+    Parameters:
+    file_path (str): Path to the audio file.
+    streaming_duration (float, optional): Files longer than this are streamed, so only
+        one block is held in memory at a time.
+
+    Returns:
+    int: Estimated peak working set in bytes.
+    """
+    try:
+        info = sf.info(file_path)
+        rate = max(info.samplerate * info.channels, ANALYSIS_SR)
+        samples = info.duration * rate
+        if streaming_duration is not None and info.duration > streaming_duration:
+            samples = (BLOCK_LENGTH - 1) * HOP_LENGTH + N_FFT
+    except Exception:
+        # Unknown format: assume 16-bit PCM worth of samples
+        samples = os.path.getsize(file_path) / 2
+    return int(samples * 4 * MEMORY_OVERHEAD)
+
+def default_memory_budget():
+    """
+    Returns half of the currently available physical memory, or 4 GB if it can't be determined.
+
+    Returns:
+    int: Memory budget in bytes.
+    """
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') // 2
+    except (AttributeError, ValueError, OSError):
+        return 4 * 1024 ** 3
+
+def _analyze_file(file_path, features=None, streaming_duration=None, tempo_mode='beat_track'):
+    try:
+        return analyze_audio(file_path, features, use_streaming(file_path, streaming_duration), tempo_mode), None
+    except Exception as e:
+        return None, str(e)
+
+def _analyze_chunk(chunk, features=None, streaming_duration=None, instrument=None, tempo_mode='beat_track'):
+    """
+    Worker entry point: analyzes a list of (index, file_path) pairs one after another.
+
+    instrument is None (no metrics) or the trace_memory flag for measure_file.
+
+    Returns:
+    list: (index, file_path, features, error, metrics) tuples; error is None on success,
+    metrics is the instrumentation record or None.
+    """
+    outcomes = []
+    for index, file_path in chunk:
+        if instrument is None:
+            outcomes.append((index, file_path, *_analyze_file(file_path, features, streaming_duration, tempo_mode), None))
+            continue
+        with measure_file(file_path, trace_memory=instrument) as metrics:
+            result, error = _analyze_file(file_path, features, streaming_duration, tempo_mode)
+        outcomes.append((index, file_path, result, error, metrics.to_record(error)))
+    return outcomes
+
+def _analyze_parallel(wav_files, workers, chunk_size, memory_budget, features=None,
+                      streaming_duration=None, instrument=None, tempo_mode='beat_track', on_outcomes=None):
+    """
+    Fans analyze_audio out over a process pool, admitting chunks only while their
+    estimated memory fits in the budget. Largest chunks are scheduled first.
+
+    on_outcomes, if given, is called with the outcomes of each chunk as soon as it completes.
+
+    Returns:
+    list: (index, file_path, features, error, metrics) tuples in the original file order.
+    """
+    indexed = list(enumerate(wav_files))
+    chunks = [indexed[i:i + chunk_size] for i in range(0, len(indexed), chunk_size)]
+    # Files in a chunk run sequentially, so a chunk's peak is its largest file
+    pending = sorted(
+        ((max(estimate_decoded_bytes(path, streaming_duration) for _, path in chunk), chunk)
+         for chunk in chunks),
+        key=lambda item: item[0],
+        reverse=True
+    )
+
+    outcomes = [None] * len(wav_files)
+    in_flight = {}
+    in_flight_bytes = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while pending or in_flight:
+            # Admit the largest chunks that fit; always keep at least one running
+            i = 0
+            while i < len(pending) and len(in_flight) < workers:
+                estimate, chunk = pending[i]
+                if in_flight and in_flight_bytes + estimate > memory_budget:
+                    i += 1
+                    continue
+                for _, file_path in chunk:
+                    print(f"Analyzing file: {file_path}")
+                in_flight[executor.submit(_analyze_chunk, chunk, features, streaming_duration, instrument,
+                                          tempo_mode)] = estimate
+                in_flight_bytes += estimate
+                pending.pop(i)
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight_bytes -= in_flight.pop(future)
+                chunk_outcomes = future.result()
+                for outcome in chunk_outcomes:
+                    outcomes[outcome[0]] = outcome
+                if on_outcomes is not None:
+                    on_outcomes(chunk_outcomes)
+    return outcomes
+
+def analyze_folder(folder_path, output_file, workers=1, chunk_size=1, memory_budget=None, cache=None,
+                   features=None, streaming_duration=None, instrumentation=None, tempo_mode='beat_track'):
+    """
+    Analyzes all .wav files in a given folder and extracts features.
+
+    Parameters:
+    folder_path (str): Path to the folder containing .wav files.
+    output_file (str): Path to the output feature store directory, or to a .json file
+        to write the JSON interchange format instead.
+    workers (int): Number of worker processes. Default is 1 (serial, in-process).
+    chunk_size (int): Number of files handed to a worker per task. Default is 1.
+    memory_budget (int, optional): Maximum estimated bytes of audio being analyzed at once
+        across all workers. Defaults to half of the available physical memory.
+    cache (FeatureCache, optional): Cache from open_feature_cache; unchanged files are
+        read from it and only new or modified files are analyzed. Results are stored as
+        each chunk completes, so an interrupted run keeps what it finished. Open it with
+        the same features so cached entries match.
+    features (iterable, optional): Names of the features to compute. Defaults to
+        feature_graph.DEFAULT_FEATURES.
+    streaming_duration (float, optional): Files longer than this many seconds (DJ mixes,
+        live sets) are analyzed block by block with bounded memory. Default is never.
+    instrumentation (Instrumentation, optional): Receives per-file stage timings, bytes read,
+        audio duration and peak memory, plus a run record with the lookup and write times.
+        In 'hint' tempo mode each file record also counts the hint outcome.
+    tempo_mode (str): 'beat_track' (default) or 'hint' (see analyze_audio). Open the cache
+        with the same mode.
+
+    Returns:
+    None
+    """
+    run_start = time.perf_counter()
+    instrument = None if instrumentation is None else instrumentation.trace_memory
+    with run_stage(instrumentation, 'find_files'):
+        wav_files = find_wav_files(folder_path)
+
+    cached = {}
+    to_analyze = wav_files
+    if cache is not None:
+        with run_stage(instrumentation, 'cache_lookup'):
+            cached, to_analyze = cache.lookup(wav_files)
+        print(f"{len(cached)} files unchanged, {len(to_analyze)} to analyze")
+
+    analyzed = {}
+
+    def collect(outcomes):
+        stored = []
+        for _, file_path, result, error, metrics in outcomes:
+            if metrics is not None:
+                instrumentation.emit(metrics)
+            if error is not None:
+                print(f"Error analyzing {os.path.basename(file_path)}: {error}")
+                continue
+            analyzed[file_path] = result
+            stored.append((file_path, result))
+        if cache is not None and stored:
+            with run_stage(instrumentation, 'cache_store'):
+                cache.put_many(stored)
+
+    with run_stage(instrumentation, 'analysis'):
+        if workers > 1:
+            if memory_budget is None:
+                memory_budget = default_memory_budget()
+            _analyze_parallel(to_analyze, workers, max(1, chunk_size), memory_budget,
+                              features, streaming_duration, instrument, tempo_mode, on_outcomes=collect)
+        else:
+            for index, file_path in enumerate(to_analyze):
                 print(f"Analyzing file: {file_path}")
-                try:
-                    features = analyze_audio(file_path)
-                    results.append({
-                        'file': file_path,
-                        'features': features
-                    })
-                except Exception as e:
-                    print(f"Error analyzing {filename}: {str(e)}")
+                collect(_analyze_chunk([(index, file_path)], features, streaming_duration, instrument, tempo_mode))
+
+    results = []
+    for file_path in wav_files:
+        features = cached.get(file_path, analyzed.get(file_path))
+        if features is None:
+            continue
+        results.append({
+            'file': file_path,
+            'features': features
+        })
 
     # Write the results to the output file
-    with open(output_file, 'w') as f:
-        json.dump(results, f, indent=4, cls=NumpyEncoder)
+    with run_stage(instrumentation, 'write'):
+        if output_file.endswith('.json'):
+            with open(output_file, 'w') as f:
+                json.dump(results, f, indent=4, cls=NumpyEncoder)
+        else:
+            write_store(results, output_file)
+
+    if instrumentation is not None:
+        instrumentation.emit_run(folder=folder_path, files=len(wav_files), cached=len(cached),
+                                 analyzed=len(analyzed), workers=workers,
+                                 wall_s=time.perf_counter() - run_start)
 
 # Example usage
-folder_path = r"C:\Users\Kenrm\repositories\music-prod\data\Wave Files"
-output_file = r"C:\Users\Kenrm\repositories\music-prod\data\analysis_results.json"
-analyze_folder(folder_path, output_file)
\ No newline at end of file
+if __name__ == "__main__":
+    folder_path = r"C:\Users\Kenrm\repositories\music-prod\data\Wave Files"
+    output_file = r"C:\Users\Kenrm\repositories\music-prod\data\analysis_results.features"
+    cache_file = r"C:\Users\Kenrm\repositories\music-prod\data\feature_cache.sqlite"
+    metrics_file = r"C:\Users\Kenrm\repositories\music-prod\data\analysis_metrics.jsonl"
+    with open_feature_cache(cache_file, streaming_duration=600, max_bytes=2 * 1024 ** 3) as cache, \
+            Instrumentation(jsonl_path=metrics_file) as instrumentation:
+        analyze_folder(folder_path, output_file, workers=os.cpu_count(), chunk_size=4, cache=cache,
+                       streaming_duration=600, instrumentation=instrumentation)
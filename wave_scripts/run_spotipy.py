@@ -1,18 +1,22 @@
 import os
 import librosa
-import spotipy
 import numpy as np
-from spotipy.oauth2 import SpotifyClientCredentials
 import json
-import matplotlib.pyplot as plt
+from feature_cache import FeatureCache
+from wav_loader import load_wav
+from spotify_enrichment import SpotifyAPI, ResponseCache, SpotifyEnricher
+from metadata_scanner import read_metadata, scan_metadata
+
+# Bump whenever analyze_audio's features or their parameters change
+FEATURE_VERSION = 2
+
+# Analyzed files stored in the feature cache per transaction
+STORE_BATCH = 32
 
 # Set up Spotipy with your Spotify API credentials
 SPOTIPY_CLIENT_ID = 'fb65558cefeb48a5a8fe0da6a931f9a1'
 SPOTIPY_CLIENT_SECRET = 'your_spotify_client_secret'  # Replace this with your actual client secret
 
-sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(client_id=SPOTIPY_CLIENT_ID,
-                                                           client_secret=SPOTIPY_CLIENT_SECRET))
-
 # Custom JSON encoder to handle NumPy arrays
 class NumpyEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -26,7 +30,8 @@ class NumpyEncoder(json.JSONEncoder):
 
 def analyze_audio(file_path):
     """
-    Analyzes a .wav file and extracts features including bpm, key, valence, and energy.
+    Analyzes a .wav file and extracts its local features: tempo, chroma and tonnetz.
+    Valence and energy come from Spotify in a separate pass, see enrich_results.
 
     Parameters:
     file_path (str): Path to the .wav file.
@@ -34,93 +39,193 @@ def analyze_audio(file_path):
     Returns:
     dict: A dictionary containing the extracted features.
     """
-    y, sr = librosa.load(file_path)
+    y, sr = load_wav(file_path)
     tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
     chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
     tonnetz = librosa.feature.tonnetz(y=y, sr=sr)
 
-    # Extract valence and energy using Spotipy
-    track_id = get_spotify_track_id(file_path)
-    if track_id:
-        audio_features = sp.audio_features(track_id)[0]
-        valence = audio_features['valence']
-        energy = audio_features['energy']
-    else:
-        valence = None
-        energy = None
-
     features = {
         'tempo': tempo,
         'chroma': chroma,
         'tonnetz': tonnetz,
-        'valence': valence,
-        'energy': energy
     }
 
     return features
 
-def get_spotify_track_id(file_path):
+def get_spotify_track_id(file_path, metadata=None, enricher=None):
     """
-    Retrieves the Spotify track ID for a given audio file.
+    Retrieves the Spotify track ID for a given audio file from its tags: a Spotify link
+    embedded in the tags is used as-is, otherwise the tagged artist and title are searched for.
 
     Parameters:
-    file_path (str): Path to the .wav file.
+    file_path (str): Path to the audio file.
+    metadata (dict, optional): The file's metadata_scanner result, if already read.
+    enricher (SpotifyEnricher, optional): Client for the search; without one only embedded
+        IDs are found.
 
     Returns:
     str: The Spotify track ID, or None if not found.
     """
-    # Implement your logic to retrieve the Spotify track ID based on the file path or metadata
-    # For example, you can use the file name or metadata to search for the track on Spotify
-    # and return the track ID if found.
+    if metadata is None:
+        metadata = read_metadata(file_path)
+    if metadata['spotify_id']:
+        return metadata['spotify_id']
+    if enricher is not None and metadata['artist'] and metadata['title']:
+        query = (metadata['artist'], metadata['title'])
+        return enricher.search_tracks([query])[query]
     return None
 
-def analyze_folder(folder_path, output_file):
+def open_enricher(response_cache_path=None, client_id=SPOTIPY_CLIENT_ID, client_secret=SPOTIPY_CLIENT_SECRET,
+                  api_url=None, token_url=None, workers=4):
+    """
+    Sets up the batched Spotify client used by enrich_results.
+
+    Parameters:
+    response_cache_path (str, optional): SQLite file caching Spotify's responses between runs.
+    client_id (str): Spotify client ID. Default is SPOTIPY_CLIENT_ID.
+    client_secret (str): Spotify client secret. Default is SPOTIPY_CLIENT_SECRET.
+    api_url (str, optional): API base URL, e.g. of benchmarks/spotify_stub.py. Default is Spotify's.
+    token_url (str, optional): Token endpoint. Default is Spotify's.
+    workers (int): Concurrent requests. Default is 4.
+
+    Returns:
+    SpotifyEnricher: The enricher.
+    """
+    urls = {key: value for key, value in (('api_url', api_url), ('token_url', token_url)) if value}
+    api = SpotifyAPI(client_id, client_secret, **urls)
+    cache = ResponseCache(response_cache_path) if response_cache_path else None
+    return SpotifyEnricher(api, cache, workers)
+
+def enrich_results(results, enricher):
+    """
+    Adds Spotify's valence and energy to analysis results. The tags of all files are read
+    first (over a thread pool), the track IDs they don't embed are searched for by artist
+    and title, and the audio features are fetched in as few batched requests as possible.
+
+    Parameters:
+    results (list): {'file': path, 'features': dict} entries; updated in place.
+    enricher (SpotifyEnricher): Client from open_enricher.
+
+    Returns:
+    int: Number of files Spotify had audio features for.
+    """
+    files = [result['file'] for result in results]
+    tags = dict(zip(files, scan_metadata(files)))
+    queries = {(metadata['artist'], metadata['title']) for metadata in tags.values()
+               if not metadata['spotify_id'] and metadata['artist'] and metadata['title']}
+    found = enricher.search_tracks(queries)
+    track_ids = {}
+    for file_path, metadata in tags.items():
+        track_ids[file_path] = metadata['spotify_id'] or found.get((metadata['artist'], metadata['title']))
+    audio_features = enricher.audio_features(track_ids.values())
+    enriched = 0
+    for result in results:
+        spotify = audio_features.get(track_ids[result['file']]) or {}
+        result['features']['valence'] = spotify.get('valence')
+        result['features']['energy'] = spotify.get('energy')
+        enriched += bool(spotify)
+    return enriched
+
+def open_feature_cache(cache_path, max_bytes=None, hash_contents=False):
+    """
+    Opens the persistent feature cache used by analyze_folder.
+
+    Parameters:
+    cache_path (str): Path to the SQLite cache file.
+    max_bytes (int, optional): Size limit of the cache. Default is unbounded.
+    hash_contents (bool): Fall back to content hashes when size/mtime changed. Default is False.
+
+    Returns:
+    FeatureCache: The opened cache.
+    """
+    return FeatureCache(cache_path, 'spotipy', FEATURE_VERSION, max_bytes, hash_contents)
+
+def analyze_folder(folder_path, output_file, cache=None, enricher=None):
     """
     Analyzes all .wav files in a given folder and extracts features.
 
     Parameters:
     folder_path (str): Path to the folder containing .wav files.
     output_file (str): Path to the output JSON file.
+    cache (FeatureCache, optional): Cache from open_feature_cache; unchanged files are
+        read from it and only new or modified files are analyzed. Results are stored every
+        STORE_BATCH files, so an interrupted run keeps what it finished.
+    enricher (SpotifyEnricher, optional): Adds Spotify's valence and energy after the
+        local analysis, see enrich_results. Default is local features only.
 
     Returns:
     None
     """
-    results = []
+    wav_files = []
     for root, _, files in os.walk(folder_path):
         for filename in files:
             if filename.endswith(".wav"):
-                file_path = os.path.join(root, filename)
-                print(f"Analyzing file: {file_path}")
-                try:
-                    features = analyze_audio(file_path)
-                    results.append({
-                        'file': file_path,
-                        'features': features
-                    })
-                except Exception as e:
-                    print(f"Error analyzing {filename}: {str(e)}")
+                wav_files.append(os.path.join(root, filename))
+
+    cached = {}
+    to_analyze = wav_files
+    if cache is not None:
+        cached, to_analyze = cache.lookup(wav_files)
+        print(f"{len(cached)} files unchanged, {len(to_analyze)} to analyze")
+
+    analyzed = {}
+    batch = []
+    for file_path in to_analyze:
+        print(f"Analyzing file: {file_path}")
+        try:
+            analyzed[file_path] = analyze_audio(file_path)
+        except Exception as e:
+            print(f"Error analyzing {os.path.basename(file_path)}: {str(e)}")
+            continue
+        if cache is None:
+            continue
+        batch.append((file_path, analyzed[file_path]))
+        if len(batch) >= STORE_BATCH:
+            cache.put_many(batch)
+            batch = []
+    if cache is not None and batch:
+        cache.put_many(batch)
+
+    results = []
+    for file_path in wav_files:
+        features = cached.get(file_path, analyzed.get(file_path))
+        if features is not None:
+            results.append({
+                'file': file_path,
+                'features': dict(features)
+            })
+
+    if enricher is not None:
+        enriched = enrich_results(results, enricher)
+        print(f"Spotify audio features for {enriched} of {len(results)} files")
 
     # Write the results to the output file
     with open(output_file, 'w') as f:
         json.dump(results, f, indent=4, cls=NumpyEncoder)
 
 # Example usage
-folder_path = r"C:\Users\Kenrm\repositories\music-prod\data\Wave Files"
-output_file = r"C:\Users\Kenrm\repositories\music-prod\data\analysis_results.json"
-analyze_folder(folder_path, output_file)
-
-# Load the analysis results from the JSON file
-with open(r"C:\Users\Kenrm\repositories\music-prod\data\analysis_results.json", 'r') as f:
-    analysis_results = json.load(f)
-
-# Extract chroma features from the first analyzed file
-chroma = np.array(analysis_results[0]['features']['chroma'])
-
-# Plot the chroma features
-plt.figure(figsize=(10, 4))
-plt.imshow(chroma, aspect='auto', origin='lower', cmap='coolwarm')
-plt.title('Chroma Features')
-plt.xlabel('Time')
-plt.ylabel('Pitch Class')
-plt.colorbar()
-plt.show()
\ No newline at end of file
+if __name__ == "__main__":
+    import matplotlib.pyplot as plt
+
+    folder_path = r"C:\Users\Kenrm\repositories\music-prod\data\Wave Files"
+    output_file = r"C:\Users\Kenrm\repositories\music-prod\data\analysis_results.json"
+    cache_file = r"C:\Users\Kenrm\repositories\music-prod\data\feature_cache.sqlite"
+    response_cache_file = r"C:\Users\Kenrm\repositories\music-prod\data\spotify_cache.sqlite"
+    with open_feature_cache(cache_file) as cache:
+        analyze_folder(folder_path, output_file, cache=cache, enricher=open_enricher(response_cache_file))
+
+    # Load the analysis results from the JSON file
+    with open(output_file, 'r') as f:
+        analysis_results = json.load(f)
+
+    # Extract chroma features from the first analyzed file
+    chroma = np.array(analysis_results[0]['features']['chroma'])
+
+    # Plot the chroma features
+    plt.figure(figsize=(10, 4))
+    plt.imshow(chroma, aspect='auto', origin='lower', cmap='coolwarm')
+    plt.title('Chroma Features')
+    plt.xlabel('Time')
+    plt.ylabel('Pitch Class')
+    plt.colorbar()
+    plt.show()
@@ -0,0 +1,423 @@
+import os
+import re
+import time
+import sqlite3
+import argparse
+import numpy as np
+from feature_store import FeatureStore, load_results
+from metadata_scanner import scan_metadata
+from key_detection import decode_key, estimate_keys, aggregate_chroma
+
+# Camelot wheel codes, e.g. 8A or 12B
+CAMELOT_PATTERN = re.compile(r'^(1[0-2]|[1-9])[AaBb]$')
+
+# Extensions crawled by default
+AUDIO_EXTENSIONS = ('.wav', '.aif', '.aiff', '.flac', '.mp3')
+
+# Rows written per transaction while crawling
+WRITE_BATCH = 5000
+
+# A single tempo in query() matches this many BPM either side
+TEMPO_TOLERANCE = 0.5
+
+COLUMNS = ('path', 'folder', 'name', 'size', 'mtime_ns', 'duration', 'sample_rate', 'channels',
+           'bits_per_sample', 'tempo', 'key', 'camelot', 'key_confidence', 'feature_source', 'feature_row',
+           'artist', 'title', 'root_note', 'scanned_at', 'analyzed_at')
+
+# Columns added after the first catalog version, created on older catalogs when opened
+ADDED_COLUMNS = {'camelot': 'TEXT COLLATE NOCASE', 'artist': 'TEXT', 'title': 'TEXT', 'root_note': 'TEXT'}
+
+def _scalar(value):
+    # Analysis values can be 0-d or 1-element arrays (librosa's tempo), or missing
+    if value is None:
+        return None
+    value = np.asarray(value, dtype=float).ravel()
+    return float(value[0]) if value.size else None
+
+def _subtree(folder):
+    # Bounds of every path below folder, so the lookup is a range scan of the index
+    folder = folder.rstrip(os.sep)
+    return folder + os.sep, folder + chr(ord(os.sep) + 1)
+
+def _scanned_row(file_path, folder, name, st, metadata, now):
+    # Header fields plus the tempo and key embedded in the file's tags, if any
+    return (file_path, folder, name, st.st_size, st.st_mtime_ns, metadata['duration'], metadata['sample_rate'],
+            metadata['channels'], metadata['bits_per_sample'], metadata['tempo'], metadata['key'],
+            metadata['camelot'], metadata['artist'], metadata['title'], metadata['root_note'], now)
+
+class SampleCatalog:
+    """
+    Persistent catalog of a sample library in a SQLite database: one row per file with its
+    size, mtime, duration, format, tempo and key, plus where its analysis features are stored.
+
+    Rows come from crawl(), which only reads headers of new or modified files (taking tempo,
+    key, root note, artist and title from their tags, see metadata_scanner), and from
+    ingest_analysis(), which replaces tempo and key with run_librosa's estimates. Tempo, key
+    and duration are indexed, so query() answers from the index instead of the disk.
+
+    Parameters:
+    catalog_path (str): Path to the SQLite database file.
+    """
+    def __init__(self, catalog_path):
+        self.catalog_path = catalog_path
+        self.conn = sqlite3.connect(catalog_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS samples (
+                path TEXT PRIMARY KEY,
+                folder TEXT NOT NULL,
+                name TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                duration REAL,
+                sample_rate INTEGER,
+                channels INTEGER,
+                bits_per_sample INTEGER,
+                tempo REAL,
+                key TEXT COLLATE NOCASE,
+                camelot TEXT COLLATE NOCASE,
+                key_confidence REAL,
+                feature_source TEXT,
+                feature_row INTEGER,
+                artist TEXT,
+                title TEXT,
+                root_note TEXT,
+                scanned_at REAL NOT NULL,
+                analyzed_at REAL
+            )
+        """)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(samples)")}
+        for column, definition in ADDED_COLUMNS.items():
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE samples ADD COLUMN {column} {definition}")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS samples_tempo ON samples (tempo)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS samples_key_tempo ON samples (key, tempo)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS samples_camelot_tempo ON samples (camelot, tempo)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS samples_duration ON samples (duration)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS samples_folder ON samples (folder)")
+        self.conn.commit()
+        self._stores = {}
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0]
+
+    def crawl(self, roots, extensions=AUDIO_EXTENSIONS, prune=True, workers=16):
+        """
+        Brings the catalog up to date with one or more folder trees using a single scandir
+        pass. Only new files and files whose size or mtime changed have their header read,
+        over a thread pool; a changed file gets the tempo and key of its tags (or none)
+        until it is analyzed again.
+
+        Parameters:
+        roots (iterable): Folders to crawl recursively.
+        extensions (iterable): Lower-case extensions to catalog. Default is AUDIO_EXTENSIONS.
+        prune (bool): Remove rows of files under the roots that no longer exist. Default is True.
+        workers (int): Headers read at once. Default is 16.
+
+        Returns:
+        dict: Counts of 'added', 'updated', 'unchanged', 'removed' and 'errors'.
+        """
+        extensions = tuple(extensions)
+        counts = {'added': 0, 'updated': 0, 'unchanged': 0, 'removed': 0, 'errors': 0}
+        for root in roots:
+            root = os.path.abspath(root)
+            known = {row[0]: (row[1], row[2]) for row in self.conn.execute(
+                "SELECT path, size, mtime_ns FROM samples WHERE path >= ? AND path < ?", _subtree(root)
+            )}
+            seen = set()
+            changed = []
+            stack = [root]
+            while stack:
+                folder = stack.pop()
+                try:
+                    entries = os.scandir(folder)
+                except OSError as e:
+                    print(f"Skipping {e.filename}: {e.strerror}")
+                    continue
+                with entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                            continue
+                        if not entry.is_file(follow_symlinks=False) or not entry.name.lower().endswith(extensions):
+                            continue
+                        seen.add(entry.path)
+                        st = entry.stat(follow_symlinks=False)
+                        if known.get(entry.path) == (st.st_size, st.st_mtime_ns):
+                            counts['unchanged'] += 1
+                            continue
+                        changed.append((entry.path, folder, entry.name, st))
+
+            for start in range(0, len(changed), WRITE_BATCH):
+                batch = changed[start:start + WRITE_BATCH]
+                now = time.time()
+                rows = []
+                scanned = scan_metadata([item[0] for item in batch], workers)
+                for (file_path, folder, name, st), metadata in zip(batch, scanned):
+                    if metadata['error'] is not None:
+                        print(f"Error reading {file_path}: {metadata['error']}")
+                        counts['errors'] += 1
+                        continue
+                    counts['updated' if file_path in known else 'added'] += 1
+                    rows.append(_scanned_row(file_path, folder, name, st, metadata, now))
+                self._upsert_scanned(rows)
+
+            if prune:
+                gone = [(path,) for path in known if path not in seen]
+                self.conn.executemany("DELETE FROM samples WHERE path = ?", gone)
+                self.conn.commit()
+                counts['removed'] += len(gone)
+        return counts
+
+    def _upsert_scanned(self, rows):
+        self.conn.executemany("""
+            INSERT INTO samples (path, folder, name, size, mtime_ns, duration, sample_rate, channels,
+                                 bits_per_sample, tempo, key, camelot, artist, title, root_note, scanned_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                size = excluded.size, mtime_ns = excluded.mtime_ns, duration = excluded.duration,
+                sample_rate = excluded.sample_rate, channels = excluded.channels,
+                bits_per_sample = excluded.bits_per_sample, scanned_at = excluded.scanned_at,
+                tempo = excluded.tempo, key = excluded.key, camelot = excluded.camelot,
+                artist = excluded.artist, title = excluded.title, root_note = excluded.root_note,
+                key_confidence = NULL, feature_source = NULL, feature_row = NULL, analyzed_at = NULL
+        """, rows)
+        self.conn.commit()
+
+    def ingest_analysis(self, results_path):
+        """
+        Copies tempo and key from run_librosa output into the catalog and records where each
+        file's features are stored. Files analyzed without the 'key' feature but with chroma
+        get their key estimated here, all in one vectorized call (key_detection.estimate_keys).
+        Files that aren't in the catalog yet are added from their header.
+
+        Parameters:
+        results_path (str): Feature store directory or JSON results file written by
+            run_librosa.analyze_folder.
+
+        Returns:
+        int: Number of files updated.
+        """
+        results_path = os.path.abspath(results_path)
+        now = time.time()
+        rows = []
+        unkeyed, chroma_vectors = [], []
+        for row, result in enumerate(load_results(results_path)):
+            file_path = os.path.abspath(result['file'])
+            features = result['features']
+            tempo = _scalar(features['tempo']) if 'tempo' in features else None
+            key = camelot = confidence = None
+            packed = features['key'] if 'key' in features else None
+            if packed is not None:
+                key, camelot = decode_key(packed[0])
+                confidence = float(packed[2])
+            elif 'chroma' in features and features['chroma'] is not None:
+                unkeyed.append(len(rows))
+                chroma_vectors.append(aggregate_chroma(features['chroma']))
+            rows.append([tempo, key, camelot, confidence, results_path, row, now, file_path])
+
+        if unkeyed:
+            keys = estimate_keys(np.vstack(chroma_vectors))
+            for i, position in enumerate(unkeyed):
+                rows[position][1:4] = keys['key'][i], keys['camelot'][i], float(keys['confidence'][i])
+
+        known = set()
+        paths = [row[-1] for row in rows]
+        for start in range(0, len(paths), 500):
+            batch = paths[start:start + 500]
+            known.update(path for (path,) in self.conn.execute(
+                f"SELECT path FROM samples WHERE path IN ({','.join('?' * len(batch))})", batch))
+        missing = [file_path for file_path in paths if file_path not in known and os.path.exists(file_path)]
+        self._upsert_scanned([
+            _scanned_row(file_path, os.path.dirname(file_path), os.path.basename(file_path), os.stat(file_path),
+                         metadata, now)
+            for file_path, metadata in zip(missing, scan_metadata(missing)) if metadata['error'] is None
+        ])
+
+        cursor = self.conn.executemany("""
+            UPDATE samples SET tempo = ?, key = ?, camelot = ?, key_confidence = ?, feature_source = ?,
+                               feature_row = ?, analyzed_at = ?
+            WHERE path = ?
+        """, rows)
+        self.conn.commit()
+        return cursor.rowcount
+
+    def set_keys(self, keys):
+        """
+        Stores estimated keys, e.g. from key_detection.estimate_keys_from_results.
+
+        Parameters:
+        keys (iterable): {'file', 'key', 'camelot', 'confidence'} dicts.
+
+        Returns:
+        None
+        """
+        self.conn.executemany(
+            "UPDATE samples SET key = ?, camelot = ?, key_confidence = ? WHERE path = ?",
+            [(entry['key'], entry['camelot'], entry['confidence'], os.path.abspath(entry['file'])) for entry in keys]
+        )
+        self.conn.commit()
+
+    def query(self, tempo=None, key=None, duration=None, name=None, folder=None, sample_rate=None,
+              channels=None, order_by='path', limit=None):
+        """
+        Finds samples matching every given criterion.
+
+        Parameters:
+        tempo (float or tuple, optional): BPM within TEMPO_TOLERANCE, or a (min, max) range.
+        key (str, optional): Estimated key, e.g. 'A minor', or Camelot code, e.g. '8A' (case-insensitive).
+        duration (tuple, optional): (min, max) length in seconds; either end may be None.
+        name (str, optional): Text the file name must contain, e.g. 'kick'.
+        folder (str, optional): Only files under this folder.
+        sample_rate (int, optional): Exact sampling rate.
+        channels (int, optional): Exact channel count.
+        order_by (str): Column to sort by. Default is 'path'.
+        limit (int, optional): Maximum number of rows.
+
+        Returns:
+        list: One dict per sample with the catalog columns.
+        """
+        clauses, params = [], []
+        if tempo is not None:
+            low, high = tempo if isinstance(tempo, (tuple, list)) else (tempo - TEMPO_TOLERANCE, tempo + TEMPO_TOLERANCE)
+            clauses.append("tempo BETWEEN ? AND ?")
+            params += [low, high]
+        if key is not None:
+            clauses.append("camelot = ?" if CAMELOT_PATTERN.match(key) else "key = ?")
+            params.append(key)
+        if duration is not None:
+            low, high = duration
+            if low is not None:
+                clauses.append("duration >= ?")
+                params.append(low)
+            if high is not None:
+                clauses.append("duration <= ?")
+                params.append(high)
+        if name is not None:
+            clauses.append("name LIKE ? ESCAPE '\\'")
+            params.append('%' + name.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        if folder is not None:
+            folder = os.path.abspath(folder)
+            clauses.append("(folder = ? OR (folder >= ? AND folder < ?))")
+            params += [folder, *_subtree(folder)]
+        if sample_rate is not None:
+            clauses.append("sample_rate = ?")
+            params.append(sample_rate)
+        if channels is not None:
+            clauses.append("channels = ?")
+            params.append(channels)
+        if order_by not in COLUMNS:
+            raise ValueError(f"Invalid value for 'order_by'. Choose from {', '.join(COLUMNS)}.")
+
+        sql = "SELECT * FROM samples"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        # '+' keeps SQLite from walking the sort column's index instead of the filtering one
+        sql += f" ORDER BY +{order_by}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def features(self, sample, feature):
+        """
+        Loads one analysis feature of a catalogued sample from the feature store it was
+        ingested from.
+
+        Parameters:
+        sample (dict or str): A row returned by query(), or a file path.
+        feature (str): Feature name, e.g. 'chroma'.
+
+        Returns:
+        np.ndarray: The feature, or None if the sample hasn't been analyzed into a feature store.
+        """
+        if isinstance(sample, str):
+            row = self.conn.execute("SELECT feature_source, feature_row FROM samples WHERE path = ?",
+                                    (os.path.abspath(sample),)).fetchone()
+            if row is None:
+                return None
+            sample = dict(row)
+        source = sample['feature_source']
+        if source is None or not os.path.isdir(source):
+            return None
+        if source not in self._stores:
+            self._stores[source] = FeatureStore(source)
+        return self._stores[source].get_row(sample['feature_row'], feature)
+
+    def stats(self):
+        """
+        Returns the number of samples, how many have a tempo and a key, and their total
+        duration and size.
+        """
+        row = self.conn.execute("""
+            SELECT COUNT(*), COUNT(tempo), COUNT(key), COALESCE(SUM(duration), 0), COALESCE(SUM(size), 0)
+            FROM samples
+        """).fetchone()
+        return {'samples': row[0], 'with_tempo': row[1], 'with_key': row[2],
+                'duration_s': row[3], 'bytes': row[4]}
+
+def print_samples(samples):
+    for sample in samples:
+        tempo = f"{sample['tempo']:6.1f}" if sample['tempo'] is not None else "     -"
+        duration = f"{sample['duration']:7.2f} s" if sample['duration'] is not None else "      - s"
+        print(f"{tempo} BPM  {sample['key'] or '-':<10} {sample['camelot'] or '-':>3}  {duration}  {sample['path']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sample library catalog.")
+    parser.add_argument('--catalog', default='sample_catalog.sqlite', help="Catalog database")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    crawl_parser = commands.add_parser('crawl', help="Add new and modified files under folders")
+    crawl_parser.add_argument('roots', nargs='+')
+    crawl_parser.add_argument('--keep-missing', action='store_true', help="Keep rows of deleted files")
+    crawl_parser.add_argument('--workers', type=int, default=16, help="Headers read at once")
+
+    ingest_parser = commands.add_parser('ingest', help="Read tempo and key from run_librosa output")
+    ingest_parser.add_argument('results', help="Feature store directory or JSON results file")
+
+    query_parser = commands.add_parser('query', help="Find samples")
+    query_parser.add_argument('--bpm', type=float, help=f"Tempo within {TEMPO_TOLERANCE} BPM")
+    query_parser.add_argument('--bpm-range', type=float, nargs=2, metavar=('MIN', 'MAX'))
+    query_parser.add_argument('--key', help="e.g. 'A minor' or '8A'")
+    query_parser.add_argument('--min-duration', type=float)
+    query_parser.add_argument('--max-duration', type=float)
+    query_parser.add_argument('--name', help="Text the file name contains, e.g. kick")
+    query_parser.add_argument('--folder')
+    query_parser.add_argument('--sort', default='path')
+    query_parser.add_argument('--limit', type=int)
+
+    commands.add_parser('stats', help="Summarize the catalog")
+    args = parser.parse_args()
+
+    with SampleCatalog(args.catalog) as catalog:
+        if args.command == 'crawl':
+            start = time.perf_counter()
+            counts = catalog.crawl(args.roots, prune=not args.keep_missing, workers=args.workers)
+            print(f"{counts['added']} added, {counts['updated']} updated, {counts['unchanged']} unchanged, "
+                  f"{counts['removed']} removed, {counts['errors']} errors in {time.perf_counter() - start:.1f} s")
+        elif args.command == 'ingest':
+            print(f"{catalog.ingest_analysis(args.results)} samples updated")
+        elif args.command == 'query':
+            duration = None
+            if args.min_duration is not None or args.max_duration is not None:
+                duration = (args.min_duration, args.max_duration)
+            start = time.perf_counter()
+            samples = catalog.query(tempo=args.bpm_range or args.bpm, key=args.key, duration=duration,
+                                    name=args.name, folder=args.folder, order_by=args.sort, limit=args.limit)
+            print_samples(samples)
+            print(f"{len(samples)} samples in {(time.perf_counter() - start) * 1000:.1f} ms")
+        else:
+            stats = catalog.stats()
+            print(f"{stats['samples']} samples ({stats['with_tempo']} with tempo, {stats['with_key']} with key), "
+                  f"{stats['duration_s'] / 3600:.1f} h of audio, {stats['bytes'] / 1e9:.2f} GB")
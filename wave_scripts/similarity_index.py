@@ -0,0 +1,216 @@
+import numpy as np
+from analyze_librosa import build_feature_table
+
+# Feature groups of the embedding -> table columns. Each group is weighted as a whole,
+# so the 12 chroma dimensions don't drown out tempo.
+EMBEDDING_GROUPS = {
+    'chroma': [f"chroma_mean_{i}" for i in range(12)],
+    'tonnetz': [f"tonnetz_mean_{i}" for i in range(6)],
+    'spectral': [
+        'spectral_centroid_mean', 'spectral_centroid_std',
+        'spectral_bandwidth_mean', 'spectral_bandwidth_std',
+        'spectral_rolloff_mean', 'spectral_rolloff_std',
+        'spectral_flatness_mean', 'spectral_flatness_std',
+    ] + [f"spectral_contrast_mean_{i}" for i in range(7)],
+    'tempo': ['tempo'],
+    'rms': ['rms_mean', 'rms_std'],
+}
+EMBEDDING_COLUMNS = [column for columns in EMBEDDING_GROUPS.values() for column in columns]
+EMBEDDED_FEATURES = ['tempo', 'chroma', 'tonnetz', 'rms', 'spectral_centroid', 'spectral_bandwidth',
+                     'spectral_contrast', 'spectral_flatness', 'spectral_rolloff']
+
+def embed_results(analysis_results):
+    """
+    Summarizes analysis results into one compact raw feature vector per file.
+
+    Parameters:
+    analysis_results (list): {'file': path, 'features': dict} entries, as written by analyze_folder.
+
+    Returns:
+    tuple: (files, vectors) where vectors is a (files x len(EMBEDDING_COLUMNS)) float32 array;
+    features a file doesn't have are NaN.
+    """
+    table = build_feature_table(analysis_results, aggregates=('mean', 'std'), features=EMBEDDED_FEATURES)
+    table = table.reindex(columns=EMBEDDING_COLUMNS)
+    return list(table.index), table.to_numpy(dtype=np.float32)
+
+class SimilarityIndex:
+    """
+    Nearest-neighbour index over per-file embeddings ("find loops like this one").
+
+    Raw vectors are standardized per dimension and weighted per feature group, and their
+    squared norms are kept alongside. A query is then one matrix-vector product
+    over all files plus an argpartition for the top k, which stays in the millisecond
+    range for 100k samples. Adding results only appends or replaces rows; the normalized
+    matrix is rebuilt lazily on the next query.
+
+    Parameters:
+    weights (dict, optional): Group name -> weight. Groups not listed get weight 1.
+    """
+    def __init__(self, weights=None):
+        self.weights = weights or {}
+        self.files = []
+        self.rows = {}
+        self.raw = np.empty((0, len(EMBEDDING_COLUMNS)), dtype=np.float32)
+        self._matrix = None
+        self._norms = None
+        self._scale = None
+        self._center = None
+
+    def __len__(self):
+        return len(self.files)
+
+    def add(self, analysis_results):
+        """
+        Adds new analysis results; files already in the index are updated in place.
+
+        Parameters:
+        analysis_results (list): {'file': path, 'features': dict} entries.
+
+        Returns:
+        None
+        """
+        files, vectors = embed_results(analysis_results)
+        self.add_vectors(files, vectors)
+
+    def add_vectors(self, files, vectors):
+        """
+        Adds raw embedding vectors (as returned by embed_results).
+
+        Parameters:
+        files (list): File paths.
+        vectors (np.ndarray): (files x len(EMBEDDING_COLUMNS)) raw vectors.
+
+        Returns:
+        None
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        new_rows = {}
+        for file_path, vector in zip(files, vectors):
+            row = self.rows.get(file_path)
+            if row is not None:
+                self.raw[row] = vector
+            else:
+                new_rows[file_path] = vector
+        if new_rows:
+            for file_path in new_rows:
+                self.rows[file_path] = len(self.files)
+                self.files.append(file_path)
+            self.raw = np.concatenate([self.raw, np.stack(list(new_rows.values()))])
+        self._matrix = None
+
+    def _build(self):
+        # Per-dimension standardization; missing values sit at the mean (0)
+        with np.errstate(invalid='ignore'):
+            center = np.nanmean(self.raw, axis=0) if len(self.raw) else np.zeros(self.raw.shape[1])
+            spread = np.nanstd(self.raw, axis=0) if len(self.raw) else np.ones(self.raw.shape[1])
+        center = np.nan_to_num(center)
+        spread = np.where(np.nan_to_num(spread) > 0, spread, 1.0)
+
+        # Group weights, divided by sqrt(group size) so every group counts equally by default
+        group_scale = np.empty(len(EMBEDDING_COLUMNS), dtype=np.float32)
+        start = 0
+        for group, columns in EMBEDDING_GROUPS.items():
+            group_scale[start:start + len(columns)] = self.weights.get(group, 1.0) / np.sqrt(len(columns))
+            start += len(columns)
+
+        self._center = center.astype(np.float32)
+        self._scale = (group_scale / spread).astype(np.float32)
+        self._matrix = self._transform(self.raw)
+        self._norms = np.einsum('ij,ij->i', self._matrix, self._matrix)
+
+    def _transform(self, vectors):
+        return np.nan_to_num((vectors - self._center) * self._scale).astype(np.float32)
+
+    def query(self, file_path=None, vector=None, k=10, metric='cosine', tempo_range=None):
+        """
+        Finds the k files most similar to a file in the index or to a raw vector.
+
+        Parameters:
+        file_path (str, optional): Query by a file already in the index (it's excluded from the results).
+        vector (np.ndarray, optional): Query by a raw embedding vector instead.
+        k (int): Number of neighbours. Default is 10.
+        metric (str): 'cosine' (higher is closer) or 'euclidean' (lower is closer). Default is 'cosine'.
+        tempo_range (tuple, optional): (min_bpm, max_bpm) the neighbours' tempo must fall in.
+
+        Returns:
+        list: (file_path, score) tuples, best match first.
+        """
+        if metric not in ('cosine', 'euclidean'):
+            raise ValueError("Invalid value for 'metric'. Choose from 'cosine' or 'euclidean'.")
+        if (file_path is None) == (vector is None):
+            raise ValueError("Pass exactly one of file_path or vector")
+        if self._matrix is None:
+            self._build()
+        if not self.files:
+            return []
+
+        if file_path is not None:
+            exclude = self.rows[file_path]
+            q = self._matrix[exclude]
+        else:
+            exclude = None
+            q = self._transform(np.asarray(vector, dtype=np.float32)[None, :])[0]
+
+        dots = self._matrix @ q
+        if metric == 'cosine':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                scores = dots / np.sqrt(self._norms * float(q @ q))
+            # Rank by negated similarity so smaller is always better
+            keys = -np.nan_to_num(scores, nan=-np.inf)
+        else:
+            scores = np.sqrt(np.maximum(self._norms - 2 * dots + float(q @ q), 0.0))
+            keys = scores.copy()
+
+        if tempo_range is not None:
+            tempos = self.raw[:, EMBEDDING_COLUMNS.index('tempo')]
+            with np.errstate(invalid='ignore'):
+                keys[~((tempos >= tempo_range[0]) & (tempos <= tempo_range[1]))] = np.inf
+        if exclude is not None:
+            keys[exclude] = np.inf
+
+        k = min(k, int(np.isfinite(keys).sum()))
+        if k == 0:
+            return []
+        top = np.argpartition(keys, k - 1)[:k]
+        top = top[np.argsort(keys[top])]
+        return [(self.files[i], float(scores[i])) for i in top]
+
+    def save(self, path):
+        """
+        Saves the raw vectors and file list to a .npz file.
+
+        Parameters:
+        path (str): Output path.
+
+        Returns:
+        None
+        """
+        np.savez(path, files=np.array(self.files, dtype=str), raw=self.raw)
+
+    @classmethod
+    def load(cls, path, weights=None):
+        """
+        Loads an index saved with save().
+
+        Parameters:
+        path (str): Path to the .npz file.
+        weights (dict, optional): Group weights.
+
+        Returns:
+        SimilarityIndex: The loaded index.
+        """
+        data = np.load(path)
+        index = cls(weights)
+        index.add_vectors([str(file_path) for file_path in data['files']], data['raw'])
+        return index
+
+# Example usage
+if __name__ == "__main__":
+    from feature_store import load_results
+
+    results = load_results(r"C:\Users\Kenrm\repositories\music-prod\data\analysis_results.features")
+    index = SimilarityIndex(weights={'chroma': 2.0})
+    index.add(results)
+    for match, score in index.query(file_path=results[0]['file'], k=5, tempo_range=(120, 130)):
+        print(f"{score:.3f}  {match}")
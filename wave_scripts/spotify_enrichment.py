@@ -0,0 +1,281 @@
+import json
+import time
+import random
+import sqlite3
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+API_URL = 'https://api.spotify.com/v1'
+TOKEN_URL = 'https://accounts.spotify.com/api/token'
+
+# Endpoint -> (key of the list in the response, most IDs the API accepts per request)
+BATCH_ENDPOINTS = {
+    'audio-features': ('audio_features', 100),
+    'tracks': ('tracks', 50),
+}
+
+# Cached responses are refetched after this long
+DEFAULT_TTL = 30 * 24 * 3600
+
+# Retries of a request that got a 429 or 5xx before giving up
+MAX_RETRIES = 6
+
+# First wait for 5xx responses and 429s without Retry-After; doubled on every retry
+BACKOFF_SECONDS = 0.5
+
+class SpotifyError(Exception):
+    """Raised when the API keeps failing after MAX_RETRIES."""
+
+class SpotifyAPI:
+    """
+    Minimal thread-safe Spotify Web API client for the client-credentials flow that honours
+    rate limits: a 429 waits for its Retry-After, 5xx responses back off exponentially.
+
+    Parameters:
+    client_id (str): Application client ID.
+    client_secret (str): Application client secret.
+    api_url (str): Base URL of the API. Default is API_URL; point it at a local stand-in
+        (e.g. benchmarks/spotify_stub.py) for offline runs.
+    token_url (str): Token endpoint. Default is TOKEN_URL.
+    timeout (float): Request timeout in seconds. Default is 10.
+    """
+    def __init__(self, client_id, client_secret, api_url=API_URL, token_url=TOKEN_URL, timeout=10):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_url = api_url.rstrip('/')
+        self.token_url = token_url
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.mount('http://', requests.adapters.HTTPAdapter(pool_maxsize=32))
+        self.session.mount('https://', requests.adapters.HTTPAdapter(pool_maxsize=32))
+        self._token = None
+        self._token_expires = 0.0
+        self._token_lock = threading.Lock()
+        self.requests_sent = 0
+        self.rate_limited = 0
+
+    def _access_token(self, refresh=False):
+        with self._token_lock:
+            if refresh or self._token is None or time.time() > self._token_expires - 60:
+                response = self.session.post(self.token_url, data={'grant_type': 'client_credentials'},
+                                             auth=(self.client_id, self.client_secret), timeout=self.timeout)
+                response.raise_for_status()
+                payload = response.json()
+                self._token = payload['access_token']
+                self._token_expires = time.time() + payload.get('expires_in', 3600)
+            return self._token
+
+    def get(self, path, params=None):
+        """
+        GETs an API path, retrying on rate limits, server errors and expired tokens.
+
+        Parameters:
+        path (str): Path below the API URL, e.g. 'audio-features'.
+        params (dict, optional): Query parameters.
+
+        Returns:
+        dict: The decoded JSON response.
+        """
+        delay = BACKOFF_SECONDS
+        refreshed = False
+        for attempt in range(MAX_RETRIES + 1):
+            headers = {'Authorization': f'Bearer {self._access_token()}'}
+            try:
+                response = self.session.get(f'{self.api_url}/{path}', params=params, headers=headers,
+                                            timeout=self.timeout)
+            except requests.ConnectionError as e:
+                if attempt == MAX_RETRIES:
+                    raise SpotifyError(f"GET {path} failed: {e}") from e
+                time.sleep(delay)
+                delay *= 2
+                continue
+            self.requests_sent += 1
+
+            if response.status_code == 401 and not refreshed:
+                self._access_token(refresh=True)
+                refreshed = True
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                if attempt == MAX_RETRIES:
+                    break
+                if response.status_code == 429:
+                    self.rate_limited += 1
+                retry_after = response.headers.get('Retry-After')
+                # Jitter keeps the pool's threads from retrying in lockstep
+                wait = float(retry_after) if retry_after is not None else delay
+                time.sleep(wait + random.uniform(0, delay / 4))
+                delay *= 2
+                continue
+            response.raise_for_status()
+            return response.json()
+        raise SpotifyError(f"GET {path} still failing after {MAX_RETRIES} retries (HTTP {response.status_code})")
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of per-ID API responses with a time-to-live. IDs the API
+    returned nothing for are cached too, so they aren't asked for again on every run.
+
+    Parameters:
+    cache_path (str): Path to the SQLite database file.
+    ttl (float): Seconds a response stays fresh. Default is DEFAULT_TTL.
+    """
+    def __init__(self, cache_path, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                endpoint TEXT NOT NULL,
+                id TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                body TEXT,
+                PRIMARY KEY (endpoint, id)
+            )
+        """)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_many(self, endpoint, ids):
+        """
+        Returns the fresh cached responses of the given IDs.
+
+        Parameters:
+        endpoint (str): API endpoint, e.g. 'audio-features'.
+        ids (list): IDs to look up.
+
+        Returns:
+        dict: ID -> response (None if the API had nothing for it), for fresh entries only.
+        """
+        found = {}
+        oldest = time.time() - self.ttl
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT id, body FROM responses WHERE endpoint = ? AND fetched_at >= ? "
+                f"AND id IN ({','.join('?' * len(batch))})",
+                [endpoint, oldest, *batch]
+            )
+            for item_id, body in rows:
+                found[item_id] = json.loads(body) if body is not None else None
+        return found
+
+    def put_many(self, endpoint, responses):
+        """
+        Stores responses.
+
+        Parameters:
+        endpoint (str): API endpoint.
+        responses (dict): ID -> response (None if the API had nothing for it).
+
+        Returns:
+        None
+        """
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO responses (endpoint, id, fetched_at, body) VALUES (?, ?, ?, ?)",
+            [(endpoint, item_id, now, json.dumps(body) if body is not None else None)
+             for item_id, body in responses.items()]
+        )
+        self.conn.commit()
+
+    def purge(self):
+        """
+        Deletes expired responses.
+
+        Returns:
+        int: Number of deleted rows.
+        """
+        cursor = self.conn.execute("DELETE FROM responses WHERE fetched_at < ?", (time.time() - self.ttl,))
+        self.conn.commit()
+        return cursor.rowcount
+
+class SpotifyEnricher:
+    """
+    Fetches per-track data for many tracks at once: IDs are deduplicated, served from the
+    response cache where fresh, and the rest requested in batches of the endpoint's limit
+    spread over a thread pool.
+
+    Parameters:
+    api (SpotifyAPI): The client.
+    cache (ResponseCache, optional): Response cache. Default is no caching.
+    workers (int): Concurrent requests. Default is 4.
+    """
+    def __init__(self, api, cache=None, workers=4):
+        self.api = api
+        self.cache = cache
+        self.workers = workers
+
+    def fetch(self, endpoint, ids):
+        """
+        Returns the response of a batch endpoint for every ID.
+
+        Parameters:
+        endpoint (str): A key of BATCH_ENDPOINTS, e.g. 'audio-features'.
+        ids (iterable): Spotify track IDs; None entries are ignored.
+
+        Returns:
+        dict: ID -> response dict, or None where Spotify has no data.
+        """
+        if endpoint not in BATCH_ENDPOINTS:
+            raise ValueError(f"Invalid endpoint '{endpoint}'. Choose from {', '.join(BATCH_ENDPOINTS)}.")
+        key, limit = BATCH_ENDPOINTS[endpoint]
+        ids = list(dict.fromkeys(item_id for item_id in ids if item_id))
+        results = self.cache.get_many(endpoint, ids) if self.cache is not None else {}
+        missing = [item_id for item_id in ids if item_id not in results]
+        batches = [missing[i:i + limit] for i in range(0, len(missing), limit)]
+
+        def fetch_batch(batch):
+            items = self.api.get(endpoint, {'ids': ','.join(batch)})[key]
+            # The API answers in request order, with null for unknown IDs
+            return dict(zip(batch, items))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for fetched in executor.map(fetch_batch, batches):
+                results.update(fetched)
+                if self.cache is not None:
+                    self.cache.put_many(endpoint, fetched)
+        return results
+
+    def audio_features(self, ids):
+        """
+        Returns Spotify's audio features (valence, energy, ...) of every track ID.
+        """
+        return self.fetch('audio-features', ids)
+
+    def search_tracks(self, queries):
+        """
+        Looks up the track ID of (artist, title) pairs, e.g. from file tags, with one
+        search request per pair not in the cache.
+
+        Parameters:
+        queries (iterable): (artist, title) tuples.
+
+        Returns:
+        dict: (artist, title) -> best matching track ID, or None if nothing matched.
+        """
+        queries = list(dict.fromkeys(queries))
+        keys = {query: '\t'.join(query).lower() for query in queries}
+        cached = self.cache.get_many('search', list(keys.values())) if self.cache is not None else {}
+        missing = [query for query in queries if keys[query] not in cached]
+
+        def search(query):
+            artist, title = query
+            items = self.api.get('search', {'q': f'track:{title} artist:{artist}', 'type': 'track',
+                                            'limit': 1})['tracks']['items']
+            return {'id': items[0]['id']} if items else None
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            found = dict(zip((keys[query] for query in missing), executor.map(search, missing)))
+        if self.cache is not None and found:
+            self.cache.put_many('search', found)
+        cached.update(found)
+        return {query: (cached[keys[query]] or {}).get('id') for query in queries}
@@ -0,0 +1,265 @@
+import librosa
+import numpy as np
+from feature_graph import N_FFT, HOP_LENGTH
+from key_detection import key_feature
+
+# Frames per block read from disk (about 3 s at 44.1 kHz)
+BLOCK_LENGTH = 256
+
+# Frame-level features that can be computed block by block
+STREAMING_FEATURES = (
+    'tempo',
+    'chroma',
+    'tonnetz',
+    'key',
+    'rms',
+    'spectral_centroid',
+    'spectral_bandwidth',
+    'spectral_contrast',
+    'spectral_flatness',
+    'spectral_rolloff',
+)
+
+class RunningStats:
+    """
+    Per-row running mean, variance, min and max over frames, updated one block at a time
+    (Chan et al.'s parallel variant of Welford's algorithm).
+
+    Parameters:
+    n_rows (int): Number of rows of the feature matrix.
+    """
+    def __init__(self, n_rows):
+        self.count = 0
+        self.mean = np.zeros(n_rows)
+        self.m2 = np.zeros(n_rows)
+        self.min = np.full(n_rows, np.inf)
+        self.max = np.full(n_rows, -np.inf)
+
+    def update(self, block):
+        """
+        Adds a (rows x frames) block.
+
+        Parameters:
+        block (np.ndarray): Frame-level values of one block.
+
+        Returns:
+        None
+        """
+        n = block.shape[-1]
+        if n == 0:
+            return
+        block_mean = block.mean(axis=-1)
+        block_m2 = ((block - block_mean[:, None]) ** 2).sum(axis=-1)
+        total = self.count + n
+        delta = block_mean - self.mean
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + block_m2 + delta ** 2 * self.count * n / total
+        self.count = total
+        self.min = np.minimum(self.min, block.min(axis=-1))
+        self.max = np.maximum(self.max, block.max(axis=-1))
+
+    @property
+    def std(self):
+        return np.sqrt(self.m2 / max(self.count, 1))
+
+def iter_blocks(file_path, block_length=BLOCK_LENGTH):
+    """
+    Reads a file block by block and yields each block with its magnitude spectrogram.
+
+    Blocks are padded at the start and end of the file the way librosa.stft(center=True)
+    pads the whole signal, so frame k of the stream lines up with frame k of an
+    in-memory analysis.
+
+    Parameters:
+    file_path (str): Path to the audio file (any format soundfile can read).
+    block_length (int): Number of frames per block. Default is BLOCK_LENGTH.
+
+    Returns:
+    generator: Yields (y_block, magnitude_spectrogram) pairs at the file's native rate.
+    """
+    stream = librosa.stream(
+        file_path,
+        block_length=block_length,
+        frame_length=N_FFT,
+        hop_length=HOP_LENGTH
+    )
+    edge = np.zeros(N_FFT // 2, dtype=np.float32)
+
+    def prepare(block, first, last):
+        if first:
+            block = np.concatenate([edge, block])
+        if last:
+            block = np.concatenate([block, edge])
+        if len(block) < N_FFT:
+            block = np.pad(block, (0, N_FFT - len(block)))
+        S = np.abs(librosa.stft(block, n_fft=N_FFT, hop_length=HOP_LENGTH, center=False))
+        return block, S
+
+    previous = None
+    first = True
+    for block in stream:
+        if previous is not None:
+            yield prepare(previous, first, last=False)
+            first = False
+        previous = block
+    if previous is not None:
+        yield prepare(previous, first, last=True)
+
+class OnsetAccumulator:
+    """
+    Builds the same onset-strength envelope librosa.beat.beat_track uses, one
+    spectrogram block at a time.
+
+    The dB conversion clips at 80 dB below the loudest mel bin seen so far rather than
+    the loudest in the whole track, so quiet intros can differ slightly from an
+    in-memory analysis.
+
+    Parameters:
+    sr (int): Sampling rate of the stream.
+    """
+    def __init__(self, sr):
+        self.mel_basis = librosa.filters.mel(sr=sr, n_fft=N_FFT)
+        self.previous = None
+        self.peak_db = -np.inf
+        self.n_frames = 0
+        # Same shift onset_strength(center=True) applies: lag + n_fft / (2 * hop)
+        self.parts = [np.zeros(1 + N_FFT // (2 * HOP_LENGTH), dtype=np.float32)]
+
+    def update(self, S):
+        """
+        Adds a magnitude spectrogram block.
+
+        Parameters:
+        S (np.ndarray): Magnitude spectrogram (bins x frames).
+
+        Returns:
+        None
+        """
+        mel_db = librosa.power_to_db(self.mel_basis @ S ** 2, top_db=None)
+        self.peak_db = max(self.peak_db, float(mel_db.max()))
+        mel_db = np.maximum(mel_db, self.peak_db - 80.0)
+        if self.previous is not None:
+            mel_db = np.concatenate([self.previous, mel_db], axis=1)
+        diff = np.maximum(0.0, mel_db[:, 1:] - mel_db[:, :-1])
+        self.parts.append(np.median(diff, axis=0).astype(np.float32))
+        self.previous = mel_db[:, -1:]
+        self.n_frames += S.shape[1]
+
+    def envelope(self):
+        """
+        Returns the onset envelope of everything seen so far.
+
+        Returns:
+        np.ndarray: Onset strength per frame.
+        """
+        return np.concatenate(self.parts)[:self.n_frames]
+
+def analyze_audio_streaming(file_path, features=None, block_length=BLOCK_LENGTH, keep_frames=True):
+    """
+    Analyzes an audio file block by block, so peak memory depends on the block size rather
+    than on the length of the recording.
+
+    Frame-level features match analyze_audio's layout (computed at the file's native rate,
+    with STFT chroma instead of CQT chroma, since the CQT's long low-frequency filters
+    don't fit in a block). Tempo is estimated from the onset envelope of the whole track.
+    The key is estimated from the mean chroma of the whole track. Each frame-level feature
+    also gets '<name>_mean' and '<name>_std' summaries.
+
+    Parameters:
+    file_path (str): Path to the audio file.
+    features (iterable, optional): Names of the features to compute. Defaults to STREAMING_FEATURES.
+    block_length (int): Number of frames per block. Default is BLOCK_LENGTH.
+    keep_frames (bool): If False, only the summaries and tempo are returned. Default is True.
+
+    Returns:
+    dict: A dictionary containing the extracted features.
+    """
+    features = list(STREAMING_FEATURES if features is None else features)
+    unknown = [name for name in features if name not in STREAMING_FEATURES]
+    if unknown:
+        raise ValueError(f"Features not available in streaming mode: {', '.join(unknown)}")
+    frame_features = [name for name in features if name not in ('tempo', 'key')]
+    need_chroma = 'chroma' in features or 'tonnetz' in features or 'key' in features
+
+    sr = librosa.get_samplerate(file_path)
+    onsets = OnsetAccumulator(sr) if 'tempo' in features else None
+    frames = {name: [] for name in frame_features}
+    stats = {}
+    key_stats = RunningStats(12) if 'key' in features else None
+    tuning = None
+
+    for y_block, S in iter_blocks(file_path, block_length):
+        values = {}
+        if need_chroma:
+            if tuning is None:
+                tuning = librosa.estimate_tuning(S=S, sr=sr)
+            chroma = librosa.feature.chroma_stft(S=S ** 2, sr=sr, tuning=tuning)
+            values['chroma'] = chroma
+            if key_stats is not None:
+                key_stats.update(chroma)
+            if 'tonnetz' in features:
+                values['tonnetz'] = librosa.feature.tonnetz(sr=sr, chroma=chroma)
+        if 'rms' in features:
+            values['rms'] = librosa.feature.rms(y=y_block, frame_length=N_FFT, hop_length=HOP_LENGTH, center=False)
+        if 'spectral_centroid' in features:
+            values['spectral_centroid'] = librosa.feature.spectral_centroid(S=S, sr=sr)
+        if 'spectral_bandwidth' in features:
+            values['spectral_bandwidth'] = librosa.feature.spectral_bandwidth(S=S, sr=sr)
+        if 'spectral_contrast' in features:
+            values['spectral_contrast'] = librosa.feature.spectral_contrast(S=S, sr=sr)
+        if 'spectral_flatness' in features:
+            values['spectral_flatness'] = librosa.feature.spectral_flatness(S=S)
+        if 'spectral_rolloff' in features:
+            values['spectral_rolloff'] = librosa.feature.spectral_rolloff(S=S, sr=sr)
+        if onsets is not None:
+            onsets.update(S)
+
+        for name in frame_features:
+            value = values[name]
+            if name not in stats:
+                stats[name] = RunningStats(value.shape[0])
+            stats[name].update(value)
+            if keep_frames:
+                frames[name].append(value.astype(np.float32))
+
+    result = {}
+    if onsets is not None:
+        tempo, _ = librosa.beat.beat_track(onset_envelope=onsets.envelope(), sr=sr, hop_length=HOP_LENGTH)
+        result['tempo'] = tempo
+    if key_stats is not None:
+        result['key'] = key_feature(key_stats.mean)
+    for name in frame_features:
+        if keep_frames:
+            result[name] = np.concatenate(frames[name], axis=1)
+        result[f'{name}_mean'] = stats[name].mean
+        result[f'{name}_std'] = stats[name].std
+    return result
+
+def stream_onsets_and_beats(file_path, block_length=BLOCK_LENGTH, on_block=None):
+    """
+    Computes the onset envelope, tempo and beat times of a file block by block.
+
+    Parameters:
+    file_path (str): Path to the audio file.
+    block_length (int): Number of frames per block. Default is BLOCK_LENGTH.
+    on_block (callable, optional): Called with each block's magnitude spectrogram, e.g. to
+        reduce it to display data while it is in memory.
+
+    Returns:
+    dict: 'sr', 'duration', 'onset_env', 'tempo' and 'beat_times'.
+    """
+    sr = librosa.get_samplerate(file_path)
+    onsets = OnsetAccumulator(sr)
+    for _, S in iter_blocks(file_path, block_length):
+        onsets.update(S)
+        if on_block is not None:
+            on_block(S)
+    onset_env = onsets.envelope()
+    tempo, beats = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH)
+    return {
+        'sr': sr,
+        'duration': librosa.get_duration(path=file_path),
+        'onset_env': onset_env,
+        'tempo': tempo,
+        'beat_times': librosa.frames_to_time(beats, sr=sr, hop_length=HOP_LENGTH)
+    }
@@ -0,0 +1,207 @@
+import os
+import re
+import time
+import librosa
+import numpy as np
+import scipy.fft
+from key_detection import PITCH_CLASSES
+
+# Rate and hop of the onset envelope used to check hints: 125 envelope frames per second
+# is plenty for tempo and costs a fraction of the full-rate mel spectrogram
+TEMPO_SR = 8000
+TEMPO_HOP = 64
+TEMPO_N_FFT = 256
+
+# Tempi considered by the tempogram estimate
+MIN_BPM = 40
+MAX_BPM = 240
+
+# Log-normal prior of the estimate, as in librosa's tempo estimation
+PRIOR_BPM = 120
+PRIOR_OCTAVES = 1.0
+
+# A hint is confirmed when the estimate is within this fraction of the hint, or of half
+# or double the hint...
+HINT_TOLERANCE = 0.04
+
+# ...or when the tempogram at the hint's lag is at least this fraction of its strongest peak
+HINT_STRENGTH = 0.8
+
+# '130 BPM', '90bpm', '128_BPM', 'BPM 128'
+BPM_PATTERN = re.compile(r'(?<![\d.])(\d{2,3}(?:\.\d{1,2})?)\s*[_-]?\s*bpm|bpm\s*[_-]?\s*(\d{2,3}(?:\.\d{1,2})?)(?![\d.])',
+                         re.IGNORECASE)
+
+# 'E Min', 'Am', 'F#m', 'Bb major', 'C_Maj': a note letter (upper case, so words like 'am'
+# don't count) followed by a mode; a bare letter is too ambiguous to be a key
+KEY_PATTERN = re.compile(r'(?<![A-Za-z0-9])([A-G])([#b]?)[ _-]?((?i:major|minor|maj|min)|m)(?![A-Za-z])')
+
+FLATS = {'Cb': 'B', 'Db': 'C#', 'Eb': 'D#', 'Fb': 'E', 'Gb': 'F#', 'Ab': 'G#', 'Bb': 'A#'}
+
+def parse_filename_hints(file_path):
+    """
+    Reads the BPM and key sample packs put in file names, e.g. '90 BPM E Min Arp.wav'.
+
+    Parameters:
+    file_path (str): Path or name of the file.
+
+    Returns:
+    dict: 'bpm' (float) and 'key' (e.g. 'E minor', spelled like key_detection), each None
+    if the name doesn't have one.
+    """
+    name = os.path.splitext(os.path.basename(file_path))[0]
+    hints = {'bpm': None, 'key': None}
+
+    for match in BPM_PATTERN.finditer(name):
+        bpm = float(match.group(1) or match.group(2))
+        if MIN_BPM / 2 <= bpm <= MAX_BPM * 2:
+            hints['bpm'] = bpm
+            break
+
+    match = KEY_PATTERN.search(name)
+    if match:
+        note, accidental, mode = match.groups()
+        note = FLATS.get(note + accidental, note + accidental) if accidental else note
+        if note.endswith('#') and note not in PITCH_CLASSES:
+            note = PITCH_CLASSES[(PITCH_CLASSES.index(note[0]) + 1) % 12]  # E# -> F, B# -> C
+        hints['key'] = f"{note} {'minor' if mode == 'm' or mode.lower().startswith('min') else 'major'}"
+    return hints
+
+def onset_tempogram(y, sr):
+    """
+    Global autocorrelation tempogram of a spectral-flux onset envelope, computed on y
+    resampled to TEMPO_SR with a short plain FFT (no mel filterbank).
+
+    Parameters:
+    y (np.ndarray): Mono audio time series.
+    sr (int): Sampling rate of y.
+
+    Returns:
+    tuple: (bpms, strength) for every lag between MAX_BPM and MIN_BPM; strength is
+    normalized so its maximum is 1 (all zeros for silence).
+    """
+    y_low = librosa.resample(y, orig_sr=sr, target_sr=TEMPO_SR, res_type='soxr_lq').astype(np.float32)
+    if len(y_low) < TEMPO_N_FFT:
+        y_low = np.pad(y_low, (0, TEMPO_N_FFT - len(y_low)))
+    frames = librosa.util.frame(y_low, frame_length=TEMPO_N_FFT, hop_length=TEMPO_HOP).T
+    spectrum = np.abs(scipy.fft.rfft(frames * np.hanning(TEMPO_N_FFT).astype(np.float32), axis=1))
+    envelope = np.maximum(0, np.diff(np.log1p(100 * spectrum), axis=0)).mean(axis=1)
+
+    frame_rate = TEMPO_SR / TEMPO_HOP
+    lags = np.arange(int(np.floor(60 * frame_rate / MAX_BPM)), int(np.ceil(60 * frame_rate / MIN_BPM)) + 1)
+    bpms = 60 * frame_rate / lags
+    if len(envelope) <= lags[-1]:
+        # Shorter than two beats at MIN_BPM
+        return bpms, np.zeros(len(lags))
+    autocorrelation = librosa.autocorrelate(envelope - envelope.mean(), max_size=lags[-1] + 1)
+    # Unbiased: every lag is averaged over the frames it actually overlaps
+    strength = np.maximum(autocorrelation[lags] / (len(envelope) - lags), 0)
+    peak = strength.max()
+    return bpms, strength / peak if peak > 0 else strength
+
+def _strength_at(bpms, strength, bpm):
+    # Strongest lag within the hint tolerance of bpm
+    near = np.abs(bpms / bpm - 1) <= HINT_TOLERANCE
+    return strength[near].max() if near.any() else 0.0
+
+def check_tempo_hint(y, sr, hint):
+    """
+    Checks a tempo hint against the low-rate onset tempogram.
+
+    Parameters:
+    y (np.ndarray): Mono audio time series.
+    sr (int): Sampling rate of y.
+    hint (float): Tempo from the file name.
+
+    Returns:
+    tuple: (confirmed, estimate) where estimate is the tempogram's best tempo under the
+    log-normal prior, or None for silence.
+    """
+    bpms, strength = onset_tempogram(y, sr)
+    if not strength.any():
+        return False, None
+    prior = np.exp(-0.5 * (np.log2(bpms / PRIOR_BPM) / PRIOR_OCTAVES) ** 2)
+    estimate = float(bpms[np.argmax(strength * prior)])
+    for candidate in (hint, hint / 2, hint * 2):
+        if abs(estimate / candidate - 1) <= HINT_TOLERANCE:
+            return True, estimate
+    # Periodic material has equally strong peaks at multiples of the beat period, so the
+    # hint also holds if its own lag is about as strong as the best one
+    strongest = max(_strength_at(bpms, strength, candidate) for candidate in (hint, hint / 2, hint * 2))
+    return strongest >= HINT_STRENGTH, estimate
+
+def hinted_tempo(y, sr, file_path):
+    """
+    Tempo of a labelled loop from its file name, if the audio agrees with it.
+
+    Parameters:
+    y (np.ndarray): Mono audio time series.
+    sr (int): Sampling rate of y.
+    file_path (str): Path of the file, for the hint.
+
+    Returns:
+    tuple: (tempo, outcome). tempo is None unless the hint was confirmed, in which case
+    it is the hint in librosa's beat_track layout (a 1-element array). outcome is
+    'confirmed', 'rejected' (the audio disagrees) or 'unlabeled' (no BPM in the name).
+    """
+    hint = parse_filename_hints(file_path)['bpm']
+    if hint is None:
+        return None, 'unlabeled'
+    confirmed, _ = check_tempo_hint(y, sr, hint)
+    if not confirmed:
+        return None, 'rejected'
+    return np.array([hint]), 'confirmed'
+
+def hint_report(file_paths, sr=22050, compare=True):
+    """
+    Checks the file name hints of a set of files and reports how often they hold up.
+
+    Parameters:
+    file_paths (iterable): Audio files.
+    sr (int): Rate the files are loaded at. Default is 22050.
+    compare (bool): Also time librosa's beat tracking on each labelled file. Default is True.
+
+    Returns:
+    dict: Counts per outcome, the confirmation rate of labelled files, the hint check and
+    beat tracking times, and the (file, hint, estimate) of every rejected hint.
+    """
+    from wav_loader import load_wav
+
+    report = {'confirmed': 0, 'rejected': 0, 'unlabeled': 0, 'hint_s': 0.0, 'beat_track_s': 0.0, 'rejections': []}
+    for file_path in file_paths:
+        hint = parse_filename_hints(file_path)['bpm']
+        if hint is None:
+            report['unlabeled'] += 1
+            continue
+        y, sr = load_wav(file_path, sr=sr)
+        start = time.perf_counter()
+        confirmed, estimate = check_tempo_hint(y, sr, hint)
+        report['hint_s'] += time.perf_counter() - start
+        report['confirmed' if confirmed else 'rejected'] += 1
+        if not confirmed:
+            report['rejections'].append((file_path, hint, estimate))
+        if compare:
+            start = time.perf_counter()
+            librosa.beat.beat_track(y=y, sr=sr)
+            report['beat_track_s'] += time.perf_counter() - start
+    labelled = report['confirmed'] + report['rejected']
+    report['confirmation_rate'] = report['confirmed'] / labelled if labelled else None
+    return report
+
+def print_hint_report(report):
+    labelled = report['confirmed'] + report['rejected']
+    print(f"{labelled} labelled files: {report['confirmed']} hints confirmed, {report['rejected']} rejected; "
+          f"{report['unlabeled']} without a BPM in the name")
+    if labelled:
+        print(f"Hint checks {report['hint_s']:.2f} s ({report['hint_s'] / labelled * 1000:.1f} ms per file)")
+        if report['beat_track_s']:
+            print(f"Beat tracking {report['beat_track_s']:.2f} s, "
+                  f"{report['beat_track_s'] / max(report['hint_s'], 1e-9):.1f}x slower")
+    for file_path, hint, estimate in report['rejections']:
+        print(f"  {hint:g} BPM in the name, ~{estimate or 0:.1f} BPM in the audio: {file_path}")
+
+# Example usage
+if __name__ == "__main__":
+    from run_librosa import find_wav_files
+
+    folder_path = r"C:\Users\Kenrm\OneDrive\Documents\Image-Line\FL Studio\Projects\02_Drum Stems\Drum Stems"
+    print_hint_report(hint_report(find_wav_files(folder_path)))
@@ -0,0 +1,185 @@
+import os
+import struct
+import librosa
+import numpy as np
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# quality -> librosa res_type ('none' keeps the native rate)
+RESAMPLE_TYPES = {
+    'fast': 'soxr_qq',
+    'hq': 'soxr_hq',
+}
+
+# (format, bits per sample) -> on-disk sample dtype; 24-bit is handled separately
+SAMPLE_DTYPES = {
+    (WAVE_FORMAT_PCM, 8): np.dtype('u1'),
+    (WAVE_FORMAT_PCM, 16): np.dtype('<i2'),
+    (WAVE_FORMAT_PCM, 32): np.dtype('<i4'),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype('<f4'),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype('<f8'),
+}
+
+def read_wav_header(file_path, read_chunks=()):
+    """
+    Parses the RIFF chunk layout and fmt chunk of a .wav file without reading any audio.
+
+    Parameters:
+    file_path (str): Path to the .wav file.
+    read_chunks (iterable, optional): IDs of further chunks to read in the same pass,
+        e.g. ('LIST', 'acid').
+
+    Returns:
+    dict: 'format', 'channels', 'sample_rate', 'bits_per_sample', 'block_align',
+    'data_offset', 'data_size', 'frames', 'duration', 'chunks', a list of
+    (chunk_id, payload_offset, payload_size) tuples in file order, and 'payloads', the
+    bytes of each requested chunk (a list, as LIST can occur more than once).
+    """
+    read_chunks = set(read_chunks)
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] not in (b'RIFF', b'RF64') or riff[8:12] != b'WAVE':
+            raise ValueError(f"{file_path} is not a RIFF/WAVE file")
+
+        header = {'chunks': [], 'payloads': {}}
+        ds64_data_size = None
+        while True:
+            chunk_header = f.read(8)
+            if len(chunk_header) < 8:
+                break
+            chunk_id, size = struct.unpack('<4sI', chunk_header)
+            chunk_id = chunk_id.decode('latin-1')
+            offset = f.tell()
+
+            if chunk_id == 'ds64':
+                # RF64: 64-bit RIFF size, data size and sample count
+                ds64_data_size = struct.unpack('<QQQ', f.read(24))[1]
+            elif chunk_id == 'fmt ':
+                fmt = f.read(size)
+                tag, channels, sample_rate, _, block_align, bits = struct.unpack('<HHIIHH', fmt[:16])
+                if tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                    # The real format is the first two bytes of the SubFormat GUID
+                    tag = struct.unpack('<H', fmt[24:26])[0]
+                header.update(format=tag, channels=channels, sample_rate=sample_rate,
+                              block_align=block_align, bits_per_sample=bits)
+            elif chunk_id == 'data':
+                if ds64_data_size is not None and size == 0xFFFFFFFF:
+                    size = ds64_data_size
+                # Writers that never finalized the header leave a bogus size
+                size = min(size, file_size - offset)
+                header.update(data_offset=offset, data_size=size)
+            elif chunk_id in read_chunks:
+                header['payloads'].setdefault(chunk_id, []).append(f.read(size))
+
+            header['chunks'].append((chunk_id, offset, size))
+            f.seek(offset + size + (size & 1))
+
+    if 'format' not in header or 'data_offset' not in header:
+        raise ValueError(f"{file_path} has no fmt or data chunk")
+    if header['block_align'] == 0 or header['channels'] == 0 or header['sample_rate'] == 0:
+        raise ValueError(f"{file_path} has an invalid fmt chunk (zero block align, channels or sample rate)")
+    header['frames'] = header['data_size'] // header['block_align']
+    header['duration'] = header['frames'] / header['sample_rate']
+    return header
+
+def map_wav_frames(file_path, header=None):
+    """
+    Memory-maps the data chunk of an uncompressed .wav file without copying or decoding.
+
+    Parameters:
+    file_path (str): Path to the .wav file.
+    header (dict, optional): Result of read_wav_header, if already parsed.
+
+    Returns:
+    np.memmap: Samples as (frames, channels), or (frames, channels, 3) raw bytes for 24-bit PCM.
+    """
+    if header is None:
+        header = read_wav_header(file_path)
+    frames, channels = header['frames'], header['channels']
+    key = (header['format'], header['bits_per_sample'])
+    if key == (WAVE_FORMAT_PCM, 24):
+        dtype, shape = np.dtype('u1'), (frames, channels, 3)
+    elif key in SAMPLE_DTYPES:
+        dtype, shape = SAMPLE_DTYPES[key], (frames, channels)
+    else:
+        raise ValueError(f"Unsupported WAV encoding: format {key[0]}, {key[1]} bits")
+    if frames == 0:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(file_path, dtype=dtype, mode='r', offset=header['data_offset'], shape=shape)
+
+def to_float32(samples, bits_per_sample):
+    """
+    Converts raw samples from map_wav_frames to float32 in [-1, 1), scaled like soundfile.
+
+    Parameters:
+    samples (np.ndarray): Raw samples of one or more channels.
+    bits_per_sample (int): Bit depth from the header (24-bit samples carry a trailing byte axis).
+
+    Returns:
+    np.ndarray: Float32 samples with the 24-bit byte axis removed.
+    """
+    if bits_per_sample == 24:
+        # 24-bit little endian: place the 3 bytes in the top of an int32
+        as_int = (samples[..., 0].astype(np.int32) << 8) \
+            | (samples[..., 1].astype(np.int32) << 16) \
+            | (samples[..., 2].astype(np.int32) << 24)
+        return as_int.astype(np.float32) * np.float32(1 / 2 ** 31)
+    if samples.dtype == np.uint8:
+        return (samples.astype(np.float32) - 128) * np.float32(1 / 128)
+    if samples.dtype.kind == 'i':
+        scale = np.float32(1 / 2 ** (8 * samples.dtype.itemsize - 1))
+        return samples.astype(np.float32) * scale
+    return samples.astype(np.float32)
+
+def _downmix(frames, bits_per_sample):
+    # Sum one channel at a time: a strided mean over the channel axis is much slower
+    channels = frames.shape[1]
+    y = to_float32(frames[:, 0], bits_per_sample)
+    for channel in range(1, channels):
+        y += to_float32(frames[:, channel], bits_per_sample)
+    if channels > 1:
+        y *= np.float32(1 / channels)
+    return y
+
+def load_wav(file_path, sr=22050, mono=True, quality='hq'):
+    """
+    Loads an audio file like librosa.load, but reads uncompressed .wav files through a
+    memory map instead of a full decode. Other formats fall back to librosa.load.
+
+    Parameters:
+    file_path (str): Path to the audio file.
+    sr (int, optional): Target sampling rate, or None for the file's native rate. Default is 22050.
+    mono (bool): Downmix to mono. Default is True.
+    quality (str): Resampling quality: 'none' (keep the native rate), 'fast' (cheap
+        libsoxr quick mode) or 'hq' (librosa.load's default). Default is 'hq'.
+
+    Returns:
+    tuple: (y, sr) with y as float32, shaped (frames,) or (channels, frames).
+    """
+    if quality not in ('none', *RESAMPLE_TYPES):
+        raise ValueError("Invalid value for 'quality'. Choose from 'none', 'fast', or 'hq'.")
+    target_sr = None if quality == 'none' else sr
+
+    try:
+        header = read_wav_header(file_path)
+        frames = map_wav_frames(file_path, header)
+    except (ValueError, OSError, struct.error):
+        return librosa.load(file_path, sr=target_sr, mono=mono,
+                            res_type=RESAMPLE_TYPES.get(quality, 'soxr_hq'))
+
+    native_sr = header['sample_rate']
+    bits = header['bits_per_sample']
+    if mono:
+        y = _downmix(frames, bits)
+    else:
+        y = np.ascontiguousarray(to_float32(frames, bits).T)
+        if y.shape[0] == 1:
+            y = y[0]
+
+    if target_sr is not None and target_sr != native_sr:
+        y = librosa.resample(y, orig_sr=native_sr, target_sr=target_sr, res_type=RESAMPLE_TYPES[quality])
+        return y, target_sr
+    return y, native_sr